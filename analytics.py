@@ -0,0 +1,89 @@
+from collections import deque
+from typing import Deque, List, Optional
+
+
+class SessionAnalytics:
+    """
+    Confidence statistics kept up to date in O(1) per scored reply
+    """
+
+    def __init__(self, window: int = 10, ewma_alpha: float = 0.3):
+        self.window = window
+        self.ewma_alpha = ewma_alpha
+
+        self.count = 0
+        self.mean = 0.0
+        self.ewma: Optional[float] = None
+        self.minimum: Optional[int] = None
+        self.maximum: Optional[int] = None
+        self.latest: Optional[int] = None
+
+        # Sums for the least-squares fit of level against position (x = 1..n)
+        self._sum_x = 0.0
+        self._sum_y = 0.0
+        self._sum_xy = 0.0
+        self._sum_xx = 0.0
+
+        self._recent: Deque[int] = deque(maxlen=window)
+        self._recent_sum = 0
+
+    def update(self, confidence_level: int):
+        """Fold one new confidence level into every statistic"""
+        self.count += 1
+        x = float(self.count)
+        y = float(confidence_level)
+
+        self.mean += (y - self.mean) / self.count
+        self.ewma = y if self.ewma is None else self.ewma_alpha * y + (1 - self.ewma_alpha) * self.ewma
+        self.minimum = confidence_level if self.minimum is None else min(self.minimum, confidence_level)
+        self.maximum = confidence_level if self.maximum is None else max(self.maximum, confidence_level)
+        self.latest = confidence_level
+
+        self._sum_x += x
+        self._sum_y += y
+        self._sum_xy += x * y
+        self._sum_xx += x * x
+
+        if len(self._recent) == self.window:
+            self._recent_sum -= self._recent[0]
+        self._recent.append(confidence_level)
+        self._recent_sum += confidence_level
+
+    @property
+    def slope(self) -> float:
+        """Least-squares trend in confidence per reply"""
+        denominator = self.count * self._sum_xx - self._sum_x ** 2
+        if self.count < 2 or denominator == 0:
+            return 0.0
+        return (self.count * self._sum_xy - self._sum_x * self._sum_y) / denominator
+
+    @property
+    def intercept(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return (self._sum_y - self.slope * self._sum_x) / self.count
+
+    def trend_value(self, x: float) -> float:
+        """Fitted trend line value at position x (1-based)"""
+        return self.intercept + self.slope * x
+
+    @property
+    def rolling_mean(self) -> Optional[float]:
+        if not self._recent:
+            return None
+        return self._recent_sum / len(self._recent)
+
+    def recent(self) -> List[int]:
+        """The last `window` levels"""
+        return list(self._recent)
+
+    def get_summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 2),
+            "ewma": round(self.ewma, 2) if self.ewma is not None else None,
+            "slope": round(self.slope, 3),
+            "min": self.minimum,
+            "max": self.maximum,
+            "rolling_mean": round(self.rolling_mean, 2) if self.rolling_mean is not None else None
+        }
@@ -1,14 +1,26 @@
 import streamlit as st
 from chatbot import ConfidenceChatbot
-from models import UserMessage
-import plotly.graph_objects as go
+from response_cache import default_response_cache
+from backends import GeminiBackend, get_shared_gemini_backend
+from session_store import InMemorySessionStore, SQLiteSessionStore, SessionStore
+import metrics
+from models import UserMessage, AIResponse
 import time
-from dotenv import load_dotenv
+from itertools import chain
 from datetime import datetime
 import logging
-from typing import List, Dict, Any
+import os
+import re
+from typing import List, Dict, Any, Optional
+from analytics import SessionAnalytics
+from conversation import Turn
+from charts import lttb_downsample, render_sparkline_svg
+from lazy import LazyModule, load_env
 
-load_dotenv()
+load_env()
+
+# Only needed once there is a chart to draw
+go = LazyModule("plotly.graph_objects")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,6 +30,12 @@ logger = logging.getLogger(__name__)
 MAX_MESSAGE_LENGTH = 500
 DEFAULT_CONFIDENCE_LEVEL = 5
 CONFIDENCE_COLORS = ['#ff6b6b', '#feca57', '#48dbfb', '#0abde3']
+CHART_POINT_BUDGET = int(os.getenv("CHART_POINT_BUDGET", "120"))  # Downsample history beyond this
+SIDEBAR_CHART_MODE = os.getenv("SIDEBAR_CHART_MODE", "plotly")  # "plotly" or "sparkline"
+TRANSCRIPT_WINDOW = int(os.getenv("TRANSCRIPT_WINDOW", "20"))  # Turns rendered before "load earlier"
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH")  # SQLite file shared by workers; in-memory when unset
+METRICS_PORT = os.getenv("METRICS_PORT")  # Serve Prometheus metrics on this local port when set
+SHOW_METRICS_PANEL = os.getenv("SHOW_METRICS_PANEL", "").lower() in ("1", "true", "yes")
 
 # Page config
 st.set_page_config(
@@ -27,11 +45,23 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+def minify_css(css: str) -> str:
+    """Strip comments and insignificant whitespace, leaving quoted strings alone"""
+    parts = re.split(r'("[^"]*"|\'[^\']*\')', re.sub(r"/\*.*?\*/", "", css, flags=re.S))
+    for i in range(0, len(parts), 2):
+        text = re.sub(r"\s+", " ", parts[i])
+        text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+        parts[i] = re.sub(r":\s+", ":", text).replace(";}", "}")
+    return "".join(parts).strip()
+
 @st.cache_data
 def load_custom_css() -> str:
-    """Load and return custom CSS styles with dark mode support"""
-    return """
-    <style>
+    """
+    Load and return custom CSS styles with dark mode support.
+    Streamlit drops any element a rerun does not emit again, so the style tag goes
+    out on every run; it is minified once here to keep that payload small.
+    """
+    return "<style>" + minify_css("""
         /* Light mode styles */
         .main-header {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
@@ -101,6 +131,11 @@ def load_custom_css() -> str:
         .pulse-animation {
             animation: pulse 0.5s ease-in-out;
         }
+        .message-time {
+            font-size: 0.8em;
+            color: #666;
+            margin-top: 0.5rem;
+        }
 
         /* Dark mode styles */
         @media (prefers-color-scheme: dark) {
@@ -131,7 +166,7 @@ def load_custom_css() -> str:
                 color: #e0e0e0;
             }
             /* Ensure timestamp is visible */
-            .chat-message div[style*="color: #666"] {
+            .message-time {
                 color: #b0b0b0 !important;
             }
             /* Ensure emojis are visible */
@@ -139,31 +174,87 @@ def load_custom_css() -> str:
                 color: #e0e0e0;
             }
         }
-    </style>
-    """
+    """) + "</style>"
+
+@st.cache_resource
+def get_shared_backend() -> GeminiBackend:
+    """Create, prewarm and keep alive the Gemini client shared by all sessions"""
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        raise ValueError("Gemini API key is required. Set GEMINI_API_KEY environment variable.")
+    return get_shared_gemini_backend(api_key, prewarm=True, keepalive_interval=45.0)
+
+@st.cache_resource
+def get_session_store() -> SessionStore:
+    """Where conversations are persisted so a reload, restart or other worker can resume them"""
+    if SESSION_DB_PATH:
+        return SQLiteSessionStore(SESSION_DB_PATH)
+    return InMemorySessionStore()
+
+@st.cache_resource
+def start_metrics_exporter() -> bool:
+    """Start the process-wide /metrics endpoint once, if configured"""
+    if not METRICS_PORT:
+        return False
+    try:
+        metrics.start_http_server(int(METRICS_PORT))
+        return True
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not start metrics endpoint on port {METRICS_PORT}: {e}")
+        return False
 
 def initialize_session_state():
     """Initialize all session state variables"""
     if 'chatbot' not in st.session_state:
         try:
-            st.session_state.chatbot = ConfidenceChatbot()
+            st.session_state.chatbot = ConfidenceChatbot(
+                backend=get_shared_backend(),
+                response_cache=default_response_cache,
+                session_store=get_session_store()
+            )
+            
+            # The session id lives in the URL, so reloading the page picks the conversation back up
+            chatbot = st.session_state.chatbot
+            requested = st.experimental_get_query_params().get("session", [None])[0]
+            if requested:
+                chatbot.resume_session(requested)
+            st.experimental_set_query_params(session=chatbot.session.session_id)
         except Exception as e:
             logger.error(f"Failed to initialize chatbot: {e}")
             st.error("Failed to initialize ConfidenceAI. Please refresh the page.")
             return False
     
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
-    
-    if 'confidence_history' not in st.session_state:
-        st.session_state.confidence_history = []
-    
     if 'session_start_time' not in st.session_state:
-        st.session_state.session_start_time = datetime.now()
+        st.session_state.session_start_time = st.session_state.chatbot.session.start_time
     
     if 'daily_goals' not in st.session_state:
         st.session_state.daily_goals = []
     
+    if 'transcript_window' not in st.session_state:
+        st.session_state.transcript_window = TRANSCRIPT_WINDOW
+    
+    if 'message_html' not in st.session_state:
+        st.session_state.message_html = {}
+    
+    return True
+
+def catch_up_with_store() -> bool:
+    """Reload the conversation when another tab on the same ?session= link has stored turns since.
+
+    Without this, the next turn here would reuse seqs the other tab already took, and the
+    store would drop it.
+    """
+    chatbot = st.session_state.chatbot
+    if chatbot.session_store is None:
+        return False
+    session_id = chatbot.session.session_id
+    record = chatbot.session_store.get_session(session_id)
+    # Same staleness check as SessionRegistry.get in server.py
+    if record is None or record.turn_count <= chatbot.session.next_seq:
+        return False
+    if not chatbot.resume_session(session_id):
+        return False
+    st.session_state.message_html = {}
     return True
 
 def validate_user_input(text: str) -> tuple[bool, str]:
@@ -181,17 +272,20 @@ def validate_user_input(text: str) -> tuple[bool, str]:
     
     return True, ""
 
-def create_confidence_chart(confidence_data: List[float]) -> go.Figure:
+def create_confidence_chart(confidence_data: List[float], analytics: Optional[SessionAnalytics] = None) -> "go.Figure":
     """Create an enhanced confidence progress chart"""
     if not confidence_data:
         confidence_data = [DEFAULT_CONFIDENCE_LEVEL]
     
     fig = go.Figure()
     
+    # Long histories are downsampled so the figure payload stays flat
+    x_points, y_points = lttb_downsample(confidence_data, CHART_POINT_BUDGET)
+    
     # Add main line
     fig.add_trace(go.Scatter(
-        x=list(range(1, len(confidence_data) + 1)),
-        y=confidence_data,
+        x=x_points,
+        y=y_points,
         mode='lines+markers',
         line=dict(color='#667eea', width=4, shape='spline'),
         marker=dict(size=10, color='#764ba2', line=dict(width=2, color='white')),
@@ -199,23 +293,17 @@ def create_confidence_chart(confidence_data: List[float]) -> go.Figure:
         hovertemplate='Session %{x}<br>Confidence: %{y}/10<extra></extra>'
     ))
     
-    # Add trend line if enough data points
-    if len(confidence_data) > 2:
-        from numpy import polyfit, poly1d
-        try:
-            x_vals = list(range(1, len(confidence_data) + 1))
-            z = polyfit(x_vals, confidence_data, 1)
-            p = poly1d(z)
-            fig.add_trace(go.Scatter(
-                x=x_vals,
-                y=[p(x) for x in x_vals],
-                mode='lines',
-                line=dict(color='rgba(255, 107, 107, 0.5)', width=2, dash='dash'),
-                name='Trend',
-                hoverinfo='skip'
-            ))
-        except:
-            pass  # Skip trend line if numpy not available
+    # Add trend line if enough data points, using the session's running least-squares fit
+    if analytics is not None and len(confidence_data) > 2:
+        x_vals = [1, len(confidence_data)]
+        fig.add_trace(go.Scatter(
+            x=x_vals,
+            y=[analytics.trend_value(x) for x in x_vals],
+            mode='lines',
+            line=dict(color='rgba(255, 107, 107, 0.5)', width=2, dash='dash'),
+            name='Trend',
+            hoverinfo='skip'
+        ))
     
     fig.update_layout(
         title=dict(text="Your Confidence Journey", font=dict(size=16, color='#333')),
@@ -232,46 +320,99 @@ def create_confidence_chart(confidence_data: List[float]) -> go.Figure:
     
     return fig
 
+def get_confidence_chart(session) -> Any:
+    """Chart for the sidebar, rebuilt only when the confidence history changes"""
+    # History is append-only, so the session and its length identify it
+    fingerprint = (session.start_time, session.analytics.count, SIDEBAR_CHART_MODE, CHART_POINT_BUDGET)
+    cached = st.session_state.get('confidence_chart')
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+    
+    if SIDEBAR_CHART_MODE == "sparkline":
+        chart = render_sparkline_svg(session.confidence_history)
+    else:
+        chart = create_confidence_chart(session.confidence_history, session.analytics)
+    st.session_state.confidence_chart = (fingerprint, chart)
+    return chart
+
+def render_dashboard(slots: Dict[str, Any]):
+    """Fill the sidebar dashboard slots with session metrics and the confidence chart"""
+    try:
+        session_data = st.session_state.chatbot.get_session_summary()
+        
+        # Session metrics with enhanced styling
+        total_messages = session_data.get("total_messages", 0)
+        slots["messages"].metric(
+            "Messages", 
+            total_messages,
+            delta=None if total_messages == 0 else "+1"
+        )
+        avg_confidence = session_data.get("average_confidence", DEFAULT_CONFIDENCE_LEVEL)
+        slots["confidence"].metric(
+            "Avg Confidence", 
+            f"{avg_confidence:.1f}/10",
+            delta=f"+{avg_confidence - DEFAULT_CONFIDENCE_LEVEL:.1f}" if avg_confidence > DEFAULT_CONFIDENCE_LEVEL else None
+        )
+        
+        # Session duration
+        if 'session_start_time' in st.session_state:
+            duration = datetime.now() - st.session_state.session_start_time
+            minutes = int(duration.total_seconds() / 60)
+            slots["duration"].metric("Session Time", f"{minutes} min")
+        
+        # Enhanced confidence chart
+        session = st.session_state.chatbot.session
+        if session.analytics.count:
+            chart = get_confidence_chart(session)
+            if SIDEBAR_CHART_MODE == "sparkline":
+                slots["chart"].markdown(chart, unsafe_allow_html=True)
+            else:
+                slots["chart"].plotly_chart(chart, use_container_width=True, config={'displayModeBar': False})
+        else:
+            slots["chart"].info("Start chatting to see your confidence progress!")
+    
+    except Exception as e:
+        logger.error(f"Error rendering session data: {e}")
+        slots["chart"].warning("Unable to load session analytics")
+
+def prepare_export():
+    """Stream the session through gzip into the payload for the download button"""
+    session = st.session_state.chatbot.session
+    chunks = st.session_state.chatbot.export_session_stream(compress=True)
+    st.session_state.session_export = (session.session_id, session.total_messages, b"".join(chunks))
+
+def render_export_controls():
+    """Download button for the current session, built on request instead of on every rerun"""
+    session = st.session_state.chatbot.session
+    if not session.total_messages:
+        return
+    export = st.session_state.get('session_export')
+    if export is not None and export[:2] == (session.session_id, session.total_messages):
+        st.download_button(
+            "📥 Download Conversation",
+            data=export[2],
+            file_name=f"confidenceai-{session.session_id}.ndjson.gz",
+            mime="application/gzip",
+            key="download_export"
+        )
+    else:
+        st.button("📦 Prepare Export", key="prepare_export", on_click=prepare_export,
+                  help="Package the whole conversation as compressed NDJSON")
+
 def render_sidebar():
-    """Render the enhanced sidebar"""
+    """Render the enhanced sidebar, returning the dashboard slots for in-place updates"""
     with st.sidebar:
         st.markdown("### 🎯 Your Confidence Dashboard")
         
-        try:
-            session_data = st.session_state.chatbot.get_session_summary()
-            
-            # Session metrics with enhanced styling
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric(
-                    "Messages", 
-                    session_data.get("total_messages", len(st.session_state.messages)),
-                    delta=None if len(st.session_state.messages) == 0 else "+1"
-                )
-            with col2:
-                avg_confidence = session_data.get("average_confidence", DEFAULT_CONFIDENCE_LEVEL)
-                st.metric(
-                    "Avg Confidence", 
-                    f"{avg_confidence:.1f}/10",
-                    delta=f"+{avg_confidence - DEFAULT_CONFIDENCE_LEVEL:.1f}" if avg_confidence > DEFAULT_CONFIDENCE_LEVEL else None
-                )
-            
-            # Session duration
-            if 'session_start_time' in st.session_state:
-                duration = datetime.now() - st.session_state.session_start_time
-                minutes = int(duration.total_seconds() / 60)
-                st.metric("Session Time", f"{minutes} min")
-            
-            # Enhanced confidence chart
-            if st.session_state.confidence_history:
-                fig = create_confidence_chart(st.session_state.confidence_history)
-                st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-            else:
-                st.info("Start chatting to see your confidence progress!")
-        
-        except Exception as e:
-            logger.error(f"Error rendering session data: {e}")
-            st.warning("Unable to load session analytics")
+        # One slot per metric and for the chart, so a new turn can refresh them in place
+        col1, col2 = st.columns(2)
+        dashboard = {
+            "messages": col1.empty(),
+            "confidence": col2.empty(),
+            "duration": st.empty(),
+            "chart": st.empty()
+        }
+        render_dashboard(dashboard)
         
         st.markdown("---")
         
@@ -310,8 +451,26 @@ def render_sidebar():
                 if st.checkbox(goal['goal'], key=f"goal_{i}"):
                     st.success("🎉 Goal completed!")
         
+        render_export_controls()
+        
         st.markdown("---")
         
+        # Operator view of the AI call metrics
+        if SHOW_METRICS_PANEL:
+            with st.expander("🛠️ Service Metrics"):
+                summary = metrics.get_summary()
+                col1, col2 = st.columns(2)
+                col1.metric("AI Requests", summary["requests"])
+                col2.metric("p95 Latency", f"{summary['latency_p95']:g}s")
+                col1.metric("Fallback Rate", f"{summary['fallback_rate']:.1%}")
+                col2.metric("Parse Failures", f"{summary['parse_failure_rate']:.1%}")
+                col1.metric("Attempts/Call", f"{summary['attempts_mean']:.2f}")
+                col2.metric("Vague Prompts", f"{summary['vague_share']:.0%}")
+                col1.metric("p95 Queue Wait", f"{summary['queue_wait_p95']:g}s")
+                col2.metric("Coalesced Calls", int(summary["coalesced"]))
+                if METRICS_PORT:
+                    st.caption(f"Prometheus endpoint: http://127.0.0.1:{METRICS_PORT}/metrics")
+        
         # Enhanced project info
         with st.expander("🚀 About ConfidenceAI"):
             st.markdown("""
@@ -330,6 +489,8 @@ def render_sidebar():
             
             [⭐ Star on GitHub](https://github.com/walethewave/Confidence-Coach)
             """)
+    
+    return dashboard
 
 import html
 
@@ -339,48 +500,84 @@ from typing import Dict, Any
 import streamlit as st
 import logging
 
-def render_chat_message(message: Dict[str, Any], message_index: int):
-    """Render individual chat message with safe HTML structure"""
-    try:
-        # Get timestamp (always a string)
-        timestamp = message.get("timestamp", datetime.now().strftime("%H:%M"))
-        if isinstance(timestamp, datetime):
-            timestamp = timestamp.strftime("%H:%M")
-
-        # Escape user content to prevent breaking the HTML
-        content = html.escape(message["content"])
+def build_message_html(role: str, content: str, timestamp: str) -> str:
+    """Build the escaped HTML block for a chat message"""
+    # Escape user content to prevent breaking the HTML
+    content = html.escape(content)
 
-        # Build HTML based on role
-        if message["role"] == "user":
-            html_block = f"""
+    # Build HTML based on role
+    if role == "user":
+        return f"""
 <div class="chat-message user-message">
     <strong>🙋‍♀️ You:</strong> <span>{content}</span>
-    <div style="font-size: 0.8em; color: #666; margin-top: 0.5rem;">{timestamp}</div>
+    <div class="message-time">{timestamp}</div>
 </div>
 """
-        else:
-            html_block = f"""
+    return f"""
 <div class="chat-message bot-message">
     <strong>🤖 ConfidenceAI:</strong> <span>{content}</span>
-    <div style="font-size: 0.8em; color: #666; margin-top: 0.5rem;">{timestamp}</div>
+    <div class="message-time">{timestamp}</div>
 </div>
 """
 
-        # Render safe HTML block
-        st.markdown(html_block, unsafe_allow_html=True)
+def cache_message_html(turns: List[Turn]):
+    """Build the HTML for newly appended turns once, and forget turns that left the hot window"""
+    cache = st.session_state.message_html
+    for turn in turns:
+        cache[turn.seq] = build_message_html(turn.role, turn.content, turn.created_at.strftime("%H:%M"))
+
+    store = st.session_state.chatbot.session.store
+    oldest_hot = store.archived_count
+    if cache and min(cache) < oldest_hot:
+        for seq in [seq for seq in cache if seq < oldest_hot]:
+            del cache[seq]
+
+def get_message_html(message: Turn) -> str:
+    cached = st.session_state.message_html.get(message.seq)
+    if cached is None:
+        cache_message_html([message])
+        cached = st.session_state.message_html[message.seq]
+    return cached
+
+def load_earlier_messages():
+    st.session_state.transcript_window += TRANSCRIPT_WINDOW
+
+def render_transcript():
+    """Render the latest turns, with a pager for older ones still in the hot window"""
+    store = st.session_state.chatbot.session.store
+    turns = store.recent(st.session_state.transcript_window)
+    hidden = store.total - store.archived_count - len(turns)
+
+    if hidden > 0:
+        st.button(
+            f"⬆️ Load {min(hidden, TRANSCRIPT_WINDOW)} earlier messages ({hidden} hidden)",
+            key="load_earlier",
+            on_click=load_earlier_messages
+        )
+    elif store.archived_count:
+        st.caption(f"{store.archived_count} older messages are archived and included in the session export.")
+
+    for message in turns:
+        render_chat_message(message, message.seq)
+
+def render_chat_message(message: Turn, message_index: int):
+    """Render individual chat message with safe HTML structure"""
+    try:
+        # Render safe HTML block, built once per turn
+        st.markdown(get_message_html(message), unsafe_allow_html=True)
 
         # Render optional expanders for bot messages
-        if message["role"] != "user":
+        if message.role != "user":
             col1, col2 = st.columns(2)
             with col1:
-                if "tips" in message and message["tips"]:
+                if message.tips:
                     with st.expander("💡 Confidence Tips", expanded=False):
-                        for i, tip in enumerate(message["tips"], 1):
+                        for i, tip in enumerate(message.tips, 1):
                             st.markdown(f"**{i}.** {tip}")
             with col2:
-                if "next_steps" in message and message["next_steps"]:
+                if message.next_steps:
                     with st.expander("🎯 Next Steps", expanded=False):
-                        for i, step in enumerate(message["next_steps"], 1):
+                        for i, step in enumerate(message.next_steps, 1):
                             st.markdown(f"**{i}.** {step}")
 
     except Exception as e:
@@ -390,35 +587,42 @@ def render_chat_message(message: Dict[str, Any], message_index: int):
 def process_user_input(user_input: str) -> bool:
     """Process user input and generate response"""
     try:
-        # Add user message with timestamp as string
-        st.session_state.messages.append({
-            "role": "user", 
-            "content": user_input,
-            "timestamp": datetime.now().strftime("%H:%M")  # Store as string
-        })
+        # Show the message right away; the chatbot records the turn in the session store
+        st.markdown(
+            build_message_html("user", user_input, datetime.now().strftime("%H:%M")),
+            unsafe_allow_html=True
+        )
         
         # Generate response with error handling
         user_message = UserMessage(content=user_input)
+        reply_placeholder = st.empty()
+        reply_timestamp = datetime.now().strftime("%H:%M")
+        streamed_text = ""
+        response = None
         
+        # Spinner only until the first token shows up
+        stream = st.session_state.chatbot.generate_response_stream(user_message)
         with st.spinner("🤖 ConfidenceAI is crafting your personalized response..."):
-            response = st.session_state.chatbot.generate_response(user_message)
-            
-            # Extract confidence level if available
-            confidence_level = getattr(response, 'confidence_level', DEFAULT_CONFIDENCE_LEVEL)
-            st.session_state.confidence_history.append(confidence_level)
-            
-            # Bot response with timestamp as string
-            bot_message = {
-                "role": "assistant",
-                "content": response.response,
-                "tips": getattr(response, 'confidence_tips', []),
-                "next_steps": getattr(response, 'next_steps', []),
-                "confidence_level": confidence_level,
-                "timestamp": datetime.now().strftime("%H:%M")  # Store as string
-            }
-            st.session_state.messages.append(bot_message)
+            first_item = next(stream, None)
+        
+        for chunk in chain([first_item] if first_item is not None else [], stream):
+            if isinstance(chunk, AIResponse):
+                response = chunk
+                continue
+            streamed_text += chunk
+            reply_placeholder.markdown(
+                build_message_html("assistant", streamed_text + " ▌", reply_timestamp),
+                unsafe_allow_html=True
+            )
+        
+        if response is not None:
+            new_turns = st.session_state.chatbot.session.store.recent(2)
+            cache_message_html(new_turns)
+            # Swap the streamed text for the finished turn, tips and next steps included
+            with reply_placeholder.container():
+                render_chat_message(new_turns[-1], new_turns[-1].seq)
             
-            return True
+        return response is not None
             
     except Exception as e:
         logger.error(f"Error processing user input: {e}")
@@ -430,11 +634,7 @@ def main():
     # Load custom CSS
     st.markdown(load_custom_css(), unsafe_allow_html=True)
     
-    # Initialize session state
-    if not initialize_session_state():
-        return
-    
-    # Header with enhanced styling
+    # Header with enhanced styling, painted before the backend is loaded
     st.markdown("""
     <div class="main-header">
         <h1>🌟 ConfidenceAI - Your Personal Confidence Coach</h1>
@@ -453,8 +653,17 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
+    # Initialize session state
+    if not initialize_session_state():
+        return
+    start_metrics_exporter()
+    
+    # Checked on every run, so a turn is never sent from a copy that is behind the store
+    if catch_up_with_store():
+        st.info("This conversation continued in another tab, so the latest messages were loaded.")
+    
     # Render sidebar
-    render_sidebar()
+    dashboard = render_sidebar()
     
     # Main chat interface
     st.markdown("### 💬 Chat with ConfidenceAI")
@@ -463,9 +672,8 @@ def main():
     # Chat container with max height
     chat_container = st.container()
     with chat_container:
-        # Display chat messages
-        for i, message in enumerate(st.session_state.messages):
-            render_chat_message(message, i)
+        # Display the latest chat messages
+        render_transcript()
     
     # Chat input with validation
     user_input = st.chat_input(
@@ -480,9 +688,11 @@ def main():
             st.error(error_message)
             return
         
-        # Process input
-        if process_user_input(user_input):
-            st.rerun()
+        # Process input below the transcript, then refresh the sidebar in place
+        # rather than rerunning the whole script
+        with chat_container:
+            if process_user_input(user_input):
+                render_dashboard(dashboard)
     
     # Footer with additional info
     st.markdown("---")
@@ -0,0 +1,210 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from models import ConfidenceAssessment
+from prompts import ConfidencePromptEngine
+
+# Words that flip the meaning of a keyword that follows them closely
+NEGATORS = {
+    "not", "no", "never", "don't", "dont", "doesn't", "isn't", "wasn't", "aren't",
+    "hardly", "barely", "without", "nothing", "nobody", "can't", "cannot", "won't"
+}
+NEGATION_WINDOW = 3
+
+# Negation and intensity only reach within a clause: "I'm not sure, but I'm confident" is confident
+CLAUSE_BREAK = re.compile(r"[.,;:!?()\n]+|\s[-–—]+\s")
+CONTRAST_WORDS = {"but", "though", "although", "however", "whereas"}
+
+# Intensity modifiers scale how far a keyword pulls away from neutral
+INTENSIFIERS = {
+    "very": 1.5, "really": 1.4, "so": 1.3, "extremely": 1.7, "super": 1.5,
+    "totally": 1.5, "completely": 1.6, "incredibly": 1.7, "too": 1.3, "absolutely": 1.6
+}
+DIMINISHERS = {
+    "slightly": 0.5, "somewhat": 0.6, "kinda": 0.6, "bit": 0.6, "little": 0.6, "mildly": 0.5
+}
+
+NEUTRAL_LEVEL = 5.5
+
+# Levels suggested by each bucket of ConfidencePromptEngine.extract_confidence_keywords
+KEYWORD_CATEGORY_LEVELS = {
+    "low_confidence": 2.5,
+    "medium_confidence": 4.5,
+    "high_confidence": 8.0
+}
+
+TOPIC_KEYWORDS = [
+    ("job interview nerves", ["interview"]),
+    ("public speaking", ["presentation", "speech", "public speaking", "present"]),
+    ("financial stress", ["money", "income", "rent", "broke", "debt", "bills"]),
+    ("career direction", ["job", "career", "work", "promotion", "boss", "team", "manager"]),
+    ("starting a business", ["business", "startup", "entrepreneur"]),
+    ("academic pressure", ["exam", "exams", "school", "university", "college", "grades"]),
+    ("relationships", ["relationship", "partner", "friends", "dating", "family"]),
+    ("self-doubt", ["imposter", "qualified", "good enough", "doubt"])
+]
+
+
+class LocalConfidenceAssessor:
+    """
+    In-process confidence assessment built on the prompt engine lexicons
+    """
+
+    def __init__(self, cache_size: int = 1024):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, ConfidenceAssessment]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._lexicon = self._build_lexicon()
+
+    @staticmethod
+    def _build_lexicon() -> List[Tuple[Tuple[str, ...], float]]:
+        """Combine both keyword sources into (phrase tokens, level) pairs, longest first"""
+        levels = {}
+        for category, words in ConfidencePromptEngine.extract_confidence_keywords().items():
+            for word in words:
+                levels[word] = KEYWORD_CATEGORY_LEVELS[category]
+        for level, words in ConfidencePromptEngine.get_confidence_level_keywords():
+            for word in words:
+                levels.setdefault(word, float(level))
+
+        lexicon = [(tuple(phrase.split()), level) for phrase, level in levels.items()]
+        lexicon.sort(key=lambda item: len(item[0]), reverse=True)
+        return lexicon
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        """Normalize a message for matching and cache lookups"""
+        text = message.lower().replace("’", "'").replace("‘", "'")
+        text = re.sub(r"[^a-z0-9' ]+", " ", text)
+        return " ".join(text.split())
+
+    def get_cached(self, message: str) -> Optional[ConfidenceAssessment]:
+        """Return a memoized assessment for this message, if any"""
+        key = self.normalize(message)
+        with self._lock:
+            assessment = self._cache.get(key)
+            if assessment is not None:
+                self._cache.move_to_end(key)
+            return assessment
+
+    def remember(self, message: str, assessment: ConfidenceAssessment):
+        """Memoize an assessment for this message"""
+        key = self.normalize(message)
+        with self._lock:
+            self._cache[key] = assessment
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _clauses(self, message: str) -> List[List[str]]:
+        """Normalized tokens of each clause, split at punctuation and at contrast words"""
+        clauses = []
+        for part in CLAUSE_BREAK.split(message):
+            tokens: List[str] = []
+            for token in self.normalize(part).split():
+                if token in CONTRAST_WORDS:
+                    if tokens:
+                        clauses.append(tokens)
+                    tokens = []
+                else:
+                    tokens.append(token)
+            if tokens:
+                clauses.append(tokens)
+        return clauses
+
+    def _score_matches(self, tokens: List[str]) -> List[Tuple[str, float]]:
+        """Find lexicon phrases in the token list and score them with negation and intensity"""
+        matches = []
+        consumed = [False] * len(tokens)
+
+        for phrase, level in self._lexicon:
+            size = len(phrase)
+            for start in range(len(tokens) - size + 1):
+                if any(consumed[start:start + size]) or tuple(tokens[start:start + size]) != phrase:
+                    continue
+                for i in range(start, start + size):
+                    consumed[i] = True
+
+                deviation = level - NEUTRAL_LEVEL
+                window = tokens[max(0, start - NEGATION_WINDOW):start]
+
+                for modifier in window[-2:]:
+                    deviation *= INTENSIFIERS.get(modifier, 1.0) * DIMINISHERS.get(modifier, 1.0)
+
+                # A negated keyword points the other way, but less strongly
+                if any(word in NEGATORS for word in window):
+                    deviation = -deviation * 0.6
+
+                matches.append((" ".join(phrase), NEUTRAL_LEVEL + deviation))
+
+        return matches
+
+    def assess(self, message: str) -> Tuple[ConfidenceAssessment, float]:
+        """Assess a message locally, returning the assessment and a 0-1 certainty"""
+        text = self.normalize(message)
+        matches = [match for clause in self._clauses(message) for match in self._score_matches(clause)]
+
+        if matches:
+            scores = [score for _, score in matches]
+            mean = sum(scores) / len(scores)
+            spread = (sum((score - mean) ** 2 for score in scores) / len(scores)) ** 0.5
+            agreement = max(0.0, 1.0 - spread / 4.5)
+            certainty = min(1.0, 0.35 + 0.2 * len(matches)) * agreement
+        else:
+            mean = NEUTRAL_LEVEL - 0.5
+            certainty = 0.0
+
+        confidence_level = max(1, min(10, int(round(mean))))
+        keywords = [phrase for phrase, _ in matches]
+
+        assessment = ConfidenceAssessment(
+            confidence_level=confidence_level,
+            emotional_state=self._describe_emotional_state(confidence_level, keywords),
+            main_challenge=self._detect_challenge(text),
+            hidden_strengths=self._describe_strengths(confidence_level),
+            best_approach=self._describe_approach(confidence_level)
+        )
+        return assessment, round(certainty, 3)
+
+    @staticmethod
+    def _describe_emotional_state(confidence_level: int, keywords: List[str]) -> str:
+        if "overwhelmed" in keywords:
+            return "overwhelmed and stretched"
+        if any(word in keywords for word in ["scared", "terrified", "nervous", "worried"]):
+            return "anxious and uneasy" if confidence_level <= 5 else "nervous but hopeful"
+        if confidence_level <= 3:
+            return "discouraged and low"
+        if confidence_level <= 5:
+            return "uncertain but trying"
+        if confidence_level <= 7:
+            return "cautiously hopeful"
+        return "motivated and positive"
+
+    @staticmethod
+    def _detect_challenge(text: str) -> str:
+        padded = f" {text} "
+        for challenge, words in TOPIC_KEYWORDS:
+            if any(f" {word}" in padded for word in words):
+                return challenge
+        return "general confidence"
+
+    @staticmethod
+    def _describe_strengths(confidence_level: int) -> str:
+        if confidence_level <= 4:
+            return "self-awareness and courage to reach out"
+        if confidence_level <= 7:
+            return "willingness to keep trying"
+        return "drive and self-belief"
+
+    @staticmethod
+    def _describe_approach(confidence_level: int) -> str:
+        if confidence_level <= 3:
+            return "gentle support"
+        if confidence_level <= 6:
+            return "supportive encouragement"
+        return "action-focused challenge"
+
+
+# Process-wide assessor so repeated messages skip assessment across sessions
+default_assessor = LocalConfidenceAssessor()
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Protocol, Tuple, runtime_checkable
+from assessor import LocalConfidenceAssessor
+from lazy import LazyModule
+from prompts import ConfidencePromptEngine
+
+# The SDK and its gRPC/protobuf stack take most of a second to import; only Gemini sessions need it
+genai = LazyModule("google.generativeai")
+
+logger = logging.getLogger(__name__)
+
+
+@runtime_checkable
+class LLMBackend(Protocol):
+    """What ConfidenceChatbot needs from a text generation model"""
+
+    def generate(self, prompt: str) -> str:
+        ...
+
+    async def generate_async(self, prompt: str) -> str:
+        ...
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        ...
+
+    def generate_stream_async(self, prompt: str) -> AsyncIterator[str]:
+        ...
+
+
+# genai.configure is process-global: every model uses whichever key was configured last
+_configured_api_key: Optional[str] = None
+_configure_lock = threading.Lock()
+
+
+def _configure_genai(api_key: str):
+    """Configure the SDK once; a second, different key would silently switch every existing backend"""
+    global _configured_api_key
+    with _configure_lock:
+        if _configured_api_key == api_key:
+            return
+        if _configured_api_key is not None:
+            raise ValueError("A different Gemini API key is already configured; use one key per process.")
+        genai.configure(api_key=api_key)
+        _configured_api_key = api_key
+
+
+class GeminiBackend:
+    """
+    Google Gemini adapter. The SDK holds one API key per process, so every
+    GeminiBackend in a process must use the same key.
+    """
+
+    def __init__(self, api_key: str, model_name: str = 'gemini-1.5-flash'):
+        _configure_genai(api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self._keepalive_stop: Optional[threading.Event] = None
+
+    def prewarm(self) -> bool:
+        """Open the connection with a cheap token-count call so the first real request doesn't pay for it"""
+        try:
+            self.model.count_tokens("ping")
+            return True
+        except Exception as e:
+            logger.warning(f"Gemini prewarm failed: {str(e)}")
+            return False
+
+    def start_keepalive(self, interval: float = 45.0):
+        """Ping the upstream periodically so idle connections aren't dropped between users"""
+        if self._keepalive_stop is not None:
+            return
+        self._keepalive_stop = threading.Event()
+
+        def keepalive(stop: threading.Event):
+            while not stop.wait(interval):
+                self.prewarm()
+
+        threading.Thread(
+            target=keepalive, args=(self._keepalive_stop,), daemon=True, name="gemini-keepalive"
+        ).start()
+
+    def stop_keepalive(self):
+        if self._keepalive_stop is not None:
+            self._keepalive_stop.set()
+            self._keepalive_stop = None
+
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+
+    async def generate_async(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+    async def generate_stream_async(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+_shared_backends: Dict[Tuple[str, str], GeminiBackend] = {}
+_shared_backends_lock = threading.Lock()
+
+
+def get_shared_gemini_backend(
+    api_key: str,
+    model_name: str = 'gemini-1.5-flash',
+    prewarm: bool = False,
+    keepalive_interval: Optional[float] = None
+) -> GeminiBackend:
+    """Process-wide Gemini client shared by every session.
+
+    genai.configure sets global SDK state, so the key is configured once and a
+    different key raises ValueError rather than switching existing clients over.
+    """
+    key = (api_key, model_name)
+    with _shared_backends_lock:
+        backend = _shared_backends.get(key)
+        if backend is None:
+            backend = GeminiBackend(api_key, model_name)
+            _shared_backends[key] = backend
+            if prewarm:
+                backend.prewarm()
+            if keepalive_interval:
+                backend.start_keepalive(keepalive_interval)
+        return backend
+
+
+class FixedLatency:
+    """Always the same delay"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def sample(self, rng: random.Random) -> float:
+        return self.seconds
+
+
+class UniformLatency:
+    """Delay drawn uniformly between two bounds"""
+
+    def __init__(self, low: float, high: float):
+        self.low = low
+        self.high = high
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.uniform(self.low, self.high)
+
+
+class LogNormalLatency:
+    """Long-tailed delay around a median, like real model latencies"""
+
+    def __init__(self, median: float, sigma: float = 0.5, cap: Optional[float] = None):
+        self.median = median
+        self.sigma = sigma
+        self.cap = cap
+
+    def sample(self, rng: random.Random) -> float:
+        value = rng.lognormvariate(math.log(self.median), self.sigma)
+        return min(value, self.cap) if self.cap is not None else value
+
+
+class FakeServiceUnavailable(ConnectionError):
+    """Injected upstream failure; classified as retryable like a real 503"""
+
+
+class FakeBackend:
+    """
+    Deterministic offline backend for load tests, benchmarks and profiling
+    """
+
+    VAGUE_REPLY = (
+        "Thanks for sharing that with me 🌟 I'd love to understand a bit better. "
+        "What's been on your mind the most lately? And what would feeling more confident look like for you? "
+        "Can you tell me a bit more?"
+    )
+    COACHING_REPLY = (
+        "That sounds like a lot to carry, and it makes complete sense that you feel this way. 💪 "
+        "Plenty of capable people feel exactly like this before something that matters to them.\n\n"
+        "Here's a different way to look at it: the nerves are a sign you care, not a sign you're unprepared.\n\n"
+        "- Write down three moments where you handled something hard\n"
+        "- Practice your opening lines out loud twice today\n"
+        "- Try a two-minute breathing reset before you start\n\n"
+        "You have handled hard things before, and you can handle this one too.\n\n"
+        "What's one small step you could take in the next hour?"
+    )
+    TIPS = [
+        "Nerves mean you care, not that you're unprepared",
+        "Past wins are evidence you can do this",
+        "Small steps build real confidence"
+    ]
+    STEPS = [
+        "Write down three moments you handled something hard",
+        "Practice your opening lines out loud twice today",
+        "Try a two-minute breathing reset"
+    ]
+    MESSAGE_PATTERN = re.compile(r'(?:User message|Message): "(.*?)"', re.DOTALL)
+    BATCH_MESSAGE_PATTERN = re.compile(r'^(\d+)\. (".*")$', re.MULTILINE)
+
+    def __init__(
+        self,
+        latency=None,
+        error_rate: float = 0.0,
+        tokens_per_second: float = 80.0,
+        seed: int = 0
+    ):
+        self.latency = latency or FixedLatency(0.0)
+        self.error_rate = error_rate
+        self.tokens_per_second = tokens_per_second
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._assessor = LocalConfidenceAssessor(cache_size=0)
+        self.calls = 0
+
+    def _next_call(self) -> float:
+        """Count the call, maybe inject an error, and return the latency to simulate"""
+        with self._rng_lock:
+            self.calls += 1
+            fail = self._rng.random() < self.error_rate
+            delay = self.latency.sample(self._rng)
+        if fail:
+            raise FakeServiceUnavailable("Injected upstream failure")
+        return max(0.0, delay)
+
+    def _reply_for(self, prompt: str) -> str:
+        """Canned output shaped like what the prompt asks for"""
+        if '"assessments"' in prompt:
+            assessments = []
+            for number, quoted in self.BATCH_MESSAGE_PATTERN.findall(prompt):
+                assessment, _ = self._assessor.assess(json.loads(quoted))
+                assessments.append({"id": int(number), **assessment.dict()})
+            return json.dumps({"assessments": assessments})
+
+        match = self.MESSAGE_PATTERN.search(prompt)
+        user_message = match.group(1) if match else ""
+        vague = ConfidencePromptEngine.is_vague_message(user_message) if user_message else False
+        assessment, _ = self._assessor.assess(user_message)
+        reply = self.VAGUE_REPLY if vague else self.COACHING_REPLY
+
+        if '"response"' in prompt:
+            envelope = assessment.dict()
+            envelope.update({
+                "response": reply,
+                "confidence_tips": [] if vague else self.TIPS,
+                "next_steps": [] if vague else self.STEPS
+            })
+            return json.dumps(envelope)
+        if '"confidence_level"' in prompt:
+            return json.dumps(assessment.dict())
+        return reply
+
+    def _tokens(self, text: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", text)
+
+    def generate(self, prompt: str) -> str:
+        time.sleep(self._next_call())
+        return self._reply_for(prompt)
+
+    async def generate_async(self, prompt: str) -> str:
+        await asyncio.sleep(self._next_call())
+        return self._reply_for(prompt)
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        # The sampled latency is time to first token; the rest arrives at tokens_per_second
+        time.sleep(self._next_call())
+        for i, token in enumerate(self._tokens(self._reply_for(prompt))):
+            if i and self.tokens_per_second:
+                time.sleep(1.0 / self.tokens_per_second)
+            yield token
+
+    async def generate_stream_async(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self._next_call())
+        for i, token in enumerate(self._tokens(self._reply_for(prompt))):
+            if i and self.tokens_per_second:
+                await asyncio.sleep(1.0 / self.tokens_per_second)
+            yield token
@@ -0,0 +1,266 @@
+"""
+Offline bulk confidence assessment.
+
+Reads JSONL where each line is either an `export_session()` dict or a single
+{"id": ..., "content": ...} message, scores every user message and appends one
+JSON result per message to the output file. Several messages are packed into
+each assessment prompt, at most --concurrency requests are in flight and every
+attempt, retries included, goes through a rate limiter set to --rpm and --tpm.
+Ids must be unique: a repeated id is scored once, from its first row.
+
+The output doubles as the checkpoint: each pack is flushed as soon as it is
+scored, and a rerun with the same output skips every id already written, so an
+interrupted run resumes without paying for finished rows again. Rows that only
+got the fallback reply are left out and picked up by the next run:
+
+    python batch_assess.py exports.jsonl scores.jsonl --concurrency 8 --rpm 300
+    python batch_assess.py exports.jsonl scores.jsonl --local-first
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Set, TextIO, Tuple
+from backends import FakeBackend, LogNormalLatency
+from chatbot import AsyncConfidenceChatbot
+from models import ConfidenceAssessment
+from rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PACK_SIZE = 8
+# Keeps a packed prompt, and the reply listing every assessment, well inside one response
+DEFAULT_PACK_CHARS = 4000
+
+
+class BatchRow(NamedTuple):
+    row_id: str
+    content: str
+
+
+def iter_rows(path: str) -> Iterator[BatchRow]:
+    """User messages from a JSONL file, read one line at a time"""
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping line {line_no}: {str(e)}")
+                continue
+            if not isinstance(record, dict):
+                logger.warning(f"Skipping line {line_no}: not a JSON object")
+                continue
+
+            if isinstance(record.get("full_conversation"), list):
+                # Ids stay stable across re-exports as long as the session id does
+                prefix = record.get("session_id") or f"line{line_no}"
+                for index, message in enumerate(record["full_conversation"]):
+                    if not isinstance(message, dict) or message.get("role") != "user":
+                        continue
+                    content = message.get("content")
+                    if isinstance(content, str) and content.strip():
+                        yield BatchRow(f"{prefix}:{index}", content)
+            elif isinstance(record.get("content"), str) and record["content"].strip():
+                yield BatchRow(str(record.get("id", f"line{line_no}")), record["content"])
+            else:
+                logger.warning(f"Skipping line {line_no}: no user messages found")
+
+
+def iter_packs(rows: Iterable[BatchRow], pack_size: int, pack_chars: int) -> Iterator[List[BatchRow]]:
+    """Group rows into packs of at most pack_size messages and roughly pack_chars characters"""
+    pack: List[BatchRow] = []
+    chars = 0
+    for row in rows:
+        if pack and (len(pack) >= pack_size or chars + len(row.content) > pack_chars):
+            yield pack
+            pack, chars = [], 0
+        pack.append(row)
+        chars += len(row.content)
+    if pack:
+        yield pack
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Ids already written to the output; a line torn by a crash is cut off"""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        complete = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            complete += len(line)
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError, TypeError):
+                continue
+        f.truncate(complete)
+    return done
+
+
+class BatchAssessor:
+    """Scores a JSONL archive with bounded concurrency, appending results as packs finish"""
+
+    def __init__(
+        self,
+        chatbot: AsyncConfidenceChatbot,
+        concurrency: int = 4,
+        pack_size: int = DEFAULT_PACK_SIZE,
+        pack_chars: int = DEFAULT_PACK_CHARS,
+        local_first: bool = False
+    ):
+        self.chatbot = chatbot
+        self.concurrency = max(1, concurrency)
+        self.pack_size = max(1, pack_size)
+        self.pack_chars = pack_chars
+        self.local_first = local_first
+
+        self.stats = {"rows": 0, "skipped": 0, "duplicates": 0, "local": 0, "assessed": 0, "failed": 0, "requests": 0}
+        self._out: Optional[TextIO] = None
+
+    async def run(self, input_path: str, output_path: str, restart: bool = False) -> dict:
+        started = time.perf_counter()
+        done = set() if restart else load_checkpoint(output_path)
+        if done:
+            logger.info(f"Resuming: {len(done)} rows already in {output_path}")
+
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight: Set[asyncio.Future] = set()
+        with open(output_path, "w" if restart else "a", encoding="utf-8") as out:
+            self._out = out
+            try:
+                # Packs are built as the input is read, so memory stays flat however big the archive
+                for pack in iter_packs(self._pending_rows(input_path, done), self.pack_size, self.pack_chars):
+                    await slots.acquire()
+                    task = asyncio.ensure_future(self._run_pack(pack, slots))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                if in_flight:
+                    await asyncio.gather(*in_flight)
+            finally:
+                for task in in_flight:
+                    task.cancel()
+                self._out = None
+
+        elapsed = time.perf_counter() - started
+        scored = self.stats["local"] + self.stats["assessed"]
+        return {
+            **self.stats,
+            "elapsed_s": round(elapsed, 2),
+            "rows_per_s": round(scored / elapsed, 1) if elapsed else 0.0
+        }
+
+    def _pending_rows(self, input_path: str, done: Set[str]) -> Iterator[BatchRow]:
+        """Rows still to score; confident local scores are written straight away when enabled"""
+        seen: Set[str] = set()
+        for row in iter_rows(input_path):
+            self.stats["rows"] += 1
+            if row.row_id in done:
+                self.stats["skipped"] += 1
+                continue
+            # Ids key the checkpoint, so only the first row with an id is scored
+            if row.row_id in seen:
+                self.stats["duplicates"] += 1
+                logger.warning(f"Skipping row {row.row_id}: id already seen in this input")
+                continue
+            seen.add(row.row_id)
+            if self.local_first:
+                assessment, certainty = self.chatbot.local_assessor.assess(row.content)
+                if certainty >= self.chatbot.local_certainty_threshold:
+                    self._write([(row, assessment, "local")])
+                    continue
+            yield row
+
+    async def _run_pack(self, pack: List[BatchRow], slots: asyncio.Semaphore):
+        try:
+            results = await self._assess_pack(pack)
+        except Exception as e:
+            logger.error(f"Pack of {len(pack)} rows failed: {str(e)}")
+            results = [(row, None, "") for row in pack]
+        finally:
+            slots.release()
+        self._write(results)
+
+    async def _assess_pack(self, pack: List[BatchRow]) -> List[Tuple[BatchRow, Optional[ConfidenceAssessment], str]]:
+        if len(pack) == 1:
+            return [(pack[0], await self._assess_single(pack[0].content), "llm")]
+
+        self.stats["requests"] += 1
+        assessments = await self.chatbot.assess_messages([row.content for row in pack])
+        if not any(assessments):
+            # Nothing usable at all, most likely the fallback reply: leave the pack to the next run
+            return [(row, None, "") for row in pack]
+
+        results = []
+        for row, assessment in zip(pack, assessments):
+            if assessment is not None:
+                results.append((row, assessment, "llm_batch"))
+            else:
+                # Missing or malformed entry: ask about this message on its own
+                results.append((row, await self._assess_single(row.content), "llm"))
+        return results
+
+    async def _assess_single(self, content: str) -> Optional[ConfidenceAssessment]:
+        self.stats["requests"] += 1
+        return await self.chatbot.assess_message(content)
+
+    def _write(self, results: List[Tuple[BatchRow, Optional[ConfidenceAssessment], str]]):
+        for row, assessment, source in results:
+            if assessment is None:
+                # Not checkpointed, so the next run retries it
+                self.stats["failed"] += 1
+                continue
+            self.stats["local" if source == "local" else "assessed"] += 1
+            self._out.write(json.dumps({"id": row.row_id, "source": source, **assessment.dict()}, ensure_ascii=False) + "\n")
+        self._out.flush()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Assess every user message in a JSONL archive, resumably")
+    parser.add_argument("input", help="JSONL of export_session() dicts or {\"id\", \"content\"} messages")
+    parser.add_argument("output", help="JSONL of results; rows already in it are skipped")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--rpm", type=float, default=60.0, help="requests per minute (0 = unlimited)")
+    parser.add_argument("--tpm", type=float, default=0, help="estimated tokens per minute (0 = unlimited)")
+    parser.add_argument("--pack-size", type=int, default=DEFAULT_PACK_SIZE, help="messages per assessment prompt")
+    parser.add_argument("--pack-chars", type=int, default=DEFAULT_PACK_CHARS, help="message characters per prompt")
+    parser.add_argument("--local-first", action="store_true", help="only send messages the local assessor is unsure about")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and overwrite the output")
+    parser.add_argument("--fake", action="store_true", help="use FakeBackend instead of Gemini, for dry runs")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("chatbot").setLevel(logging.WARNING)
+
+    backend = FakeBackend(LogNormalLatency(0.8, cap=4.0)) if args.fake else None
+    # The run gets its own quota instead of sharing the interactive app's
+    chatbot = AsyncConfidenceChatbot(backend=backend, rate_limiter=RateLimiter(args.rpm, args.tpm))
+    assessor = BatchAssessor(
+        chatbot,
+        concurrency=args.concurrency,
+        pack_size=args.pack_size,
+        pack_chars=args.pack_chars,
+        local_first=args.local_first
+    )
+    summary = asyncio.run(assessor.run(args.input, args.output, restart=args.restart))
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{summary['rows']} rows: {summary['skipped']} already done, {summary['duplicates']} duplicate ids, "
+              f"{summary['local']} scored locally, "
+              f"{summary['assessed']} by the model in {summary['requests']} requests, {summary['failed']} failed")
+        print(f"{summary['elapsed_s']} s, {summary['rows_per_s']} rows/s")
+
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Latency and allocation benchmarks for the coaching pipeline.
+
+Runs each stage of ConfidenceChatbot.generate_response, and the whole turn,
+against FakeBackend with a fixed simulated model latency, then reports
+p50/p95/p99 and allocations per call. Results can be saved as a JSON
+baseline and later compared against it:
+
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+from backends import FakeBackend, FixedLatency
+from chatbot import ConfidenceChatbot
+from models import AIResponse, ChatSession, ConfidenceAssessment, UserMessage
+
+MESSAGES = [
+    "I'm nervous about my job interview tomorrow and I don't think I'm qualified",
+    "feeling lost",
+    "I want to start my own business but I'm not sure if it's the right time",
+    "I got promoted but now I'm worried about imposter syndrome with my new team",
+    "I have no income right now and I feel useless",
+    "I'm excited and ready for my presentation next week!",
+]
+
+SAMPLE_REPLY = FakeBackend.COACHING_REPLY
+
+# A stage counts as regressed when its p95 is this much slower, plus the run-to-run noise below
+DEFAULT_TOLERANCE = 0.25
+# Timings are split into this many rounds; the spread of their p95s is the stage's measured noise
+ROUNDS = 5
+NOISE_SIGMAS = 3.0
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure(func: Callable[[int], object], iterations: int, warmup: int = 5) -> Dict[str, float]:
+    """Time func(i) and measure its allocations; times are in microseconds"""
+    for i in range(warmup):
+        func(i)
+
+    timings = []
+    round_p95s = []
+    round_size = max(1, iterations // ROUNDS)
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        timings.append((time.perf_counter() - start) * 1e6)
+        if len(timings) % round_size == 0:
+            round_p95s.append(percentile(timings[-round_size:], 95))
+
+    # Allocations are measured in a separate pass so tracing doesn't skew the timings
+    alloc_runs = max(1, min(iterations, 50))
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(alloc_runs):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            func(i)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+        snapshot_before = tracemalloc.take_snapshot()
+        for i in range(alloc_runs):
+            func(i)
+        snapshot_after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    new_blocks = sum(
+        stat.count_diff for stat in snapshot_after.compare_to(snapshot_before, "filename") if stat.count_diff > 0
+    )
+
+    return {
+        "iterations": iterations,
+        "mean_us": round(statistics.fmean(timings), 2),
+        "p50_us": round(percentile(timings, 50), 2),
+        # Median of the rounds' p95s, so a burst of interference in one round doesn't move it
+        "p95_us": round(statistics.median(round_p95s), 2),
+        "p95_stdev_us": round(statistics.stdev(round_p95s), 2) if len(round_p95s) > 1 else 0.0,
+        "p99_us": round(percentile(timings, 99), 2),
+        "alloc_peak_bytes": int(statistics.fmean(peaks)),
+        "retained_blocks": round(new_blocks / alloc_runs, 2),
+    }
+
+
+def build_chatbot(latency: float, response_mode: str, assessment_mode: str) -> ConfidenceChatbot:
+    return ConfidenceChatbot(
+        backend=FakeBackend(latency=FixedLatency(latency)),
+        response_mode=response_mode,
+        assessment_mode=assessment_mode
+    )
+
+
+def run_benchmarks(iterations: int, latency: float, response_mode: str, assessment_mode: str) -> Dict[str, Dict[str, float]]:
+    bot = build_chatbot(latency, response_mode, assessment_mode)
+    for i in range(6):
+        bot.session.add_message("user", MESSAGES[i % len(MESSAGES)])
+        bot.session.add_message("assistant", SAMPLE_REPLY, 5)
+
+    assessment = ConfidenceAssessment(
+        confidence_level=4,
+        emotional_state="anxious and uneasy",
+        main_challenge="job interview nerves",
+        hidden_strengths="self-awareness",
+        best_approach="supportive encouragement"
+    )
+
+    def message(i: int) -> str:
+        return MESSAGES[i % len(MESSAGES)]
+
+    def assess(i: int):
+        return bot._assess_confidence(message(i))
+
+    def build_context(i: int):
+        return bot._build_context()
+
+    def prompt_assembly(i: int):
+        return bot._build_response_prompt(message(i), 4)
+
+    def model_construction(i: int):
+        return AIResponse(
+            response=SAMPLE_REPLY,
+            confidence_level=assessment.confidence_level,
+            assessment=ConfidenceAssessment(**assessment.dict())
+        )
+
+    def extract_tips_and_steps(i: int):
+        return AIResponse(response=SAMPLE_REPLY, confidence_level=4).extract_tips_and_steps()
+
+    session = ChatSession()
+
+    def session_add_message(i: int):
+        session.add_message("assistant" if i % 2 else "user", SAMPLE_REPLY, 5 if i % 2 else None)
+
+    turn_bot = build_chatbot(latency, response_mode, assessment_mode)
+
+    def full_turn(i: int):
+        # Keep history bounded so every turn does comparable work
+        if i % 20 == 0:
+            turn_bot.reset_session()
+        return turn_bot.generate_response(UserMessage(content=message(i)))
+
+    stages = {
+        "assess_confidence": assess,
+        "build_context": build_context,
+        "prompt_assembly": prompt_assembly,
+        "model_construction": model_construction,
+        "extract_tips_and_steps": extract_tips_and_steps,
+        "session_add_message": session_add_message,
+    }
+
+    results = {}
+    for name, func in stages.items():
+        # Stages that wait on the simulated model need fewer iterations
+        runs = max(20, iterations // 20) if name == "assess_confidence" and assessment_mode == "llm" else iterations
+        results[name] = measure(func, runs)
+    results["full_turn"] = measure(full_turn, max(20, iterations // 20))
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Stages whose p95 regressed beyond the tolerance"""
+    regressions = []
+    for name, stats in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        # Scaled to the stage's own noise, so microsecond stages are gated as tightly as slow ones
+        noise = max(reference.get("p95_stdev_us", 0.0), stats["p95_stdev_us"])
+        allowed = reference["p95_us"] * (1 + tolerance) + NOISE_SIGMAS * noise
+        if stats["p95_us"] > allowed:
+            regressions.append(
+                f"{name}: p95 {stats['p95_us']:.1f}us vs baseline {reference['p95_us']:.1f}us"
+            )
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]]):
+    header = f"{'stage':<24}{'p50 us':>12}{'p95 us':>12}{'p99 us':>12}{'peak B':>10}{'blocks':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in results.items():
+        print(
+            f"{name:<24}{stats['p50_us']:>12.1f}{stats['p95_us']:>12.1f}{stats['p99_us']:>12.1f}"
+            f"{stats['alloc_peak_bytes']:>10}{stats['retained_blocks']:>9}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the confidence coaching pipeline")
+    parser.add_argument("--iterations", type=int, default=2000, help="iterations per in-process stage")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated model latency in seconds")
+    parser.add_argument("--response-mode", default="two_call", choices=ConfidenceChatbot.RESPONSE_MODES)
+    parser.add_argument("--assessment-mode", default="llm", choices=ConfidenceChatbot.ASSESSMENT_MODES)
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="fail if any stage regressed against this baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed p95 slowdown (0.25 = 25%%)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.iterations, args.latency, args.response_mode, args.assessment_mode)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+    config = {
+        "iterations": args.iterations,
+        "latency": args.latency,
+        "response_mode": args.response_mode,
+        "assessment_mode": args.assessment_mode
+    }
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "config": config,
+                "results": results
+            }, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            # Numbers from a different setup would pass or fail for the wrong reason
+            print(f"Baseline was recorded with {baseline.get('config')}, this run used {config}; not comparing")
+            return 2
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("No regressions against baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+from typing import List, Sequence, Tuple
+
+
+def lttb_downsample(values: Sequence[float], threshold: int) -> Tuple[List[int], List[float]]:
+    """Largest-Triangle-Three-Buckets downsampling.
+
+    Returns 1-based x positions and values, keeping the first and last points
+    and the visually most significant point from each bucket in between.
+    """
+    count = len(values)
+    if threshold >= count or threshold < 3:
+        return list(range(1, count + 1)), list(values)
+
+    xs = [1]
+    ys = [values[0]]
+    bucket_size = (count - 2) / (threshold - 2)
+    anchor = 0
+
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # Average of the next bucket is the third corner of the triangle
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        next_span = max(1, next_end - next_start)
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = sum(values[next_start:next_end]) / next_span if next_end > next_start else values[-1]
+
+        anchor_y = values[anchor]
+        best_area = -1.0
+        best_index = start
+        for index in range(start, end):
+            area = abs(
+                (anchor - avg_x) * (values[index] - anchor_y)
+                - (anchor - index) * (avg_y - anchor_y)
+            )
+            if area > best_area:
+                best_area = area
+                best_index = index
+
+        xs.append(best_index + 1)
+        ys.append(values[best_index])
+        anchor = best_index
+
+    xs.append(count)
+    ys.append(values[-1])
+    return xs, ys
+
+
+def render_sparkline_svg(
+    values: Sequence[float],
+    width: int = 260,
+    height: int = 60,
+    low: float = 1,
+    high: float = 10,
+    color: str = "#667eea"
+) -> str:
+    """Inline SVG sparkline of confidence levels, a few hundred bytes however long the history"""
+    if not values:
+        return ""
+
+    xs, ys = lttb_downsample(values, max(3, width // 4))
+    pad = 4
+    span_x = max(1, xs[-1] - xs[0])
+    span_y = max(1e-9, high - low)
+
+    def point(x: float, y: float) -> str:
+        px = pad + (x - xs[0]) / span_x * (width - 2 * pad)
+        py = height - pad - (min(high, max(low, y)) - low) / span_y * (height - 2 * pad)
+        return f"{px:.1f},{py:.1f}"
+
+    points = " ".join(point(x, y) for x, y in zip(xs, ys))
+    last_x, last_y = point(xs[-1], ys[-1]).split(",")
+    return (
+        f'<svg width="100%" viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" role="img" '
+        f'aria-label="Confidence trend, latest {ys[-1]:g}/10">'
+        f'<polyline fill="none" stroke="{color}" stroke-width="2.5" stroke-linejoin="round" points="{points}"/>'
+        f'<circle cx="{last_x}" cy="{last_y}" r="3.5" fill="#764ba2"/>'
+        f'</svg>'
+    )
@@ -1,51 +1,315 @@
-import google.generativeai as genai
 import os
 import json
+import hashlib
 import logging
-from typing import Optional
-from models import UserMessage, AIResponse, ConfidenceAssessment, ChatSession, PromptData
+import asyncio
+import threading
+import time
+import contextvars
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO, Dict, Iterable, Iterator, List, Optional, Union
+from models import UserMessage, AIResponse, ConfidenceAssessment, ChatSession, PromptData, parse_json_lenient
 from prompts import ConfidencePromptEngine
-from dotenv import load_dotenv
-load_dotenv()
+from assessor import LocalConfidenceAssessor, default_assessor
+from response_cache import ResponseCache
+from backends import LLMBackend, get_shared_gemini_backend
+from session_store import SessionStore
+from session_export import import_session, iter_export_chunks
+from memory import CHARS_PER_TOKEN, ConversationMemory
+from rate_limit import RateLimiter, RateLimitTimeout, gemini_rate_limiter
+from singleflight import async_model_request_flights, model_request_flights
+import metrics
+from resilience import (
+    CircuitBreaker, Deadline, RetryPolicy, aiter_within_deadline, call_with_timeout, current_deadline,
+    gemini_circuit_breaker, is_retryable_error, iter_within_deadline, turn_deadline
+)
+from lazy import load_env
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stateless, so one instance serves every session
+shared_prompt_engine = ConfidencePromptEngine()
+
 class ConfidenceChatbot:
     """
     Main chatbot class that handles confidence coaching conversations
     """
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the chatbot with Gemini AI"""
+    ASSESSMENT_MODES = ("llm", "local")
+    RESPONSE_MODES = ("two_call", "combined")
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        assessment_mode: str = "llm",
+        local_certainty_threshold: float = 0.6,
+        local_assessor: Optional[LocalConfidenceAssessor] = None,
+        response_mode: str = "two_call",
+        speculative: bool = False,
+        speculation_tolerance: int = 1,
+        response_cache: Optional[ResponseCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        backend: Optional[LLMBackend] = None,
+        session_store: Optional[SessionStore] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        coalesce_requests: bool = True
+    ):
+        """Initialize the chatbot with Gemini AI, or any other backend"""
         # Get API key from environment or parameter
+        load_env()
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
-        if not self.api_key:
+        if backend is None and not self.api_key:
             raise ValueError("Gemini API key is required. Set GEMINI_API_KEY environment variable.")
         
-        # Configure Gemini
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        if assessment_mode not in self.ASSESSMENT_MODES:
+            raise ValueError(f"Unknown assessment mode '{assessment_mode}'. Use one of {self.ASSESSMENT_MODES}.")
+        
+        # "local" scores messages in-process and only asks Gemini when unsure
+        self.assessment_mode = assessment_mode
+        self.local_certainty_threshold = local_certainty_threshold
+        self.local_assessor = local_assessor or default_assessor
+        
+        if response_mode not in self.RESPONSE_MODES:
+            raise ValueError(f"Unknown response mode '{response_mode}'. Use one of {self.RESPONSE_MODES}.")
+        
+        # "combined" gets the assessment and the reply back from one request
+        self.response_mode = response_mode
+        
+        # Speculative mode drafts the reply while the assessment is still running
+        self.speculative = speculative
+        self.speculation_tolerance = speculation_tolerance
+        
+        # Replies to opening messages can be shared between sessions. Entries are keyed on the local
+        # assessor's estimate, so a hit skips every model call, the assessment included, in any mode.
+        self.response_cache = response_cache
         
-        # Initialize session tracking
+        # Both calls in a turn share one deadline. Gemini sessions share the process-wide breaker;
+        # other backends get their own, so their faults can't trip it for real Gemini sessions.
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None else (
+            gemini_circuit_breaker if backend is None else CircuitBreaker()
+        )
+        
+        # The model client is shared process-wide; only the session below is per user
+        self.backend = backend or get_shared_gemini_backend(self.api_key)
+        
+        # Gemini sessions share the API key's quota; other backends are unlimited unless given a limiter.
+        # A lower weight gives this chatbot a smaller share when requests have to queue.
+        self.rate_limiter = rate_limiter if rate_limiter is not None else (gemini_rate_limiter if backend is None else None)
+        self.rate_limit_weight = 1.0
+        
+        # Identical prompts in flight at the same time share one upstream call
+        self.coalesce_requests = coalesce_requests
+        
+        # Initialize session tracking; turns are also persisted when a store is given
         self.session = ChatSession()
-        self.prompt_engine = ConfidencePromptEngine()
+        self.session_store = session_store
+        self.memory = ConversationMemory()
+        self.prompt_engine = shared_prompt_engine
         
         logger.info("ConfidenceChatbot initialized successfully")
     
-    def _make_ai_request(self, prompt: str, max_retries: int = 3) -> str:
-        """Make request to Gemini AI with error handling"""
-        for attempt in range(max_retries):
+    def _make_ai_request(self, prompt: str, max_retries: Optional[int] = None) -> str:
+        """Make request to Gemini AI, sharing one call between identical concurrent prompts"""
+        if not self.coalesce_requests:
+            return self._send_ai_request(prompt, max_retries)
+        
+        deadline = current_deadline()
+        started = time.perf_counter()
+        try:
+            text, shared = model_request_flights.do(
+                self._request_key(prompt), self._send_ai_request, prompt, max_retries,
+                timeout=deadline.remaining() if deadline is not None else None
+            )
+        except TimeoutError:
+            # Another session's identical request is still running and this turn can't wait for it
+            logger.warning("Shared request outlasted the turn deadline, serving fallback response")
+            fallback = self._get_fallback_response()
+            # Observed like a circuit-open fallback, with no attempts, so every fallback counts as a request
+            self._observe_request("sync", prompt, len(fallback), 0, started, "deadline")
+            return fallback
+        if shared:
+            metrics.ai_coalesced_requests_total.inc()
+        return text
+    
+    def _request_key(self, prompt: str) -> tuple:
+        """Requests coalesce when they'd send the same prompt to the same backend"""
+        return id(self.backend), hashlib.sha256(prompt.encode("utf-8")).digest()
+    
+    def _send_ai_request(self, prompt: str, max_retries: Optional[int] = None) -> str:
+        """Make request to Gemini AI with retries, timeouts and the circuit breaker"""
+        attempts = max_retries or self.retry_policy.max_attempts
+        deadline = current_deadline()
+        started = time.perf_counter()
+        attempts_made = 0
+        fallback_reason = "error"
+        
+        for attempt in range(attempts):
+            # Checked before the breaker, so a spent turn never takes the half-open probe
+            if deadline is not None and deadline.expired:
+                logger.warning("Turn deadline exhausted, serving fallback response")
+                fallback_reason = "deadline"
+                break
+            if not self.circuit_breaker.allow_request():
+                logger.warning("Circuit open, serving fallback response")
+                fallback_reason = "circuit_open"
+                break
+            
+            timeout = self.retry_policy.attempt_timeout
+            try:
+                # Inside the try, so giving up on the queue also hands back a half-open probe
+                if not self._acquire_rate_limit(prompt, deadline):
+                    fallback_reason = "rate_limited"
+                    break
+                attempts_made += 1
+                timeout = self.retry_policy.attempt_timeout_within(deadline)
+                text = call_with_timeout(self.backend.generate, prompt, timeout=timeout)
+                self.circuit_breaker.record_success()
+                self._settle_rate_limit(len(text))
+                self._observe_request("sync", prompt, len(text), attempts_made, started)
+                return text
+            except Exception as e:
+                retryable = self._record_request_error(e, attempt, timeout)
+                delay = self._get_retry_delay(attempt, attempts, deadline) if retryable else None
+            finally:
+                # A probe that ended without an outcome would otherwise hold the breaker half-open
+                self.circuit_breaker.release_probe()
+            if delay is None:
+                break
+            time.sleep(delay)
+        
+        fallback = self._get_fallback_response()
+        self._observe_request("sync", prompt, len(fallback), attempts_made, started, fallback_reason)
+        return fallback
+    
+    def _acquire_rate_limit(self, prompt: str, deadline: Optional[Deadline]) -> bool:
+        """Wait for room in the shared upstream quota; False when the turn can't afford the wait"""
+        if self.rate_limiter is None:
+            return True
+        try:
+            self.rate_limiter.acquire(
+                self.session.session_id, self.rate_limiter.estimate(prompt),
+                weight=self.rate_limit_weight, priority=self._is_opening_turn(),
+                timeout=deadline.remaining() if deadline is not None else None
+            )
+            return True
+        except RateLimitTimeout:
+            logger.warning("Rate-limit wait outlasted the turn deadline, serving fallback response")
+            return False
+    
+    def _settle_rate_limit(self, response_chars: int):
+        """Charge the limiter for the reply's real size instead of the estimate"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.settle((response_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+    
+    def _observe_request(
+        self,
+        call: str,
+        prompt: str,
+        response_chars: int,
+        attempts_made: int,
+        started: float,
+        fallback_reason: Optional[str] = None,
+        outcome: Optional[str] = None
+    ):
+        """Record latency, sizes and attempts for one AI request"""
+        outcome = outcome or ("fallback" if fallback_reason else "success")
+        metrics.ai_request_seconds.observe(time.perf_counter() - started, call=call, outcome=outcome)
+        metrics.ai_request_attempts.observe(attempts_made)
+        metrics.ai_prompt_chars.observe(len(prompt))
+        metrics.ai_response_chars.observe(response_chars)
+        if fallback_reason:
+            metrics.ai_fallbacks_total.inc(reason=fallback_reason)
+    
+    def _record_request_error(self, error: Exception, attempt: int, timeout: float) -> bool:
+        """Log a failed attempt, update the circuit breaker and say whether to retry"""
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError)) and timeout < self.retry_policy.attempt_timeout:
+            # The turn's deadline cut the attempt short, which says nothing about the upstream's health
+            logger.warning(f"AI request attempt {attempt + 1} stopped at the turn deadline after {timeout:.1f}s")
+            return False
+        
+        retryable = is_retryable_error(error)
+        if retryable:
+            self.circuit_breaker.record_failure()
+        else:
+            # The upstream answered, it just refused this request
+            self.circuit_breaker.record_success()
+        
+        kind = "retryable" if retryable else "fatal"
+        logger.warning(f"AI request attempt {attempt + 1} failed ({kind}): {str(error)}")
+        return retryable
+    
+    def _get_retry_delay(self, attempt: int, attempts: int, deadline: Optional[Deadline]) -> Optional[float]:
+        """Backoff before the next attempt, or None when there is no room for one"""
+        if attempt >= attempts - 1:
+            return None
+        delay = self.retry_policy.backoff_delay(attempt)
+        if deadline is not None and delay >= deadline.remaining():
+            return None
+        return delay
+    
+    def _stream_ai_request(self, prompt: str, max_retries: Optional[int] = None) -> Iterator[str]:
+        """Stream a Gemini response chunk by chunk with the same fallback as _make_ai_request"""
+        attempts = max_retries or self.retry_policy.max_attempts
+        deadline = current_deadline()
+        started = time.perf_counter()
+        attempts_made = 0
+        fallback_reason = "error"
+        
+        for attempt in range(attempts):
+            # Checked before the breaker, so a spent turn never takes the half-open probe
+            if deadline is not None and deadline.expired:
+                logger.warning("Turn deadline exhausted, serving fallback response")
+                fallback_reason = "deadline"
+                break
+            if not self.circuit_breaker.allow_request():
+                logger.warning("Circuit open, serving fallback response")
+                fallback_reason = "circuit_open"
+                break
+            
+            emitted_chars = 0
+            timeout = self.retry_policy.attempt_timeout
             try:
-                response = self.model.generate_content(prompt)
-                return response.text
+                # Inside the try, so giving up on the queue also hands back a half-open probe
+                if not self._acquire_rate_limit(prompt, deadline):
+                    fallback_reason = "rate_limited"
+                    break
+                attempts_made += 1
+                chunks = iter(self.backend.generate_stream(prompt))
+                while True:
+                    # Each chunk gets the attempt timeout, so a stalled stream can't hang the turn
+                    timeout = self.retry_policy.attempt_timeout_within(deadline)
+                    chunk = call_with_timeout(next, chunks, None, timeout=timeout)
+                    if chunk is None:
+                        break
+                    if chunk:
+                        emitted_chars += len(chunk)
+                        yield chunk
+                self.circuit_breaker.record_success()
+                self._settle_rate_limit(emitted_chars)
+                self._observe_request("stream", prompt, emitted_chars, attempts_made, started)
+                return
             except Exception as e:
-                logger.warning(f"AI request attempt {attempt + 1} failed: {str(e)}")
-                if attempt == max_retries - 1:
-                    return self._get_fallback_response()
+                retryable = self._record_request_error(e, attempt, timeout)
+                # Text already shown to the user can't be retried
+                if emitted_chars:
+                    self._observe_request("stream", prompt, emitted_chars, attempts_made, started, outcome="interrupted")
+                    return
+                delay = self._get_retry_delay(attempt, attempts, deadline) if retryable else None
+            finally:
+                # A probe that ended without an outcome would otherwise hold the breaker half-open
+                self.circuit_breaker.release_probe()
+            if delay is None:
+                break
+            time.sleep(delay)
         
-        return self._get_fallback_response()
+        fallback = self._get_fallback_response()
+        self._observe_request("stream", prompt, len(fallback), attempts_made, started, fallback_reason)
+        yield fallback
     
     def _get_fallback_response(self) -> str:
         """Fallback response when AI fails"""
@@ -59,24 +323,14 @@ What's one small thing you can do today to take care of yourself, make sure you
 
     def _assess_confidence(self, user_message: str) -> ConfidenceAssessment:
         """Analyze user message for confidence indicators"""
+        if self.assessment_mode == "local":
+            return self._assess_confidence_locally(user_message)
+        
         assessment_prompt = self.prompt_engine.get_confidence_assessment_prompt(user_message)
         
         try:
             response = self._make_ai_request(assessment_prompt)
-            
-            # Try to parse JSON response
-            if response.strip().startswith('{'):
-                return ConfidenceAssessment.from_json_string(response)
-            else:
-                # If not JSON, extract confidence level from text
-                confidence_level = self._extract_confidence_from_text(response)
-                return ConfidenceAssessment(
-                    confidence_level=confidence_level,
-                    emotional_state="processing",
-                    main_challenge="general confidence",
-                    hidden_strengths="self-awareness and courage to reach out",
-                    best_approach="supportive encouragement"
-                )
+            return self._parse_assessment_response(response)
                 
         except Exception as e:
             logger.error(f"Assessment failed: {str(e)}")
@@ -88,6 +342,72 @@ What's one small thing you can do today to take care of yourself, make sure you
                 best_approach="gentle support"
             )
     
+    def _assess_confidence_locally(self, user_message: str) -> ConfidenceAssessment:
+        """Assess in-process, falling back to Gemini only when the local result is uncertain"""
+        cached = self.local_assessor.get_cached(user_message)
+        if cached is not None:
+            return cached
+        
+        assessment, certainty = self.local_assessor.assess(user_message)
+        if certainty < self.local_certainty_threshold:
+            logger.info(f"Local assessment certainty {certainty} below threshold, asking Gemini")
+            try:
+                response = self._make_ai_request(
+                    self.prompt_engine.get_confidence_assessment_prompt(user_message)
+                )
+                # Keep the local estimate rather than memoizing an outage
+                if response == self._get_fallback_response():
+                    return assessment
+                assessment = self._parse_assessment_response(response)
+            except Exception as e:
+                logger.error(f"Assessment failed: {str(e)}")
+                return assessment
+        
+        self.local_assessor.remember(user_message, assessment)
+        return assessment
+    
+    def _parse_assessment_response(self, response: str) -> ConfidenceAssessment:
+        """Turn a raw assessment reply into a ConfidenceAssessment"""
+        # Try to parse JSON response (possibly wrapped in a code fence)
+        if '{' in response:
+            return ConfidenceAssessment.from_json_string(response)
+        
+        # If not JSON, extract confidence level from text
+        confidence_level = self._extract_confidence_from_text(response)
+        return ConfidenceAssessment(
+            confidence_level=confidence_level,
+            emotional_state="processing",
+            main_challenge="general confidence",
+            hidden_strengths="self-awareness and courage to reach out",
+            best_approach="supportive encouragement"
+        )
+    
+    def assess_message(self, user_message: str) -> Optional[ConfidenceAssessment]:
+        """The model's assessment of one message, or None when it didn't give a usable one"""
+        response = self._make_ai_request(self.prompt_engine.get_confidence_assessment_prompt(user_message))
+        return self._parse_strict_assessment_response(response)
+    
+    def assess_messages(self, user_messages: List[str]) -> List[Optional[ConfidenceAssessment]]:
+        """Model assessments for several messages from one request, in order; None where none came back"""
+        response = self._make_ai_request(self.prompt_engine.get_batch_assessment_prompt(user_messages))
+        return self._parse_batch_assessment_response(response, len(user_messages))
+    
+    def _parse_strict_assessment_response(self, response: str) -> Optional[ConfidenceAssessment]:
+        """Like _parse_assessment_response, but None instead of a guessed assessment"""
+        data = parse_json_lenient(response) if response != self._get_fallback_response() else None
+        if data is None:
+            return None
+        try:
+            return ConfidenceAssessment(**data)
+        except (TypeError, ValueError):
+            return None
+    
+    def _parse_batch_assessment_response(self, response: str, count: int) -> List[Optional[ConfidenceAssessment]]:
+        if response == self._get_fallback_response():
+            return [None] * count
+        assessments = ConfidenceAssessment.from_batch_json(response, count)
+        return [assessments.get(number) for number in range(1, count + 1)]
+    
     def _extract_confidence_from_text(self, text: str) -> int:
         """Extract confidence level from text response"""
         # Look for numbers 1-10 in the text
@@ -99,96 +419,269 @@ What's one small thing you can do today to take care of yourself, make sure you
         
         # Fallback based on keywords
         text_lower = text.lower()
-        if any(word in text_lower for word in ['very low', 'terrible', 'awful', 'hopeless']):
-            return 2
-        elif any(word in text_lower for word in ['low', 'down', 'struggling', 'difficult']):
-            return 4
-        elif any(word in text_lower for word in ['okay', 'fine', 'average', 'neutral']):
-            return 5
-        elif any(word in text_lower for word in ['good', 'positive', 'better', 'confident']):
-            return 7
-        elif any(word in text_lower for word in ['great', 'excellent', 'amazing', 'fantastic']):
-            return 9
+        for level, words in self.prompt_engine.get_confidence_level_keywords():
+            if any(word in text_lower for word in words):
+                return level
         
         return 5  
     
     def generate_response(self, user_message: UserMessage) -> AIResponse:
         """Generate a complete confidence coaching response"""
+        with turn_deadline(self.retry_policy.turn_timeout):
+            return self._generate_response(user_message)
+    
+    def _generate_response(self, user_message: UserMessage) -> AIResponse:
         try:
-            
-            assessment = self._assess_confidence(user_message.content)
-            
-            context = self._build_context()
-            response_prompt = self.prompt_engine.get_response_prompt(
-                user_message.content, 
-                assessment.confidence_level, 
-                context
-            )
-            
-            # i added system prompt for consistency
-            full_prompt = f"""
-            {self.prompt_engine.get_system_prompt()}
-            
-            {response_prompt}
-            """
-            
-            ai_response_text = self._make_ai_request(full_prompt)
-            
-             # structured response
-            ai_response = AIResponse(
-                response=ai_response_text,
-                confidence_level=assessment.confidence_level,
-                assessment=assessment
-            )
-            
-            # Extract tips and steps from response
-            ai_response.extract_tips_and_steps()
+            # Looked up before any model call, so a hit costs no round trip whatever the mode
+            ai_response = self._lookup_cached_reply(user_message.content)
+            if ai_response is None:
+                if self.response_mode == "combined":
+                    ai_response = self._generate_combined_response(user_message.content)
+                else:
+                    ai_response = self._generate_two_call_response(user_message.content)
             
             # Update session tracking
-            self.session.add_message("user", user_message.content)
-            self.session.add_message("assistant", ai_response.response, assessment.confidence_level)
+            self._record_turn(user_message.content, ai_response)
             
-            logger.info(f"Generated response for confidence level: {assessment.confidence_level}")
+            logger.info(f"Generated response for confidence level: {ai_response.confidence_level}")
             return ai_response
             
         except Exception as e:
             logger.error(f"Response generation failed: {str(e)}")
             
             # Return fallback response
-            fallback_response = AIResponse(
-                response=self._get_fallback_response(),
-                confidence_level=5,
-                confidence_tips=[
-                    "Take one small step forward today",
-                    "Remember that setbacks are temporary",
-                    "You're stronger than you think"
-                ],
-                next_steps=[
-                    "Practice deep breathing for 2 minutes",
-                    "Write down one thing you're grateful for",
-                    "Reach out to someone who supports you"
-                ]
-            )
-            
-            self.session.add_message("user", user_message.content)
-            self.session.add_message("assistant", fallback_response.response, 5)
+            fallback_response = self._get_fallback_ai_response()
+            self._record_turn(user_message.content, fallback_response)
             
             return fallback_response
     
-    def _build_context(self) -> str:
-        """Build context from recent conversation history"""
-        if len(self.session.messages) < 2:
-            return "This is the beginning of our conversation."
+    def generate_response_stream(self, user_message: UserMessage) -> Iterator[Union[str, AIResponse]]:
+        """Yield reply text chunks as they arrive, then the complete AIResponse"""
+        return iter_within_deadline(self._generate_response_stream(user_message), self.retry_policy.turn_timeout)
+    
+    def _generate_response_stream(self, user_message: UserMessage) -> Iterator[Union[str, AIResponse]]:
+        emitted = False
+        try:
+            ai_response = self._lookup_cached_reply(user_message.content)
+            if ai_response is not None:
+                emitted = True
+                yield ai_response.response
+            elif self.response_mode == "combined":
+                raw_chunks = []
+                streamer = _EnvelopeReplyStreamer()
+                self._count_prompt_branch("combined", user_message.content)
+                for chunk in self._stream_ai_request(self._build_combined_prompt(user_message.content)):
+                    raw_chunks.append(chunk)
+                    delta = streamer.feed(chunk)
+                    if delta:
+                        emitted = True
+                        yield delta
+                ai_response = self._build_combined_ai_response(user_message.content, "".join(raw_chunks))
+                
+                # Nothing parsed mid-stream (plain text or fallback) - send the reply whole
+                if not emitted:
+                    emitted = True
+                    yield ai_response.response
+            else:
+                assessment = self._assess_confidence(user_message.content)
+                chunks = []
+                self._count_prompt_branch("two_call", user_message.content)
+                for chunk in self._stream_ai_request(self._build_response_prompt(user_message.content, assessment.confidence_level)):
+                    chunks.append(chunk)
+                    emitted = True
+                    yield chunk
+                ai_response = self._build_two_call_ai_response(user_message.content, "".join(chunks), assessment)
+            
+            self._record_turn(user_message.content, ai_response)
+            logger.info(f"Streamed response for confidence level: {ai_response.confidence_level}")
+            yield ai_response
+            
+        except Exception as e:
+            logger.error(f"Streaming response generation failed: {str(e)}")
+            
+            fallback_response = self._get_fallback_ai_response()
+            if not emitted:
+                yield fallback_response.response
+            self._record_turn(user_message.content, fallback_response)
+            yield fallback_response
+    
+    def _generate_two_call_response(self, user_message: str) -> AIResponse:
+        """Assess confidence first, then generate the reply with a second request"""
+        if self.speculative:
+            return self._generate_speculative_response(user_message)
+        
+        assessment = self._assess_confidence(user_message)
+        
+        self._count_prompt_branch("two_call", user_message)
+        ai_response_text = self._make_ai_request(self._build_response_prompt(user_message, assessment.confidence_level))
+        return self._build_two_call_ai_response(user_message, ai_response_text, assessment)
+    
+    def _generate_speculative_response(self, user_message: str) -> AIResponse:
+        """Draft the reply from a predicted level while the real assessment runs"""
+        predicted_level = self._predict_confidence_level(user_message)
+        # Counted once, as the draft goes out; a reissue after a miss takes the same branch
+        self._count_prompt_branch("two_call", user_message)
+        speculative_reply = _get_speculation_executor().submit(
+            contextvars.copy_context().run, self._make_ai_request, self._build_response_prompt(user_message, predicted_level)
+        )
+        
+        try:
+            assessment = self._assess_confidence(user_message)
+        except BaseException:
+            speculative_reply.cancel()
+            raise
+        
+        # Checked as soon as the assessment is in, so a miss doesn't also wait out the stale draft
+        if speculation_stats.record(predicted_level, assessment.confidence_level, self.speculation_tolerance):
+            ai_response_text = speculative_reply.result()
+        else:
+            # Only a draft still queued can be cancelled; a running one finishes in its thread and is dropped
+            speculative_reply.cancel()
+            logger.info(f"Speculative reply missed (predicted {predicted_level}, got {assessment.confidence_level}), reissuing")
+            ai_response_text = self._make_ai_request(self._build_response_prompt(user_message, assessment.confidence_level))
+        
+        return self._build_two_call_ai_response(user_message, ai_response_text, assessment)
+    
+    def _build_two_call_ai_response(self, user_message: str, ai_response_text: str, assessment: ConfidenceAssessment) -> AIResponse:
+        """Structure the reply text from the two-call flow"""
+         # structured response
+        ai_response = AIResponse(
+            response=ai_response_text,
+            confidence_level=assessment.confidence_level,
+            assessment=assessment
+        )
+        
+        # Extract tips and steps from response
+        ai_response.extract_tips_and_steps()
+        self._cache_reply(user_message, ai_response)
+        return ai_response
+    
+    def _generate_combined_response(self, user_message: str) -> AIResponse:
+        """Assess and reply in a single request that returns a JSON envelope"""
+        self._count_prompt_branch("combined", user_message)
+        ai_response_text = self._make_ai_request(self._build_combined_prompt(user_message))
+        return self._build_combined_ai_response(user_message, ai_response_text)
+    
+    def _build_combined_ai_response(self, user_message: str, ai_response_text: str) -> AIResponse:
+        """Structure the JSON envelope from the combined flow"""
+        if ai_response_text == self._get_fallback_response():
+            return self._get_fallback_ai_response()
+        
+        ai_response = AIResponse.from_json_envelope(ai_response_text)
+        
+        # Model skipped the envelope - fall back to scanning the reply text
+        if not ai_response.confidence_tips and not ai_response.next_steps:
+            ai_response.extract_tips_and_steps()
+        self._cache_reply(user_message, ai_response)
+        return ai_response
+    
+    def _is_opening_turn(self) -> bool:
+        """Replies are only reusable when there is no conversation context yet"""
+        return self.session.total_messages < 2
+    
+    def _cache_level(self, user_message: str) -> int:
+        """Level the response cache is keyed on: the local estimate, known before any model call"""
+        estimate, _ = self.local_assessor.assess(user_message)
+        return estimate.confidence_level
+    
+    def _lookup_cached_reply(self, user_message: str) -> Optional[AIResponse]:
+        """Reuse a reply to a near-identical opening message, if the cache has one"""
+        if self.response_cache is None or not self._is_opening_turn():
+            return None
+        
+        cached_response = self.response_cache.lookup(
+            user_message, self._cache_level(user_message), self.prompt_engine.is_vague_message(user_message)
+        )
+        if cached_response is not None:
+            logger.info("Serving reply from response cache")
+        return cached_response
+    
+    def _cache_reply(self, user_message: str, ai_response: AIResponse):
+        """Offer a freshly generated opening reply to the response cache"""
+        if self.response_cache is None or not self._is_opening_turn():
+            return
+        if ai_response.response == self._get_fallback_response():
+            return
+        
+        self.response_cache.store(
+            user_message,
+            self._cache_level(user_message),
+            self.prompt_engine.is_vague_message(user_message),
+            ai_response
+        )
+    
+    def _predict_confidence_level(self, user_message: str) -> int:
+        """Best guess at the level before the assessment returns"""
+        estimate, certainty = self.local_assessor.assess(user_message)
+        if certainty < self.local_certainty_threshold and self.session.analytics.latest:
+            return self.session.analytics.latest
+        return estimate.confidence_level
+    
+    def _build_response_prompt(self, user_message: str, confidence_level: int) -> str:
+        """Full reply prompt: system prompt plus the per-turn response prompt"""
+        context = self._build_context()
+        response_prompt = self.prompt_engine.get_response_prompt(
+            user_message, 
+            confidence_level, 
+            context
+        )
+        
+        # i added system prompt for consistency
+        return f"{self.prompt_engine.get_system_prompt()}\n\n{response_prompt}"
+    
+    def _count_prompt_branch(self, mode: str, user_message: str):
+        """Count which reply branch a turn took; called where the prompt is sent, not where it is built"""
+        branch = "vague" if self.prompt_engine.is_vague_message(user_message) else "full"
+        metrics.prompt_branches_total.inc(mode=mode, branch=branch)
+    
+    def _build_combined_prompt(self, user_message: str) -> str:
+        """System prompt plus the single-call assessment + reply prompt"""
+        combined_prompt = self.prompt_engine.get_combined_prompt(user_message, self._build_context())
+        return f"{self.prompt_engine.get_system_prompt()}\n\n{combined_prompt}"
+    
+    def _record_turn(self, user_message: str, ai_response: AIResponse):
+        """Add the user message and the reply to the session"""
+        user_turn = self.session.add_message("user", user_message)
+        reply_turn = self.session.add_message(
+            "assistant",
+            ai_response.response,
+            ai_response.confidence_level,
+            tips=ai_response.confidence_tips,
+            next_steps=ai_response.next_steps
+        )
         
-        # Get last few messages for context
-        recent_messages = self.session.messages[-4:]  # Last 4 messages
-        context_parts = []
+        if self.session_store is not None:
+            # Queued for a batched write, so persisting never delays the reply
+            started_at = self.session.start_time.timestamp()
+            self.session_store.record_turn(self.session.session_id, user_turn, started_at)
+            self.session_store.record_turn(self.session.session_id, reply_turn, started_at)
         
-        for msg in recent_messages:
-            role = "User" if msg["role"] == "user" else "You"
-            context_parts.append(f"{role}: {msg['content'][:100]}...")
+        # Older turns are folded into the context summary off the reply path
+        self.memory.schedule_update(self.session.store)
+    
+    def _get_fallback_ai_response(self) -> AIResponse:
+        """Structured fallback used when the reply could not be generated"""
+        return AIResponse(
+            response=self._get_fallback_response(),
+            confidence_level=5,
+            confidence_tips=[
+                "Take one small step forward today",
+                "Remember that setbacks are temporary",
+                "You're stronger than you think"
+            ],
+            next_steps=[
+                "Practice deep breathing for 2 minutes",
+                "Write down one thing you're grateful for",
+                "Reach out to someone who supports you"
+            ]
+        )
+    
+    def _build_context(self) -> str:
+        """Build context from the conversation summary and the latest turns, within a token budget"""
+        if self.session.total_messages < 2:
+            return "This is the beginning of our conversation."
         
-        return "Recent conversation context:\n" + "\n".join(context_parts)
+        return self.memory.build_context(self.session.store)
     
     def get_session_summary(self) -> dict:
         """Get current session analytics"""
@@ -197,19 +690,454 @@ What's one small thing you can do today to take care of yourself, make sure you
     def reset_session(self):
         """Reset the chat session"""
         self.session = ChatSession()
+        self.memory = ConversationMemory()
         logger.info("Session reset")
     
+    def resume_session(self, session_id: str) -> bool:
+        """Rebuild a persisted session, e.g. after a restart or on another worker"""
+        if self.session_store is None:
+            return False
+        record = self.session_store.get_session(session_id)
+        if record is None:
+            return False
+        
+        session = ChatSession(session_id=session_id, start_time=datetime.fromtimestamp(record.started_at))
+        session.restore(self.session_store.iter_turns(session_id))
+        self.session = session
+        self.memory = ConversationMemory()
+        self.memory.schedule_update(session.store)
+        logger.info(f"Resumed session {session_id} with {session.total_messages} messages")
+        return True
+    
     def get_confidence_history(self) -> list:
         """Get confidence level history for charting"""
         return self.session.get_confidence_trend()
     
     def export_session(self) -> dict:
-        """Export session data for analysis"""
+        """Export session data for analysis; long sessions should use export_session_stream"""
         return {
+            "session_id": self.session.session_id,
             "session_summary": self.get_session_summary(),
-            "full_conversation": self.session.messages,
+            "full_conversation": [turn.to_dict() for turn in self.session.store.iter_all()],
             "confidence_progression": self.session.confidence_history
         }
+    
+    def export_session_stream(self, compress: bool = False) -> Iterator[bytes]:
+        """Export the session as NDJSON chunks, gzipped on the fly if asked, in constant memory"""
+        return iter_export_chunks(self.session, compress)
+    
+    def import_session(self, source: Union[BinaryIO, Iterable[bytes]]) -> ChatSession:
+        """Replace the current session with one read from a streamed export"""
+        self.session = import_session(source, self.session_store)
+        self.memory = ConversationMemory()
+        self.memory.schedule_update(self.session.store)
+        return self.session
+
+class SpeculationStats:
+    """Process-wide hit-rate counters for speculative reply generation"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.error_counts: Dict[int, int] = {}
+    
+    def record(self, predicted_level: int, actual_level: int, tolerance: int) -> bool:
+        """Record one speculation and return whether the draft can be kept"""
+        error = abs(predicted_level - actual_level)
+        hit = error <= tolerance
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.error_counts[error] = self.error_counts.get(error, 0) + 1
+        return hit
+    
+    def get_summary(self) -> dict:
+        """Hit rate plus the distribution of prediction errors, for tuning the tolerance"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "speculations": total,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "error_distribution": dict(sorted(self.error_counts.items()))
+            }
+
+speculation_stats = SpeculationStats()
+
+_speculation_executor: Optional[ThreadPoolExecutor] = None
+_speculation_executor_lock = threading.Lock()
+
+def _get_speculation_executor() -> ThreadPoolExecutor:
+    """Shared pool that runs speculative reply requests"""
+    global _speculation_executor
+    with _speculation_executor_lock:
+        if _speculation_executor is None:
+            _speculation_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="speculative-reply")
+        return _speculation_executor
+
+class AsyncConfidenceChatbot(ConfidenceChatbot):
+    """
+    asyncio counterpart of ConfidenceChatbot for serving many sessions on one event loop
+    """
+    
+    async def _make_ai_request(self, prompt: str, max_retries: Optional[int] = None) -> str:
+        """Make request to Gemini AI, sharing one call between identical concurrent prompts"""
+        if not self.coalesce_requests:
+            return await self._send_ai_request(prompt, max_retries)
+        
+        deadline = current_deadline()
+        started = time.perf_counter()
+        try:
+            text, shared = await async_model_request_flights.do(
+                self._request_key(prompt), self._send_ai_request, prompt, max_retries,
+                timeout=deadline.remaining() if deadline is not None else None
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Shared request outlasted the turn deadline, serving fallback response")
+            fallback = self._get_fallback_response()
+            # Observed like a circuit-open fallback, with no attempts, so every fallback counts as a request
+            self._observe_request("async", prompt, len(fallback), 0, started, "deadline")
+            return fallback
+        if shared:
+            metrics.ai_coalesced_requests_total.inc()
+        return text
+    
+    async def _send_ai_request(self, prompt: str, max_retries: Optional[int] = None) -> str:
+        """Make request to Gemini AI with retries, timeouts and the circuit breaker"""
+        attempts = max_retries or self.retry_policy.max_attempts
+        deadline = current_deadline()
+        started = time.perf_counter()
+        attempts_made = 0
+        fallback_reason = "error"
+        
+        for attempt in range(attempts):
+            # Checked before the breaker, so a spent turn never takes the half-open probe
+            if deadline is not None and deadline.expired:
+                logger.warning("Turn deadline exhausted, serving fallback response")
+                fallback_reason = "deadline"
+                break
+            if not self.circuit_breaker.allow_request():
+                logger.warning("Circuit open, serving fallback response")
+                fallback_reason = "circuit_open"
+                break
+            
+            timeout = self.retry_policy.attempt_timeout
+            charged = False
+            try:
+                # Inside the try, so giving up on the queue also hands back a half-open probe
+                if not await self._acquire_rate_limit_async(prompt, deadline):
+                    fallback_reason = "rate_limited"
+                    break
+                charged = True
+                attempts_made += 1
+                timeout = self.retry_policy.attempt_timeout_within(deadline)
+                text = await asyncio.wait_for(self.backend.generate_async(prompt), timeout=timeout)
+                self.circuit_breaker.record_success()
+                self._settle_rate_limit(len(text))
+                self._observe_request("async", prompt, len(text), attempts_made, started)
+                return text
+            except asyncio.CancelledError:
+                # Abandoned by every coalesced caller, or the losing speculative request: no reply was
+                # produced, so hand back the output estimate; the probe is released below
+                if charged:
+                    self._settle_rate_limit(0)
+                raise
+            except Exception as e:
+                retryable = self._record_request_error(e, attempt, timeout)
+                delay = self._get_retry_delay(attempt, attempts, deadline) if retryable else None
+            finally:
+                # A probe that ended without an outcome would otherwise hold the breaker half-open
+                self.circuit_breaker.release_probe()
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        
+        fallback = self._get_fallback_response()
+        self._observe_request("async", prompt, len(fallback), attempts_made, started, fallback_reason)
+        return fallback
+    
+    async def _acquire_rate_limit_async(self, prompt: str, deadline: Optional[Deadline]) -> bool:
+        """Wait for room in the shared upstream quota without blocking the event loop"""
+        if self.rate_limiter is None:
+            return True
+        try:
+            await self.rate_limiter.acquire_async(
+                self.session.session_id, self.rate_limiter.estimate(prompt),
+                weight=self.rate_limit_weight, priority=self._is_opening_turn(),
+                timeout=deadline.remaining() if deadline is not None else None
+            )
+            return True
+        except RateLimitTimeout:
+            logger.warning("Rate-limit wait outlasted the turn deadline, serving fallback response")
+            return False
+    
+    async def _stream_ai_request(self, prompt: str, max_retries: Optional[int] = None) -> AsyncIterator[str]:
+        """Stream a Gemini response chunk by chunk with the same fallback as _make_ai_request"""
+        attempts = max_retries or self.retry_policy.max_attempts
+        deadline = current_deadline()
+        started = time.perf_counter()
+        attempts_made = 0
+        fallback_reason = "error"
+        
+        for attempt in range(attempts):
+            # Checked before the breaker, so a spent turn never takes the half-open probe
+            if deadline is not None and deadline.expired:
+                logger.warning("Turn deadline exhausted, serving fallback response")
+                fallback_reason = "deadline"
+                break
+            if not self.circuit_breaker.allow_request():
+                logger.warning("Circuit open, serving fallback response")
+                fallback_reason = "circuit_open"
+                break
+            
+            emitted_chars = 0
+            timeout = self.retry_policy.attempt_timeout
+            chunks = None
+            try:
+                # Inside the try, so giving up on the queue also hands back a half-open probe
+                if not await self._acquire_rate_limit_async(prompt, deadline):
+                    fallback_reason = "rate_limited"
+                    break
+                attempts_made += 1
+                chunks = self.backend.generate_stream_async(prompt)
+                while True:
+                    # Each chunk gets the attempt timeout, so a stalled stream can't hang the turn
+                    timeout = self.retry_policy.attempt_timeout_within(deadline)
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        break
+                    if chunk:
+                        emitted_chars += len(chunk)
+                        yield chunk
+                self.circuit_breaker.record_success()
+                self._settle_rate_limit(emitted_chars)
+                self._observe_request("async_stream", prompt, emitted_chars, attempts_made, started)
+                return
+            except (asyncio.CancelledError, GeneratorExit):
+                # Cancelled, or closed by a consumer that stopped reading: charge only what was produced
+                if chunks is not None:
+                    self._settle_rate_limit(emitted_chars)
+                raise
+            except Exception as e:
+                retryable = self._record_request_error(e, attempt, timeout)
+                # Text already shown to the user can't be retried
+                if emitted_chars:
+                    self._observe_request("async_stream", prompt, emitted_chars, attempts_made, started, outcome="interrupted")
+                    return
+                delay = self._get_retry_delay(attempt, attempts, deadline) if retryable else None
+            finally:
+                # A probe that ended without an outcome would otherwise hold the breaker half-open
+                self.circuit_breaker.release_probe()
+                if chunks is not None:
+                    await chunks.aclose()
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        
+        fallback = self._get_fallback_response()
+        self._observe_request("async_stream", prompt, len(fallback), attempts_made, started, fallback_reason)
+        yield fallback
+    
+    async def _assess_confidence(self, user_message: str) -> ConfidenceAssessment:
+        """Analyze user message for confidence indicators"""
+        if self.assessment_mode == "local":
+            return await self._assess_confidence_locally(user_message)
+        
+        assessment_prompt = self.prompt_engine.get_confidence_assessment_prompt(user_message)
+        
+        try:
+            response = await self._make_ai_request(assessment_prompt)
+            return self._parse_assessment_response(response)
+        except Exception as e:
+            logger.error(f"Assessment failed: {str(e)}")
+            return ConfidenceAssessment(
+                confidence_level=5,
+                emotional_state="uncertain",
+                main_challenge="unknown",
+                hidden_strengths="resilience",
+                best_approach="gentle support"
+            )
+    
+    async def _assess_confidence_locally(self, user_message: str) -> ConfidenceAssessment:
+        """Assess in-process, falling back to Gemini only when the local result is uncertain"""
+        cached = self.local_assessor.get_cached(user_message)
+        if cached is not None:
+            return cached
+        
+        assessment, certainty = self.local_assessor.assess(user_message)
+        if certainty < self.local_certainty_threshold:
+            logger.info(f"Local assessment certainty {certainty} below threshold, asking Gemini")
+            try:
+                response = await self._make_ai_request(
+                    self.prompt_engine.get_confidence_assessment_prompt(user_message)
+                )
+                if response == self._get_fallback_response():
+                    return assessment
+                assessment = self._parse_assessment_response(response)
+            except Exception as e:
+                logger.error(f"Assessment failed: {str(e)}")
+                return assessment
+        
+        self.local_assessor.remember(user_message, assessment)
+        return assessment
+    
+    async def assess_message(self, user_message: str) -> Optional[ConfidenceAssessment]:
+        """The model's assessment of one message, or None when it didn't give a usable one"""
+        response = await self._make_ai_request(self.prompt_engine.get_confidence_assessment_prompt(user_message))
+        return self._parse_strict_assessment_response(response)
+    
+    async def assess_messages(self, user_messages: List[str]) -> List[Optional[ConfidenceAssessment]]:
+        """Model assessments for several messages from one request, in order; None where none came back"""
+        response = await self._make_ai_request(self.prompt_engine.get_batch_assessment_prompt(user_messages))
+        return self._parse_batch_assessment_response(response, len(user_messages))
+    
+    async def generate_response(self, user_message: UserMessage) -> AIResponse:
+        """Generate a complete confidence coaching response"""
+        with turn_deadline(self.retry_policy.turn_timeout):
+            return await self._generate_response(user_message)
+    
+    async def _generate_response(self, user_message: UserMessage) -> AIResponse:
+        try:
+            # Looked up before any model call, so a hit costs no round trip whatever the mode
+            ai_response = self._lookup_cached_reply(user_message.content)
+            if ai_response is None:
+                if self.response_mode == "combined":
+                    ai_response = await self._generate_combined_response(user_message.content)
+                else:
+                    ai_response = await self._generate_two_call_response(user_message.content)
+            
+            # Both messages are recorded without yielding, so concurrent turns never interleave
+            self._record_turn(user_message.content, ai_response)
+            
+            logger.info(f"Generated response for confidence level: {ai_response.confidence_level}")
+            return ai_response
+            
+        except Exception as e:
+            logger.error(f"Response generation failed: {str(e)}")
+            
+            fallback_response = self._get_fallback_ai_response()
+            self._record_turn(user_message.content, fallback_response)
+            
+            return fallback_response
+    
+    def generate_response_stream(self, user_message: UserMessage) -> AsyncIterator[Union[str, AIResponse]]:
+        """Yield reply text chunks as they arrive, then the complete AIResponse"""
+        return aiter_within_deadline(self._generate_response_stream(user_message), self.retry_policy.turn_timeout)
+    
+    async def _generate_response_stream(self, user_message: UserMessage) -> AsyncIterator[Union[str, AIResponse]]:
+        emitted = False
+        try:
+            ai_response = self._lookup_cached_reply(user_message.content)
+            if ai_response is not None:
+                emitted = True
+                yield ai_response.response
+            elif self.response_mode == "combined":
+                raw_chunks = []
+                streamer = _EnvelopeReplyStreamer()
+                self._count_prompt_branch("combined", user_message.content)
+                async for chunk in self._stream_ai_request(self._build_combined_prompt(user_message.content)):
+                    raw_chunks.append(chunk)
+                    delta = streamer.feed(chunk)
+                    if delta:
+                        emitted = True
+                        yield delta
+                ai_response = self._build_combined_ai_response(user_message.content, "".join(raw_chunks))
+                
+                # Nothing parsed mid-stream (plain text or fallback) - send the reply whole
+                if not emitted:
+                    emitted = True
+                    yield ai_response.response
+            else:
+                assessment = await self._assess_confidence(user_message.content)
+                chunks = []
+                self._count_prompt_branch("two_call", user_message.content)
+                async for chunk in self._stream_ai_request(self._build_response_prompt(user_message.content, assessment.confidence_level)):
+                    chunks.append(chunk)
+                    emitted = True
+                    yield chunk
+                ai_response = self._build_two_call_ai_response(user_message.content, "".join(chunks), assessment)
+            
+            self._record_turn(user_message.content, ai_response)
+            logger.info(f"Streamed response for confidence level: {ai_response.confidence_level}")
+            yield ai_response
+            
+        except Exception as e:
+            logger.error(f"Streaming response generation failed: {str(e)}")
+            
+            fallback_response = self._get_fallback_ai_response()
+            if not emitted:
+                yield fallback_response.response
+            self._record_turn(user_message.content, fallback_response)
+            yield fallback_response
+    
+    async def _generate_two_call_response(self, user_message: str) -> AIResponse:
+        """Assess confidence first, then generate the reply with a second request"""
+        if self.speculative:
+            return await self._generate_speculative_response(user_message)
+        
+        assessment = await self._assess_confidence(user_message)
+        
+        self._count_prompt_branch("two_call", user_message)
+        ai_response_text = await self._make_ai_request(self._build_response_prompt(user_message, assessment.confidence_level))
+        return self._build_two_call_ai_response(user_message, ai_response_text, assessment)
+    
+    async def _generate_speculative_response(self, user_message: str) -> AIResponse:
+        """Draft the reply from a predicted level while the real assessment runs"""
+        predicted_level = self._predict_confidence_level(user_message)
+        # Counted once, as the draft goes out; a reissue after a miss takes the same branch
+        self._count_prompt_branch("two_call", user_message)
+        speculative_reply = asyncio.ensure_future(
+            self._make_ai_request(self._build_response_prompt(user_message, predicted_level))
+        )
+        
+        try:
+            assessment = await self._assess_confidence(user_message)
+        except BaseException:
+            speculative_reply.cancel()
+            raise
+        
+        if speculation_stats.record(predicted_level, assessment.confidence_level, self.speculation_tolerance):
+            ai_response_text = await speculative_reply
+        else:
+            # Unlike the threaded version, a wrong draft can be cancelled in flight
+            speculative_reply.cancel()
+            logger.info(f"Speculative reply missed (predicted {predicted_level}, got {assessment.confidence_level}), reissuing")
+            ai_response_text = await self._make_ai_request(self._build_response_prompt(user_message, assessment.confidence_level))
+        
+        return self._build_two_call_ai_response(user_message, ai_response_text, assessment)
+    
+    async def _generate_combined_response(self, user_message: str) -> AIResponse:
+        """Assess and reply in a single request that returns a JSON envelope"""
+        self._count_prompt_branch("combined", user_message)
+        ai_response_text = await self._make_ai_request(self._build_combined_prompt(user_message))
+        return self._build_combined_ai_response(user_message, ai_response_text)
+
+class _EnvelopeReplyStreamer:
+    """Pull the growing "response" field out of a streamed JSON envelope"""
+    
+    def __init__(self):
+        self.buffer = ""
+        self.emitted = ""
+    
+    def feed(self, chunk: str) -> str:
+        """Add a chunk and return any new reply text"""
+        self.buffer += chunk
+        reply = (parse_json_lenient(self.buffer) or {}).get("response")
+        if not isinstance(reply, str) or len(reply) <= len(self.emitted) or not reply.startswith(self.emitted):
+            return ""
+        
+        delta = reply[len(self.emitted):]
+        self.emitted = reply
+        return delta
 
 # Helper function for testing
 def create_test_chatbot() -> ConfidenceChatbot:
@@ -0,0 +1,142 @@
+import json
+import time
+import zlib
+from array import array
+from collections import deque
+from datetime import datetime
+from typing import Deque, Iterator, List, Optional, Sequence
+
+# Roles are stored as small ints instead of repeating the strings on every turn
+ROLES = ("user", "assistant")
+ROLE_IDS = {role: index for index, role in enumerate(ROLES)}
+
+
+class Turn:
+    """One message in a conversation, stored compactly"""
+    __slots__ = ("seq", "role_id", "content", "timestamp", "confidence_level", "tips", "next_steps")
+
+    def __init__(
+        self,
+        seq: int,
+        role_id: int,
+        content: str,
+        timestamp: float,
+        confidence_level: Optional[int] = None,
+        tips: Sequence[str] = (),
+        next_steps: Sequence[str] = ()
+    ):
+        self.seq = seq
+        self.role_id = role_id
+        self.content = content
+        self.timestamp = timestamp
+        self.confidence_level = confidence_level
+        self.tips = tuple(tips)
+        self.next_steps = tuple(next_steps)
+
+    @property
+    def role(self) -> str:
+        return ROLES[self.role_id]
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp)
+
+    def to_dict(self) -> dict:
+        """The dict shape ChatSession.messages has always exposed"""
+        data = {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": self.created_at.isoformat(),
+            "confidence_level": self.confidence_level
+        }
+        if self.tips:
+            data["tips"] = list(self.tips)
+        if self.next_steps:
+            data["next_steps"] = list(self.next_steps)
+        return data
+
+    def _to_row(self) -> list:
+        return [self.seq, self.role_id, self.content, self.timestamp, self.confidence_level,
+                list(self.tips), list(self.next_steps)]
+
+    @classmethod
+    def _from_row(cls, row: list) -> "Turn":
+        return cls(*row)
+
+
+class ConversationStore:
+    """
+    Per-session conversation storage: a window of hot turns in memory, older turns
+    spilled to a compressed archive that is only read on export
+    """
+
+    def __init__(self, hot_window: int = 200, spill_batch: int = 50):
+        self.hot_window = hot_window
+        self.spill_batch = spill_batch
+        self._hot: Deque[Turn] = deque()
+        self._archive: List[bytes] = []
+        self.archived_count = 0
+        self.total = 0
+        # Restored histories can have gaps (turns a store dropped), so the next seq isn't always `total`
+        self.next_seq = 0
+        # One signed byte per scored reply for the whole conversation
+        self.confidence_values = array('b')
+
+    def append(
+        self,
+        role: str,
+        content: str,
+        confidence_level: Optional[int] = None,
+        tips: Sequence[str] = (),
+        next_steps: Sequence[str] = (),
+        timestamp: Optional[float] = None,
+        seq: Optional[int] = None
+    ) -> Turn:
+        turn = Turn(
+            self.next_seq if seq is None else seq,
+            ROLE_IDS[role],
+            content,
+            time.time() if timestamp is None else timestamp,
+            confidence_level,
+            tips,
+            next_steps
+        )
+        self._hot.append(turn)
+        self.total += 1
+        if turn.seq >= self.next_seq:
+            self.next_seq = turn.seq + 1
+        if confidence_level and role == "assistant":
+            self.confidence_values.append(confidence_level)
+
+        # Spill in batches so compression has something to work with
+        if len(self._hot) >= self.hot_window + self.spill_batch:
+            self._spill(self.spill_batch)
+        return turn
+
+    def _spill(self, count: int):
+        rows = [self._hot.popleft()._to_row() for _ in range(count)]
+        self._archive.append(zlib.compress(json.dumps(rows, separators=(",", ":")).encode("utf-8"), 6))
+        self.archived_count += count
+
+    def recent(self, count: int) -> List[Turn]:
+        """The last `count` turns, newest last"""
+        if count <= 0:
+            return []
+        start = max(0, len(self._hot) - count)
+        return [self._hot[i] for i in range(start, len(self._hot))]
+
+    def hot_turns(self) -> List[Turn]:
+        return list(self._hot)
+
+    def iter_all(self) -> Iterator[Turn]:
+        """Every turn, oldest first, decompressing the archive one batch at a time"""
+        for blob in self._archive:
+            for row in json.loads(zlib.decompress(blob)):
+                yield Turn._from_row(row)
+        yield from list(self._hot)
+
+    def __len__(self) -> int:
+        return self.total
+
+    def archive_bytes(self) -> int:
+        return sum(len(blob) for blob in self._archive)
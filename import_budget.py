@@ -0,0 +1,126 @@
+"""
+Import-time budget for cold starts.
+
+Imports the given modules in a fresh interpreter under `python -X importtime`,
+reports where the time went per top-level package, and fails when the total
+is over budget or a dependency that should load lazily was imported eagerly:
+
+    python import_budget.py
+    python import_budget.py --module app --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Set
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MODULES = ["chatbot"]
+DEFAULT_BUDGET_MS = 250.0
+# Loaded on first use through lazy.LazyModule; importing our code must not pull them in.
+# plotly.graph_objects isn't listed: streamlit imports that shim itself, and the
+# figure classes behind it are only built on first use either way.
+DEFAULT_LAZY = ["google.generativeai"]
+
+
+class ImportRecord(NamedTuple):
+    name: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def run_importtime(code: str) -> List[ImportRecord]:
+    """Run `code` in a fresh interpreter and parse its -X importtime report"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=HERE
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"`{code}` failed:\n{result.stderr[-2000:]}")
+
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        records.append(ImportRecord(stripped, depth, int(self_us), int(cumulative_us)))
+    return records
+
+
+def measure(modules: List[str]) -> List[ImportRecord]:
+    """Imports triggered by `modules`, leaving out what the interpreter loads at startup anyway"""
+    startup: Set[str] = {record.name for record in run_importtime("pass")}
+    code = "; ".join(f"import {module}" for module in modules)
+    return [record for record in run_importtime(code) if record.name not in startup]
+
+
+def summarize(records: List[ImportRecord], top: int) -> Dict:
+    total_us = sum(record.cumulative_us for record in records if record.depth == 0)
+    per_package: Dict[str, int] = defaultdict(int)
+    for record in records:
+        per_package[record.name.split(".")[0]] += record.self_us
+    heaviest = sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "modules": len(records),
+        "packages": [{"package": name, "self_ms": round(us / 1000, 1)} for name, us in heaviest]
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report import cost and enforce a cold-start budget")
+    parser.add_argument("--module", action="append", dest="modules", help="module to import (repeatable)")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS)))
+    parser.add_argument("--lazy", action="append", help="module that must not be imported eagerly (repeatable)")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to measure; the median is reported")
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    modules = args.modules or DEFAULT_MODULES
+    lazy = args.lazy if args.lazy is not None else DEFAULT_LAZY
+
+    runs = [measure(modules) for _ in range(max(1, args.runs))]
+    summaries = [summarize(records, args.top) for records in runs]
+    median_total = statistics.median(summary["total_ms"] for summary in summaries)
+    # Package breakdown from the run closest to the median
+    report = min(summaries, key=lambda summary: abs(summary["total_ms"] - median_total))
+    loaded = {record.name for record in runs[0]}
+    eager = [name for name in lazy if name in loaded]
+
+    failures = []
+    if median_total > args.budget_ms:
+        failures.append(f"import time {median_total:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+    for name in eager:
+        failures.append(f"{name} was imported eagerly")
+
+    if args.json:
+        print(json.dumps({
+            "modules": modules,
+            "budget_ms": args.budget_ms,
+            "total_ms": median_total,
+            "packages": report["packages"],
+            "eager": eager,
+            "failures": failures
+        }, indent=2))
+    else:
+        print(f"Importing {', '.join(modules)}: {median_total:.1f} ms over {report['modules']} modules "
+              f"(budget {args.budget_ms:.0f} ms, median of {len(runs)})")
+        print(f"  {'package':<28}{'self ms':>10}")
+        for entry in report["packages"]:
+            print(f"  {entry['package']:<28}{entry['self_ms']:>10.1f}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
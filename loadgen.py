@@ -0,0 +1,183 @@
+"""
+Load generator that simulates concurrent Streamlit chat sessions.
+
+Every simulated user owns a ConfidenceChatbot, like st.session_state does in
+app.py, thinks for a while, sends a message from a realistic mix and waits for
+the reply. Turns run on a bounded worker pool standing in for the server's
+script threads, so queueing shows up once sessions outnumber workers.
+Concurrency ramps through the given levels against FakeBackend:
+
+    python loadgen.py --levels 1,10,50,100 --step-seconds 20 --workers 32
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from backends import FakeBackend, LogNormalLatency
+from benchmark import percentile
+from chatbot import ConfidenceChatbot
+from models import UserMessage
+from resilience import CircuitBreaker
+
+# (weight, message) - short vague openers hit the clarifying-question branch
+MESSAGE_MIX = [
+    (3, "feeling lost"),
+    (2, "I don't know what to do"),
+    (2, "help"),
+    (4, "I'm nervous about my job interview tomorrow and I don't think I'm qualified"),
+    (3, "I want to start my own business but I'm not sure if it's the right time"),
+    (2, "I got promoted but now I'm worried about imposter syndrome with my new team"),
+    (2, "I have no income right now and I feel useless, what can I do"),
+    (2, "I'm excited and ready for my presentation next week but a little nervous"),
+]
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS is the best portable fallback (kilobytes on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class SimulatedSession(threading.Thread):
+    """One browser session sending messages with think time in between"""
+
+    def __init__(self, session_id: int, chatbot: ConfidenceChatbot, pool: ThreadPoolExecutor,
+                 think_time: float, stop: threading.Event, results: List[Dict[str, float]], results_lock: threading.Lock):
+        super().__init__(daemon=True, name=f"session-{session_id}")
+        self.chatbot = chatbot
+        self.pool = pool
+        self.think_time = think_time
+        self.stop = stop
+        self.results = results
+        self.results_lock = results_lock
+        self.rng = random.Random(session_id)
+        self.messages = [message for weight, message in MESSAGE_MIX for _ in range(weight)]
+
+    def _run_turn(self, content: str, submitted: float) -> Dict[str, float]:
+        started = time.perf_counter()
+        self.chatbot.generate_response(UserMessage(content=content))
+        finished = time.perf_counter()
+        return {"queue_s": started - submitted, "latency_s": finished - submitted}
+
+    def run(self):
+        # Stagger the first message so sessions don't arrive in lockstep
+        if self.stop.wait(self.rng.uniform(0, self.think_time)):
+            return
+        while not self.stop.is_set():
+            content = self.rng.choice(self.messages)
+            sample = self.pool.submit(self._run_turn, content, time.perf_counter()).result()
+            with self.results_lock:
+                self.results.append(sample)
+            if self.stop.wait(self.rng.expovariate(1 / self.think_time) if self.think_time else 0):
+                return
+
+
+def run_level(concurrency: int, args, backend: FakeBackend) -> Dict[str, float]:
+    """Drive `concurrency` sessions for one ramp step and summarize the results"""
+    stop = threading.Event()
+    results: List[Dict[str, float]] = []
+    results_lock = threading.Lock()
+    # One breaker for every simulated session, as Gemini sessions share one in production
+    circuit_breaker = CircuitBreaker()
+
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="script-runner") as pool:
+        sessions = [
+            SimulatedSession(
+                i,
+                ConfidenceChatbot(
+                    backend=backend,
+                    response_mode=args.response_mode,
+                    assessment_mode=args.assessment_mode,
+                    coalesce_requests=args.coalesce,
+                    circuit_breaker=circuit_breaker
+                ),
+                pool, args.think_time, stop, results, results_lock
+            )
+            for i in range(concurrency)
+        ]
+        started = time.perf_counter()
+        for session in sessions:
+            session.start()
+        time.sleep(args.step_seconds)
+        stop.set()
+        rss_mb = current_rss_mb()
+        for session in sessions:
+            session.join()
+        elapsed = time.perf_counter() - started
+
+    latencies = [sample["latency_s"] * 1000 for sample in results] or [0.0]
+    queues = [sample["queue_s"] * 1000 for sample in results] or [0.0]
+    return {
+        "sessions": concurrency,
+        "coalesce": args.coalesce,
+        "turns": len(results),
+        "throughput_tps": round(len(results) / elapsed, 2),
+        "latency_p50_ms": round(percentile(latencies, 50), 1),
+        "latency_p95_ms": round(percentile(latencies, 95), 1),
+        "latency_p99_ms": round(percentile(latencies, 99), 1),
+        "queue_mean_ms": round(statistics.fmean(queues), 1),
+        "queue_p95_ms": round(percentile(queues, 95), 1),
+        "rss_mb": round(rss_mb, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Simulate concurrent coaching sessions against a local model")
+    parser.add_argument("--levels", default="1,5,10,25,50", help="comma-separated session counts to ramp through")
+    parser.add_argument("--step-seconds", type=float, default=15.0, help="how long to hold each level")
+    parser.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) + 4),
+                        help="script threads available to run turns")
+    parser.add_argument("--think-time", type=float, default=3.0, help="mean seconds between a reply and the next message")
+    parser.add_argument("--latency-median", type=float, default=0.8, help="median simulated model latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="log-normal spread of the model latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of model calls that fail")
+    parser.add_argument("--response-mode", default="two_call", choices=ConfidenceChatbot.RESPONSE_MODES)
+    parser.add_argument("--assessment-mode", default="llm", choices=ConfidenceChatbot.ASSESSMENT_MODES)
+    # Off by default: sessions share one backend and an 8-message mix, so coalescing would
+    # fold many of their turns into one upstream call and flatter the numbers
+    parser.add_argument("--coalesce", action="store_true", help="coalesce identical in-flight model requests")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    backend = FakeBackend(
+        latency=LogNormalLatency(args.latency_median, args.latency_sigma, cap=args.latency_median * 10),
+        error_rate=args.error_rate
+    )
+
+    if not args.json:
+        print(f"coalescing {'on' if args.coalesce else 'off'}", flush=True)
+    rows = []
+    for level in [int(value) for value in args.levels.split(",") if value.strip()]:
+        row = run_level(level, args, backend)
+        rows.append(row)
+        if not args.json:
+            print(
+                f"sessions={row['sessions']:<5} turns={row['turns']:<6} tput={row['throughput_tps']:>7.2f}/s "
+                f"p50={row['latency_p50_ms']:>8.1f}ms p95={row['latency_p95_ms']:>8.1f}ms "
+                f"p99={row['latency_p99_ms']:>8.1f}ms queue={row['queue_mean_ms']:>8.1f}ms "
+                f"rss={row['rss_mb']:>7.1f}MB",
+                flush=True
+            )
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import re
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, List, Optional, Tuple
+from assessor import TOPIC_KEYWORDS
+from conversation import ConversationStore, Turn
+
+# Gemini averages about four characters of English per token
+CHARS_PER_TOKEN = 4
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+FIRST_PERSON = re.compile(r"\b(i|i'm|im|i've|ive|my|me|myself)\b", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Shorten text to roughly max_tokens, cutting at a word boundary"""
+    max_chars = max(0, max_tokens) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(0, max_chars - 1)].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:") + "…"
+
+
+_summary_executor: Optional[ThreadPoolExecutor] = None
+_summary_executor_lock = threading.Lock()
+
+
+def _get_summary_executor() -> ThreadPoolExecutor:
+    """Shared pool that folds old turns into session summaries"""
+    global _summary_executor
+    with _summary_executor_lock:
+        if _summary_executor is None:
+            _summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+        return _summary_executor
+
+
+class ConversationMemory:
+    """
+    Token-budgeted context for one session: the latest turns verbatim, older turns
+    folded into a rolling summary. Folding is incremental and runs in the background
+    after each turn, so building the context is a read of cached state.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 300,
+        recent_turns: int = 6,
+        summary_budget: int = 120,
+        fact_tokens: int = 30
+    ):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_budget = summary_budget
+        self.fact_tokens = fact_tokens
+
+        self._lock = threading.Lock()
+        self.folded_seq = -1
+        self.folded_count = 0
+        self._topics: Counter = Counter()
+        self._facts: Deque[Tuple[str, int]] = deque()
+        self._facts_tokens = 0
+        self._first_level: Optional[int] = None
+        self._latest_level: Optional[int] = None
+        self._summary = ""
+        self._pending: Optional[Future] = None
+
+    @property
+    def summary(self) -> str:
+        with self._lock:
+            return self._summary
+
+    def schedule_update(self, store: ConversationStore) -> Optional[Future]:
+        """Queue the turns that left the verbatim window for folding into the summary"""
+        cutoff = store.next_seq - self.recent_turns
+        with self._lock:
+            folded = self.folded_seq
+        if cutoff <= folded + 1:
+            return None
+
+        # Snapshot on the caller's thread; the store isn't safe to read while it is appended to
+        turns = [turn for turn in store.recent(store.next_seq - folded - 1) if turn.seq < cutoff]
+        if not turns or turns[0].seq != folded + 1:
+            # Part of the backlog was already archived, e.g. right after resuming a long session
+            turns = [turn for turn in store.iter_all() if folded < turn.seq < cutoff]
+
+        self._pending = _get_summary_executor().submit(self.fold, turns)
+        return self._pending
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until the last scheduled update has been folded in"""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout)
+
+    def fold(self, turns: List[Turn]):
+        """Fold turns, oldest first, into the summary; turns already folded are skipped"""
+        with self._lock:
+            for turn in turns:
+                if turn.seq <= self.folded_seq:
+                    continue
+                self._fold_turn(turn)
+                self.folded_seq = turn.seq
+                self.folded_count += 1
+            self._summary = self._render_summary()
+
+    def _fold_turn(self, turn: Turn):
+        if turn.role == "assistant":
+            if turn.confidence_level:
+                if self._first_level is None:
+                    self._first_level = turn.confidence_level
+                self._latest_level = turn.confidence_level
+            return
+
+        text = turn.content.lower()
+        for topic, words in TOPIC_KEYWORDS:
+            if any(word in text for word in words):
+                self._topics[topic] += 1
+
+        fact = self._salient_sentence(turn.content)
+        if fact:
+            # A repeated fact moves to the newest position instead of taking two slots
+            for index, (known, known_tokens) in enumerate(self._facts):
+                if known == fact:
+                    del self._facts[index]
+                    self._facts_tokens -= known_tokens
+                    break
+            tokens = estimate_tokens(fact)
+            self._facts.append((fact, tokens))
+            self._facts_tokens += tokens
+            # Oldest facts go first once the summary would outgrow its share of the budget
+            while self._facts and self._facts_tokens > self.summary_budget - 40:
+                _, dropped = self._facts.popleft()
+                self._facts_tokens -= dropped
+
+    def _salient_sentence(self, content: str) -> str:
+        """The sentence most likely to carry a fact worth remembering"""
+        best, best_score = "", 0.0
+        for sentence in SENTENCE_BREAK.split(content.strip()):
+            lowered = sentence.lower()
+            score = 2.0 * sum(1 for _, words in TOPIC_KEYWORDS for word in words if word in lowered)
+            score += 1.0 if FIRST_PERSON.search(sentence) else 0.0
+            score += min(len(sentence), 120) / 120
+            if score > best_score:
+                best, best_score = sentence, score
+        return trim_to_tokens(best, self.fact_tokens) if best_score >= 1.0 else ""
+
+    def _render_summary(self) -> str:
+        if not self.folded_count:
+            return ""
+        parts = [f"Summary of the earlier conversation ({self.folded_count} messages):"]
+        if self._topics:
+            parts.append("topics: " + ", ".join(topic for topic, _ in self._topics.most_common(3)) + ";")
+        if self._first_level is not None:
+            parts.append(f"confidence went from {self._first_level}/10 to {self._latest_level}/10;")
+        if self._facts:
+            parts.append("the user said: " + " | ".join(f'"{fact}"' for fact, _ in self._facts))
+        return " ".join(parts).rstrip(";")
+
+    def build_context(self, store: ConversationStore) -> str:
+        """Summary plus as many of the latest turns, verbatim, as the budget allows"""
+        summary = self.summary
+        header = "Recent conversation context:\n"
+        budget = self.token_budget - estimate_tokens(summary) - estimate_tokens(header)
+
+        lines: List[str] = []
+        for turn in reversed(store.recent(self.recent_turns)):
+            line = f"{'User' if turn.role == 'user' else 'You'}: {turn.content}"
+            cost = estimate_tokens(line)
+            if cost > budget:
+                if lines:
+                    break
+                # The latest turn always makes it in, shortened if it has to be
+                line = trim_to_tokens(line, budget)
+                cost = estimate_tokens(line)
+            lines.append(line)
+            budget -= cost + 1
+
+        context = header + "\n".join(reversed(lines))
+        return f"{summary}\n{context}" if summary else context
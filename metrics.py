@@ -0,0 +1,281 @@
+import logging
+import os
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _label_key(names: Tuple[str, ...], labels: dict) -> LabelValues:
+    if not names:
+        return ()
+    return tuple([str(labels.get(name, "")) for name in names])
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic count, optionally split by labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Bucketed distribution with Prometheus cumulative-bucket semantics"""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # Per label set: [count per bucket (+Inf last)], sum, count
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def summary(self) -> Dict[str, float]:
+        """Count, mean and bucket-estimated p50/p95 across all label sets"""
+        with self._lock:
+            counts = [0] * (len(self.buckets) + 1)
+            total, count = 0.0, 0
+            for bucket_counts, series_sum, series_count in self._series.values():
+                counts = [a + b for a, b in zip(counts, bucket_counts)]
+                total += series_sum
+                count += series_count
+        return {
+            "count": count,
+            "mean": round(total / count, 4) if count else 0.0,
+            "p50": self._quantile(counts, count, 0.5),
+            "p95": self._quantile(counts, count, 0.95)
+        }
+
+    def _quantile(self, counts: List[int], count: int, q: float) -> float:
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, series_sum, series_count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series_sum)}")
+                lines.append(f"{self.name}_count{labels} {series_count}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets, labelnames))
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+
+registry = MetricsRegistry()
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30)
+SIZE_BUCKETS = (250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000)
+
+ai_request_seconds = registry.histogram(
+    "confidenceai_ai_request_seconds", "Wall time of one AI request including retries",
+    LATENCY_BUCKETS, ("call", "outcome")
+)
+ai_request_attempts = registry.histogram(
+    "confidenceai_ai_request_attempts", "Attempts made per AI request", (1, 2, 3, 4, 5)
+)
+ai_prompt_chars = registry.histogram(
+    "confidenceai_ai_prompt_chars", "Prompt size in characters", SIZE_BUCKETS
+)
+ai_response_chars = registry.histogram(
+    "confidenceai_ai_response_chars", "Response size in characters", SIZE_BUCKETS
+)
+ai_fallbacks_total = registry.counter(
+    "confidenceai_ai_fallbacks_total", "Requests answered with the fallback reply", ("reason",)
+)
+parse_results_total = registry.counter(
+    "confidenceai_parse_results_total", "Model JSON parses by outcome", ("kind", "result")
+)
+ai_coalesced_requests_total = registry.counter(
+    "confidenceai_ai_coalesced_requests_total", "AI requests answered by an identical request already in flight"
+)
+ai_queue_wait_seconds = registry.histogram(
+    "confidenceai_ai_queue_wait_seconds", "Time an AI request waited for rate-limit capacity",
+    (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+prompt_branches_total = registry.counter(
+    "confidenceai_prompt_branches_total", "Reply prompts built, by branch", ("mode", "branch")
+)
+http_requests_total = registry.counter(
+    "confidenceai_http_requests_total", "HTTP API requests by route and status", ("route", "status")
+)
+http_request_seconds = registry.histogram(
+    "confidenceai_http_request_seconds", "HTTP API request time, until the response is written",
+    LATENCY_BUCKETS, ("route",)
+)
+
+
+def get_summary() -> dict:
+    """Headline numbers for the admin panel"""
+    requests = ai_request_seconds.summary()
+    parses = parse_results_total.total()
+    branches = prompt_branches_total.total()
+    vague = prompt_branches_total.value(mode="two_call", branch="vague") + \
+        prompt_branches_total.value(mode="combined", branch="vague")
+    parse_failures = sum(
+        parse_results_total.value(kind=kind, result="fallback") for kind in ("assessment", "envelope", "batch")
+    )
+    return {
+        "requests": requests["count"],
+        "latency_mean": requests["mean"],
+        "latency_p95": requests["p95"],
+        "attempts_mean": ai_request_attempts.summary()["mean"],
+        "queue_wait_p95": ai_queue_wait_seconds.summary()["p95"],
+        "coalesced": ai_coalesced_requests_total.total(),
+        # Every fallback is also observed as a request, so this stays within 0..1
+        "fallback_rate": round(ai_fallbacks_total.total() / requests["count"], 3) if requests["count"] else 0.0,
+        "parse_failure_rate": round(parse_failures / parses, 3) if parses else 0.0,
+        "vague_share": round(vague / branches, 3) if branches else 0.0
+    }
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port: int, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve /metrics from a daemon thread; later calls return the running server"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"Serving metrics on http://{addr}:{port}/metrics")
+        return _server
+
+
+def write_textfile(path: str):
+    """Write the metrics atomically, e.g. for the node_exporter textfile collector"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
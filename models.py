@@ -1,7 +1,74 @@
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from pydantic import BaseModel, Field, PrivateAttr, validator
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime
+from uuid import uuid4
 import json
+import re
+from conversation import ConversationStore, Turn
+from analytics import SessionAnalytics
+import metrics
+
+CODE_FENCE_PATTERN = re.compile(r"```(?:json)?", re.IGNORECASE)
+
+def _close_partial_json(fragment: str) -> str:
+    """Close any open strings, objects and arrays in a truncated JSON fragment"""
+    stack = []
+    in_string = False
+    escape = False
+    
+    for ch in fragment:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]' and stack:
+            stack.pop()
+    
+    if escape:
+        fragment = fragment[:-1]
+    if in_string:
+        fragment += '"'
+    fragment = fragment.rstrip().rstrip(',:').rstrip()
+    return fragment + ''.join(reversed(stack))
+
+def parse_json_lenient(text: str, max_repairs: int = 5) -> Optional[dict]:
+    """Parse a JSON object from model output, tolerating code fences, chatter and truncation"""
+    cleaned = CODE_FENCE_PATTERN.sub("", text)
+    start = cleaned.find('{')
+    if start == -1:
+        return None
+    
+    end = cleaned.rfind('}')
+    if end > start:
+        try:
+            data = json.loads(cleaned[start:end + 1])
+            if isinstance(data, dict):
+                return data
+        except json.JSONDecodeError:
+            pass
+    
+    # Truncated output: close what is open, dropping trailing members that still don't parse
+    fragment = cleaned[start:]
+    for _ in range(max_repairs):
+        try:
+            data = json.loads(_close_partial_json(fragment))
+            if isinstance(data, dict):
+                return data
+        except json.JSONDecodeError:
+            pass
+        cut = fragment.rfind(',')
+        if cut <= 0:
+            break
+        fragment = fragment[:cut]
+    
+    return None
 
 class UserMessage(BaseModel):
     """User message with validation"""
@@ -26,10 +93,15 @@ class ConfidenceAssessment(BaseModel):
     def from_json_string(cls, json_str: str):
         """Parse JSON response from AI"""
         try:
-            data = json.loads(json_str)
-            return cls(**data)
-        except (json.JSONDecodeError, ValueError) as e:
+            data = parse_json_lenient(json_str)
+            if data is None:
+                raise ValueError("No JSON object found")
+            assessment = cls(**data)
+            metrics.parse_results_total.inc(kind="assessment", result="ok")
+            return assessment
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
             # Fallback if JSON parsing fails
+            metrics.parse_results_total.inc(kind="assessment", result="fallback")
             return cls(
                 confidence_level=5,
                 emotional_state="uncertain",
@@ -38,6 +110,23 @@ class ConfidenceAssessment(BaseModel):
                 best_approach="supportive encouragement"
             )
 
+    @classmethod
+    def from_batch_json(cls, json_str: str, count: int) -> Dict[int, "ConfidenceAssessment"]:
+        """Parse a batch assessment reply into {message number: assessment}; bad entries are left out"""
+        data = parse_json_lenient(json_str) or {}
+        entries = data.get("assessments")
+        assessments = {}
+        for entry in entries if isinstance(entries, list) else []:
+            try:
+                number = int(entry["id"])
+                if 1 <= number <= count and number not in assessments:
+                    assessments[number] = cls(**entry)
+            except (KeyError, TypeError, ValueError):
+                continue
+        metrics.parse_results_total.inc(len(assessments), kind="batch", result="ok")
+        metrics.parse_results_total.inc(count - len(assessments), kind="batch", result="fallback")
+        return assessments
+
 class AIResponse(BaseModel):
     """Complete AI response with all components"""
     response: str = Field(..., description="Main conversational response")
@@ -47,6 +136,43 @@ class AIResponse(BaseModel):
     assessment: Optional[ConfidenceAssessment] = None
     timestamp: datetime = Field(default_factory=datetime.now)
     
+    @classmethod
+    def from_json_envelope(cls, text: str, default_confidence: int = 5):
+        """Build a response from a combined assessment + reply JSON envelope"""
+        data = parse_json_lenient(text) or {}
+        reply = data.get("response")
+        if not isinstance(reply, str) or not reply.strip():
+            # Not an envelope - treat the whole output as the reply
+            metrics.parse_results_total.inc(kind="envelope", result="fallback")
+            return cls(response=text.strip(), confidence_level=default_confidence)
+        metrics.parse_results_total.inc(kind="envelope", result="ok")
+        
+        try:
+            confidence_level = min(10, max(1, int(data.get("confidence_level", default_confidence))))
+        except (TypeError, ValueError):
+            confidence_level = default_confidence
+        
+        assessment = ConfidenceAssessment(
+            confidence_level=confidence_level,
+            emotional_state=str(data.get("emotional_state") or "uncertain"),
+            main_challenge=str(data.get("main_challenge") or "general confidence"),
+            hidden_strengths=str(data.get("hidden_strengths") or "resilience and self-awareness"),
+            best_approach=str(data.get("best_approach") or "supportive encouragement")
+        )
+        
+        def as_list(value) -> List[str]:
+            if not isinstance(value, list):
+                return []
+            return [str(item).strip() for item in value if str(item).strip()][:3]
+        
+        return cls(
+            response=reply.strip(),
+            confidence_level=confidence_level,
+            confidence_tips=as_list(data.get("confidence_tips")),
+            next_steps=as_list(data.get("next_steps")),
+            assessment=assessment
+        )
+    
     def extract_tips_and_steps(self):
         """Extract tips and steps from response text if not provided separately"""
         if not self.confidence_tips:
@@ -68,35 +194,86 @@ class AIResponse(BaseModel):
 
 class ChatSession(BaseModel):
     """Track entire chat session data"""
-    messages: List[dict] = Field(default=[])
-    confidence_history: List[int] = Field(default=[])
+    session_id: str = Field(default_factory=lambda: uuid4().hex)
     start_time: datetime = Field(default_factory=datetime.now)
-    total_messages: int = Field(default=0)
-    
-    def add_message(self, role: str, content: str, confidence_level: Optional[int] = None):
-        """Add a message to the session"""
-        self.messages.append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat(),
-            "confidence_level": confidence_level
-        })
-        self.total_messages += 1
+    hot_window: int = Field(default=200, description="Turns kept in memory before spilling to the archive")
+    
+    _store: ConversationStore = PrivateAttr()
+    _analytics: SessionAnalytics = PrivateAttr()
+    
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._store = ConversationStore(hot_window=self.hot_window)
+        self._analytics = SessionAnalytics()
+    
+    @property
+    def store(self) -> ConversationStore:
+        """The single source of truth for this session's turns"""
+        return self._store
+    
+    @property
+    def analytics(self) -> SessionAnalytics:
+        return self._analytics
+    
+    @property
+    def messages(self) -> List[dict]:
+        """Hot turns as dicts; use store.iter_all() for the full history"""
+        return [turn.to_dict() for turn in self._store.hot_turns()]
+    
+    @property
+    def confidence_history(self) -> List[int]:
+        return self._store.confidence_values.tolist()
+    
+    @property
+    def total_messages(self) -> int:
+        return len(self._store)
+    
+    @property
+    def next_seq(self) -> int:
+        """Seq the next message gets; a store's turn_count catches up to it once every turn is written"""
+        return self._store.next_seq
+    
+    def add_message(
+        self,
+        role: str,
+        content: str,
+        confidence_level: Optional[int] = None,
+        tips: Optional[List[str]] = None,
+        next_steps: Optional[List[str]] = None,
+        timestamp: Optional[float] = None,
+        seq: Optional[int] = None
+    ) -> Turn:
+        """Add a message to the session; `seq` is only given when replaying stored turns"""
+        turn = self._store.append(role, content, confidence_level, tips or (), next_steps or (), timestamp, seq)
         
         if confidence_level and role == "assistant":
-            self.confidence_history.append(confidence_level)
+            self._analytics.update(confidence_level)
+        return turn
+    
+    def restore(self, turns: Iterable[Turn]):
+        """Replay persisted turns, oldest first, into an empty session, keeping their stored seq"""
+        for turn in turns:
+            self.add_message(
+                turn.role,
+                turn.content,
+                turn.confidence_level,
+                list(turn.tips),
+                list(turn.next_steps),
+                timestamp=turn.timestamp,
+                seq=turn.seq
+            )
     
     def get_average_confidence(self) -> float:
         """Calculate average confidence level"""
-        if not self.confidence_history:
+        if not self._analytics.count:
             return 5.0
-        return round(sum(self.confidence_history) / len(self.confidence_history), 1)
+        return round(self._analytics.mean, 1)
     
     def get_confidence_trend(self) -> List[int]:
         """Get confidence levels for charting"""
-        if len(self.confidence_history) < 2:
+        if self._analytics.count < 2:
             return [5, 6]  # Default trend
-        return self.confidence_history[-10:]  # Last 10 data points
+        return self._analytics.recent()  # Last 10 data points
     
     def get_session_summary(self) -> dict:
         """Get session analytics"""
@@ -105,7 +282,8 @@ class ChatSession(BaseModel):
             "average_confidence": self.get_average_confidence(),
             "confidence_trend": self.get_confidence_trend(),
             "session_duration": str(datetime.now() - self.start_time).split('.')[0],
-            "latest_confidence": self.confidence_history[-1] if self.confidence_history else 5
+            "latest_confidence": self._analytics.latest or 5,
+            "confidence_stats": self._analytics.get_summary()
         }
 
 class PromptData(BaseModel):
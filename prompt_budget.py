@@ -0,0 +1,118 @@
+"""
+Prompt-size report and regression gate.
+
+Builds the prompt for every branch (assessment, vague and full replies, and
+both combined-mode variants) as a long conversation would send it, with the
+context memory at its steady state, and reports characters and estimated
+tokens. Sizes are checked against a committed budget so prompt growth fails
+loudly; so does a missing budget file, or a branch the budget doesn't list:
+
+    python prompt_budget.py
+    python prompt_budget.py --save prompt_budget.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict
+from backends import FakeBackend, FixedLatency
+from chatbot import ConfidenceChatbot
+from memory import estimate_tokens
+from models import UserMessage
+
+DEFAULT_BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_budget.json")
+DEFAULT_HEADROOM = 0.05
+
+VAGUE_MESSAGE = "I feel lost"
+FULL_MESSAGE = "I'm nervous about my job interview tomorrow and I don't think I'm qualified for the role"
+WARMUP_MESSAGES = [
+    "My manager said my presentation skills need work and I froze in the last team meeting.",
+    "Money is tight since I lost my side gig, and rent is due next week.",
+    "I think I'm not good enough for this promotion, honestly.",
+    "not sure",
+]
+
+
+def build_prompts(warmup_turns: int = 24) -> Dict[str, str]:
+    """One prompt per branch, after enough turns that the context is at its budget"""
+    chatbot = ConfidenceChatbot(backend=FakeBackend(FixedLatency(0)), assessment_mode="local")
+    for index in range(warmup_turns):
+        chatbot.generate_response(UserMessage(content=WARMUP_MESSAGES[index % len(WARMUP_MESSAGES)]))
+    chatbot.memory.wait()
+
+    engine = chatbot.prompt_engine
+    return {
+        "assessment": engine.get_confidence_assessment_prompt(FULL_MESSAGE),
+        "vague": chatbot._build_response_prompt(VAGUE_MESSAGE, 4),
+        "full": chatbot._build_response_prompt(FULL_MESSAGE, 4),
+        "combined_vague": chatbot._build_combined_prompt(VAGUE_MESSAGE),
+        "combined_full": chatbot._build_combined_prompt(FULL_MESSAGE),
+    }
+
+
+def measure() -> Dict[str, Dict[str, int]]:
+    return {
+        branch: {"chars": len(prompt), "tokens": estimate_tokens(prompt)}
+        for branch, prompt in build_prompts().items()
+    }
+
+
+def check(sizes: Dict[str, Dict[str, int]], budget: Dict[str, Dict[str, int]]) -> list:
+    failures = []
+    for branch, size in sizes.items():
+        limit = budget.get(branch, {}).get("max_tokens")
+        if limit is None:
+            # A branch the budget doesn't know (new or renamed) must not pass unchecked
+            failures.append(f"{branch}: no budget, rerun with --save to add one")
+        elif size["tokens"] > limit:
+            failures.append(f"{branch}: {size['tokens']} tokens is over the {limit} token budget")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report prompt sizes and fail when they outgrow the budget")
+    parser.add_argument("--budget", metavar="PATH", default=DEFAULT_BUDGET_PATH, help="budget file to check against")
+    parser.add_argument("--save", metavar="PATH", help="write current sizes plus headroom as the new budget")
+    parser.add_argument("--headroom", type=float, default=DEFAULT_HEADROOM, help="growth allowed when saving (0.05 = 5%%)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("chatbot").setLevel(logging.WARNING)
+
+    sizes = measure()
+
+    if args.save:
+        budget = {
+            branch: {"max_tokens": int(size["tokens"] * (1 + args.headroom)) + 1}
+            for branch, size in sizes.items()
+        }
+        with open(args.save, "w") as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+        print(f"Saved prompt budget to {args.save}")
+        return 0
+
+    if not os.path.exists(args.budget):
+        # Passing without a budget would turn the gate into a no-op
+        print(f"FAIL: no prompt budget at {args.budget}; create one with --save {args.budget}")
+        return 1
+    with open(args.budget) as f:
+        budget = json.load(f)
+    failures = check(sizes, budget)
+
+    if args.json:
+        print(json.dumps({"sizes": sizes, "budget": budget, "failures": failures}, indent=2))
+    else:
+        print(f"{'branch':<18}{'chars':>8}{'tokens':>8}{'budget':>8}")
+        for branch, size in sizes.items():
+            limit = budget.get(branch, {}).get("max_tokens", "-")
+            print(f"{branch:<18}{size['chars']:>8}{size['tokens']:>8}{limit:>8}")
+        for failure in failures:
+            print(f"FAIL: {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,171 @@
+import json
+from typing import List
+
+
+def compact_prompt(template: str) -> str:
+    """Dedent a prompt and drop indentation and repeated blank lines, which are only billed as tokens"""
+    lines = []
+    for line in template.strip().splitlines():
+        line = line.strip()
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+# Compacted once at import; per-turn assembly is plain str.format substitution
+SYSTEM_PROMPT = compact_prompt("""
+You are ConfidenceAI, a warm and experienced confidence coach. You help people build genuine self-assurance through understanding and action.
+
+YOUR APPROACH:
+- Every person has unique strengths worth celebrating
+- Real confidence grows through small, consistent steps
+- Past wins prove future potential
+- Challenges are growth opportunities in disguise
+
+HOW YOU COMMUNICATE:
+- Speak like a supportive friend who truly believes in them
+- Use their name when you know it
+- If the user’s message is vague or incomplete, ALWAYS ask 2+ clarifying questions before giving advice
+- If the user mentions money stress or no income, ALWAYS share 2–3 realistic, specific income ideas they can try immediately (like simple services, online gigs, or selling unused items)
+- Ask questions that help them discover their own answers
+- Give specific, doable advice
+- Use occasional emojis naturally (1–2 per response)
+- Keep responses conversational and genuine
+- Always end with an engaging question
+
+NEVER:
+- Give generic pep talks
+- Dismiss their feelings
+- Sound robotic or overly formal
+- Overwhelm them with too many steps
+
+Keep responses around 150-200 words - enough to help, not enough to overwhelm.
+""")
+
+ASSESSMENT_TEMPLATE = compact_prompt("""
+Analyze the user's message below.
+
+Message: "{user_message}"
+
+Respond **ONLY** in strict JSON format like this:
+    {{
+    "confidence_level": integer from 1 to 10,
+    "emotional_state": "2-3 word description",
+    "main_challenge": "specific short phrase",
+    "hidden_strengths": "short phrase",
+    "best_approach": "short phrase for coaching style"
+    }}
+
+**Rules:**
+    - Return valid JSON only, no other text.
+    - confidence_level must be an integer 1-10.
+    - Be realistic and consistent: nervous or negative words -> lower confidence, positive + hopeful -> higher.
+""")
+
+BATCH_ASSESSMENT_TEMPLATE = compact_prompt("""
+Analyze each of the {count} numbered user messages below on its own.
+
+Messages:
+{messages}
+
+Respond **ONLY** in strict JSON format like this, with one entry per message:
+    {{
+    "assessments": [
+    {{
+    "id": the message number,
+    "confidence_level": integer from 1 to 10,
+    "emotional_state": "2-3 word description",
+    "main_challenge": "specific short phrase",
+    "hidden_strengths": "short phrase",
+    "best_approach": "short phrase for coaching style"
+    }}
+    ]
+    }}
+
+**Rules:**
+    - Return valid JSON only, no other text.
+    - confidence_level must be an integer 1-10.
+    - Be realistic and consistent: nervous or negative words -> lower confidence, positive + hopeful -> higher.
+""")
+
+VAGUE_RESPONSE_TEMPLATE = compact_prompt("""
+User message: "{user_message}"
+Confidence level: {confidence_level}/10
+Context: {context}
+
+The user’s message is unclear or short.
+👉 FIRST: ask **two clarifying questions** to understand what they really need.
+👉 Do NOT give advice yet.
+👉 Be warm, supportive, natural — like a caring friend.
+👉 Add 1-2 emojis if it feels right.
+👉 Keep it short (50-80 words).
+👉 End with a gentle follow-up like: "Can you tell me a bit more?"
+""")
+
+FULL_RESPONSE_TEMPLATE = compact_prompt("""
+User message: "{user_message}"
+Confidence level: {confidence_level}/10
+Context: {context}
+
+Using your supportive coach style:
+1. CONNECT - Show understanding of their feelings.
+2. VALIDATE - Normalize their experience.
+3. REFRAME - Offer a more empowering perspective.
+4. EMPOWER - Suggest 2-3 small specific actions they can take today.
+5. INSPIRE - Include a short confidence affirmation.
+6. ENGAGE - End with an open question to keep the conversation going.
+
+Tone: warm, natural, friendly — not robotic.
+Use 1-2 emojis if it fits naturally.
+Length: 150-200 words.
+""")
+
+VAGUE_COMBINED_INSTRUCTIONS = compact_prompt("""
+The user’s message is unclear or short.
+👉 In "response": ask **two clarifying questions** to understand what they really need.
+👉 Do NOT give advice yet, and leave "confidence_tips" and "next_steps" empty.
+👉 Be warm, supportive, natural — like a caring friend. Add 1-2 emojis if it feels right.
+👉 Keep it short (50-80 words) and end with a gentle follow-up like: "Can you tell me a bit more?"
+""")
+
+FULL_COMBINED_INSTRUCTIONS = compact_prompt("""
+In "response", using your supportive coach style:
+1. CONNECT - Show understanding of their feelings.
+2. VALIDATE - Normalize their experience.
+3. REFRAME - Offer a more empowering perspective.
+4. EMPOWER - Suggest 2-3 small specific actions they can take today.
+5. INSPIRE - Include a short confidence affirmation.
+6. ENGAGE - End with an open question to keep the conversation going.
+Tone: warm, natural, friendly — not robotic. Use 1-2 emojis if it fits naturally.
+Length: 150-200 words. Put up to 3 short tips in "confidence_tips" and up to 3 concrete actions in "next_steps".
+""")
+
+COMBINED_TEMPLATE = compact_prompt("""
+User message: "{user_message}"
+Context: {context}
+
+First assess the user's confidence, then write your reply, tuned to that confidence level.
+{reply_instructions}
+
+Respond **ONLY** in strict JSON format like this:
+    {{
+    "confidence_level": integer from 1 to 10,
+    "emotional_state": "2-3 word description",
+    "main_challenge": "specific short phrase",
+    "hidden_strengths": "short phrase",
+    "best_approach": "short phrase for coaching style",
+    "response": "your full reply to the user",
+    "confidence_tips": ["short tip", ...],
+    "next_steps": ["specific action", ...]
+    }}
+
+**Rules:**
+    - Return valid JSON only, no other text.
+    - confidence_level must be an integer 1-10.
+    - Be realistic and consistent: nervous or negative words -> lower confidence, positive + hopeful -> higher.
+""")
+
+
 class ConfidencePromptEngine:
     """
     Refined prompt engine for confidence coaching that generates human-like responses
@@ -5,101 +173,50 @@ class ConfidencePromptEngine:
     
     @staticmethod
     def get_system_prompt():
-        return """
-        You are ConfidenceAI, a warm and experienced confidence coach. You help people build genuine self-assurance through understanding and action.
-        
-        YOUR APPROACH:
-        - Every person has unique strengths worth celebrating
-        - Real confidence grows through small, consistent steps
-        - Past wins prove future potential
-        - Challenges are growth opportunities in disguise
-        
-         HOW YOU COMMUNICATE:
-        - Speak like a supportive friend who truly believes in them
-        - Use their name when you know it
-        - If the user’s message is vague or incomplete, ALWAYS ask 2+ clarifying questions before giving advice
-        - If the user mentions money stress or no income, ALWAYS share 2–3 realistic, specific income ideas they can try immediately (like simple services, online gigs, or selling unused items)
-        - Ask questions that help them discover their own answers
-        - Give specific, doable advice
-        - Use occasional emojis naturally (1–2 per response)
-        - Keep responses conversational and genuine
-        - Always end with an engaging question
-
-        
-        NEVER:
-        - Give generic pep talks
-        - Dismiss their feelings
-        - Sound robotic or overly formal
-        - Overwhelm them with too many steps
-        
-        Keep responses around 150-200 words - enough to help, not enough to overwhelm.
-        """
+        return SYSTEM_PROMPT
     
     @staticmethod
     def get_confidence_assessment_prompt(user_message: str):
-        return f"""
-    Analyze the user's message below.
-
-    Message: "{user_message}"
-
-    Respond **ONLY** in strict JSON format like this:
-        {{
-        "confidence_level": integer from 1 to 10,
-        "emotional_state": "2-3 word description",
-        "main_challenge": "specific short phrase",
-        "hidden_strengths": "short phrase",
-        "best_approach": "short phrase for coaching style"
-        }}
-
-    **Rules:**
-        - Return valid JSON only, no other text.
-        - confidence_level must be an integer 1-10.
-        - Be realistic and consistent: nervous or negative words -> lower confidence, positive + hopeful -> higher.
-        """
-
+        return ASSESSMENT_TEMPLATE.format(user_message=user_message)
     
     @staticmethod
-    def get_response_prompt(user_message: str, confidence_level: int, context: str = ""):
-        # If message is vague/short/unclear, force clarifying questions first
-        vague = (
+    def get_batch_assessment_prompt(user_messages: List[str]):
+        """One assessment prompt for several messages; each is JSON-quoted so it stays on one line"""
+        messages = "\n".join(
+            f"{number}. {json.dumps(message, ensure_ascii=False)}"
+            for number, message in enumerate(user_messages, 1)
+        )
+        return BATCH_ASSESSMENT_TEMPLATE.format(count=len(user_messages), messages=messages)
+    
+    @staticmethod
+    def is_vague_message(user_message: str) -> bool:
+        """Whether a message is too short or unclear to coach on without clarifying first"""
+        return (
             len(user_message.split()) < 5
             or "don't know" in user_message.lower()
             or "lost" in user_message.lower()
             or "confused" in user_message.lower()
         )
-        if vague:
-            return f"""
-    User message: "{user_message}"
-    Confidence level: {confidence_level}/10
-    Context: {context}
-
-    The user’s message is unclear or short.  
-    👉 FIRST: ask **two clarifying questions** to understand what they really need.  
-    👉 Do NOT give advice yet.  
-    👉 Be warm, supportive, natural — like a caring friend.  
-    👉 Add 1-2 emojis if it feels right.  
-    👉 Keep it short (50-80 words).  
-    👉 End with a gentle follow-up like: "Can you tell me a bit more?"
-    """
+    
+    @staticmethod
+    def get_response_prompt(user_message: str, confidence_level: int, context: str = ""):
+        # If message is vague/short/unclear, force clarifying questions first
+        if ConfidencePromptEngine.is_vague_message(user_message):
+            template = VAGUE_RESPONSE_TEMPLATE
         else:
             # Normal, full coaching prompt
-            return f"""
-    User message: "{user_message}"
-    Confidence level: {confidence_level}/10
-    Context: {context}
-
-    Using your supportive coach style:
-    1. CONNECT - Show understanding of their feelings.
-    2. VALIDATE - Normalize their experience.
-    3. REFRAME - Offer a more empowering perspective.
-    4. EMPOWER - Suggest 2-3 small specific actions they can take today.
-    5. INSPIRE - Include a short confidence affirmation.
-    6. ENGAGE - End with an open question to keep the conversation going.
-
-    Tone: warm, natural, friendly — not robotic.
-    Use 1-2 emojis if it fits naturally.
-    Length: 150-200 words.
-    """
+            template = FULL_RESPONSE_TEMPLATE
+        return template.format(user_message=user_message, confidence_level=confidence_level, context=context)
+    
+    @staticmethod
+    def get_combined_prompt(user_message: str, context: str = ""):
+        """Single prompt that returns the assessment and the coaching reply together"""
+        if ConfidencePromptEngine.is_vague_message(user_message):
+            reply_instructions = VAGUE_COMBINED_INSTRUCTIONS
+        else:
+            reply_instructions = FULL_COMBINED_INSTRUCTIONS
+        return COMBINED_TEMPLATE.format(user_message=user_message, context=context, reply_instructions=reply_instructions)
+    
     @staticmethod
     def get_few_shot_examples():
         return """
@@ -183,6 +300,17 @@ What's one small thing you can do today to take care of yourself?"""
             ]
         }
     
+    @staticmethod
+    def get_confidence_level_keywords():
+        """Keyword buckets mapped to the confidence level they suggest, checked in order"""
+        return [
+            (2, ['very low', 'terrible', 'awful', 'hopeless']),
+            (4, ['low', 'down', 'struggling', 'difficult']),
+            (5, ['okay', 'fine', 'average', 'neutral']),
+            (7, ['good', 'positive', 'better', 'confident']),
+            (9, ['great', 'excellent', 'amazing', 'fantastic'])
+        ]
+    
     @staticmethod
     def get_personalized_affirmations():
         """Context-specific affirmations"""
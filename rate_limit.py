@@ -0,0 +1,260 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from memory import estimate_tokens
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(TimeoutError):
+    """Gave up waiting for rate-limiter capacity"""
+
+
+class TokenBucket:
+    """Capacity that refills continuously at a per-minute rate, up to `capacity`"""
+
+    def __init__(self, per_minute: float, capacity: float):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available; a request bigger than the bucket only needs it full"""
+        self.refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float):
+        # Can go negative when actual usage turns out higher than estimated; refills pay it back
+        self.level -= amount
+
+    def refund(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    __slots__ = ("session_id", "tokens", "notify", "granted", "cancelled", "enqueued")
+
+    def __init__(self, session_id: str, tokens: int, notify: Callable[[], None]):
+        self.session_id = session_id
+        self.tokens = tokens
+        self.notify = notify
+        self.granted = False
+        self.cancelled = False
+        self.enqueued = time.monotonic()
+
+
+class RateLimiter:
+    """
+    Process-wide requests-per-minute and tokens-per-minute limiter for one upstream quota.
+
+    Callers that can't go straight through queue fairly: each session is a flow in a
+    weighted fair queue, charged by estimated tokens, so one heavy user can't crowd out
+    the rest, and a session's first message goes ahead of ongoing conversations. A
+    dispatcher thread releases queued requests as the buckets refill, which serves
+    both threads and event loops.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float = 0,
+        burst_seconds: float = 10.0,
+        expected_output_tokens: int = 300
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # Each bucket holds burst_seconds of quota, so a burst drains it instead of the upstream's window
+        self._requests = TokenBucket(requests_per_minute, max(1.0, requests_per_minute * burst_seconds / 60)) \
+            if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute, max(1.0, tokens_per_minute * burst_seconds / 60)) \
+            if tokens_per_minute > 0 else None
+        self.expected_output_tokens = expected_output_tokens
+
+        self._cond = threading.Condition()
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._dispatcher: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._requests is not None or self._tokens is not None
+
+    def estimate(self, prompt: str) -> int:
+        """Tokens a request is charged up front: the prompt plus a typical reply"""
+        return estimate_tokens(prompt) + self.expected_output_tokens
+
+    def acquire(
+        self,
+        session_id: str,
+        tokens: int,
+        weight: float = 1.0,
+        priority: bool = False,
+        timeout: Optional[float] = None
+    ) -> float:
+        """Block until the request may go upstream; returns the seconds spent queued"""
+        event = threading.Event()
+        waiter = self._enqueue(session_id, tokens, weight, priority, event.set)
+        if waiter is None:
+            return self._observe_wait(0.0)
+        if not event.wait(timeout) and not self._cancel(waiter, refund=False):
+            raise RateLimitTimeout(f"No upstream capacity within {timeout:.1f}s")
+        return self._observe_wait(time.monotonic() - waiter.enqueued)
+
+    async def acquire_async(
+        self,
+        session_id: str,
+        tokens: int,
+        weight: float = 1.0,
+        priority: bool = False,
+        timeout: Optional[float] = None
+    ) -> float:
+        """Wait, without blocking the event loop, until the request may go upstream"""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def resolve():
+            if not granted.done():
+                granted.set_result(None)
+
+        waiter = self._enqueue(session_id, tokens, weight, priority, lambda: loop.call_soon_threadsafe(resolve))
+        if waiter is None:
+            return self._observe_wait(0.0)
+        try:
+            await asyncio.wait_for(granted, timeout)
+        except asyncio.TimeoutError:
+            if not self._cancel(waiter, refund=False):
+                raise RateLimitTimeout(f"No upstream capacity within {timeout:.1f}s")
+        except BaseException:
+            # Cancelled by the caller: leave the queue, and hand back capacity granted in the meantime
+            self._cancel(waiter, refund=True)
+            raise
+        return self._observe_wait(time.monotonic() - waiter.enqueued)
+
+    def settle(self, output_tokens: int):
+        """Correct the up-front charge once the reply's real size is known"""
+        if self._tokens is None:
+            return
+        with self._cond:
+            self._tokens.refill(time.monotonic())
+            difference = output_tokens - self.expected_output_tokens
+            if difference > 0:
+                self._tokens.take(difference)
+            else:
+                self._tokens.refund(-difference)
+                self._cond.notify()
+
+    def _enqueue(
+        self, session_id: str, tokens: int, weight: float, priority: bool, notify: Callable[[], None]
+    ) -> Optional[_Waiter]:
+        """Queue a request, or return None when it can go straight through"""
+        with self._cond:
+            if not self._queue and self._wait_time(tokens) == 0:
+                self._take(tokens)
+                return None
+
+            # Weighted fair queueing: a flow's finish tag advances by its cost over its weight
+            start = max(self._virtual_time, self._last_finish.get(session_id, 0.0))
+            finish = start + tokens / max(weight, 1e-6)
+            self._last_finish[session_id] = finish
+            waiter = _Waiter(session_id, tokens, notify)
+            heapq.heappush(self._queue, (0 if priority else 1, finish, next(self._sequence), waiter))
+
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name="rate-limiter", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify()
+            return waiter
+
+    def _cancel(self, waiter: _Waiter, refund: bool) -> bool:
+        """Withdraw a queued request; returns whether it had been granted already"""
+        with self._cond:
+            if waiter.granted:
+                if refund:
+                    self._refund(waiter.tokens)
+                    self._cond.notify()
+                return True
+            waiter.cancelled = True
+            self._cond.notify()
+            return False
+
+    def _wait_time(self, tokens: int) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        if self._requests is not None:
+            wait = self._requests.time_until(1, now)
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.time_until(tokens, now))
+        return wait
+
+    def _take(self, tokens: int):
+        if self._requests is not None:
+            self._requests.take(1)
+        if self._tokens is not None:
+            self._tokens.take(tokens)
+
+    def _refund(self, tokens: int):
+        if self._requests is not None:
+            self._requests.refund(1)
+        if self._tokens is not None:
+            self._tokens.refund(tokens)
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while True:
+                self._cond.wait(self._dispatch())
+
+    def _dispatch(self) -> Optional[float]:
+        """Release queued requests in fair order; returns how long until the next one fits"""
+        while self._queue:
+            _, finish, _, waiter = self._queue[0]
+            if waiter.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            wait = self._wait_time(waiter.tokens)
+            if wait > 0:
+                return wait
+            heapq.heappop(self._queue)
+            self._take(waiter.tokens)
+            self._virtual_time = max(self._virtual_time, finish)
+            waiter.granted = True
+            waiter.notify()
+
+        # Once the backlog clears every flow has caught up, so past usage stops counting against it
+        self._last_finish.clear()
+        return None
+
+    def _observe_wait(self, seconds: float) -> float:
+        metrics.ai_queue_wait_seconds.observe(seconds)
+        if seconds >= 1.0:
+            logger.info(f"Request waited {seconds:.2f}s for rate-limit capacity")
+        return seconds
+
+    def get_status(self) -> dict:
+        with self._cond:
+            return {
+                "queued": sum(1 for *_, waiter in self._queue if not waiter.cancelled),
+                "requests_available": round(self._requests.level, 1) if self._requests else None,
+                "tokens_available": round(self._tokens.level) if self._tokens else None
+            }
+
+
+# Shared by every Gemini chatbot in the process, since they all draw on one API key's quota.
+# The defaults are gemini-1.5-flash's tier-1 limits; set them to match the key in use.
+gemini_rate_limiter = RateLimiter(
+    requests_per_minute=float(os.getenv("GEMINI_RPM", "2000")),
+    tokens_per_minute=float(os.getenv("GEMINI_TPM", "4000000"))
+)
@@ -0,0 +1,238 @@
+import asyncio
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# google.api_core / grpc errors that mean "try again later", matched by name so
+# this module doesn't have to import the SDK
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "Aborted", "Unknown",
+    "RetryError", "AioRpcError", "_InactiveRpcError"
+}
+FATAL_ERROR_NAMES = {
+    "InvalidArgument", "BadRequest", "PermissionDenied", "Unauthenticated", "Unauthorized",
+    "Forbidden", "NotFound", "FailedPrecondition", "BlockedPromptException", "StopCandidateException"
+}
+
+
+class AttemptTimeoutError(TimeoutError):
+    """A single upstream attempt took longer than its timeout"""
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Whether an upstream error is worth retrying"""
+    for cls in type(error).__mro__:
+        if cls.__name__ in FATAL_ERROR_NAMES:
+            return False
+        if cls.__name__ in RETRYABLE_ERROR_NAMES:
+            return True
+    return isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError))
+
+
+class Deadline:
+    """Wall-clock budget shared by every call made during one turn"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar("turn_deadline", default=None)
+
+
+def _new_deadline(seconds: float) -> Deadline:
+    """A deadline `seconds` from now, or the current one if it is sooner"""
+    outer = _current_deadline.get()
+    deadline = Deadline(seconds)
+    if outer is not None and outer.expires_at < deadline.expires_at:
+        return outer
+    return deadline
+
+
+@contextmanager
+def _deadline_set(deadline: Deadline) -> Iterator[Deadline]:
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+@contextmanager
+def turn_deadline(seconds: float) -> Iterator[Deadline]:
+    """Set the deadline for calls made in this context, keeping an outer one if it is sooner"""
+    with _deadline_set(_new_deadline(seconds)) as deadline:
+        yield deadline
+
+
+def iter_within_deadline(iterator: Iterator[T], seconds: float) -> Iterator[T]:
+    """Run each step of a generator under one turn deadline.
+
+    The deadline is set around every next() rather than across the yields, so it
+    never leaks into the consumer's context while the generator is suspended.
+    """
+    deadline = _new_deadline(seconds)
+    try:
+        while True:
+            with _deadline_set(deadline):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+async def aiter_within_deadline(iterator: AsyncIterator[T], seconds: float) -> AsyncIterator[T]:
+    """Async counterpart of iter_within_deadline"""
+    deadline = _new_deadline(seconds)
+    try:
+        while True:
+            with _deadline_set(deadline):
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+class RetryPolicy:
+    """Attempt count, timeouts and backoff for upstream model calls"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        attempt_timeout: float = 12.0,
+        turn_timeout: float = 30.0,
+        base_delay: float = 0.5,
+        max_delay: float = 4.0
+    ):
+        self.max_attempts = max_attempts
+        self.attempt_timeout = attempt_timeout
+        self.turn_timeout = turn_timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def attempt_timeout_within(self, deadline: Optional[Deadline]) -> float:
+        """Per-attempt timeout, shortened to whatever is left of the turn"""
+        if deadline is None:
+            return self.attempt_timeout
+        return min(self.attempt_timeout, deadline.remaining())
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Stops calling an unhealthy upstream for a while, then lets a probe through
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.short_circuited = 0
+
+    def allow_request(self) -> bool:
+        """Whether a call may go upstream right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Circuit closed, upstream recovered")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit opened after {self.consecutive_failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """Hand back a half-open probe that ended without an outcome, so the next call can probe"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "short_circuited": self.short_circuited
+            }
+
+
+_timeout_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="model-request")
+
+
+def call_with_timeout(func: Callable[..., Any], *args, timeout: float, **kwargs) -> Any:
+    """Run a blocking call with a timeout.
+
+    The worker thread can't be interrupted, so a timed-out call finishes in the
+    background; the caller just stops waiting for it.
+    """
+    future = _timeout_executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise AttemptTimeoutError(f"Attempt timed out after {timeout:.1f}s")
+
+
+# Shared by every chatbot in the process, since they all talk to the same upstream
+gemini_circuit_breaker = CircuitBreaker()
@@ -0,0 +1,250 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from models import AIResponse
+
+CacheKey = Tuple[str, int, bool]
+
+
+class _CacheEntry:
+    """One cached reply plus what is needed to index and evict it"""
+    __slots__ = ("key", "response", "shingles", "band_keys", "source_words", "reply_words", "created", "uses", "size")
+
+    def __init__(
+        self,
+        key: CacheKey,
+        response: AIResponse,
+        shingles: FrozenSet[str],
+        band_keys: List[tuple],
+        reply_words: FrozenSet[str]
+    ):
+        self.key = key
+        self.response = response
+        self.shingles = shingles
+        self.band_keys = band_keys
+        self.source_words = frozenset(key[0].split())
+        self.reply_words = reply_words
+        self.created = time.monotonic()
+        self.uses = 0
+        self.size = (
+            len(response.response.encode("utf-8"))
+            + sum(len(item) for item in response.confidence_tips + response.next_steps)
+            + sum(len(shingle) for shingle in shingles)
+            + sum(len(word) for word in reply_words)
+            + 256
+        )
+
+
+class ResponseCache:
+    """
+    Process-wide reply cache that matches near-duplicate messages through a MinHash LSH index
+    """
+
+    def __init__(
+        self,
+        num_bins: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        similarity_threshold: float = 0.7,
+        max_entries: int = 2048,
+        max_bytes: int = 8 * 1024 * 1024,
+        ttl_seconds: float = 6 * 3600,
+        max_reuse: int = 5
+    ):
+        if num_bins % bands:
+            raise ValueError("num_bins must be divisible by bands")
+
+        self.num_bins = num_bins
+        self.bands = bands
+        self.rows = num_bins // bands
+        self.shingle_size = shingle_size
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_reuse = max_reuse
+
+        self._entries: "OrderedDict[CacheKey, _CacheEntry]" = OrderedDict()
+        self._buckets: Dict[tuple, Set[CacheKey]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.retirements = 0
+        self.refusals = 0
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        """Lowercase, drop punctuation and collapse whitespace"""
+        text = message.lower().replace("’", "'")
+        text = re.sub(r"[^a-z0-9' ]+", " ", text)
+        return " ".join(text.split())
+
+    def _shingles(self, text: str) -> FrozenSet[str]:
+        padded = f" {text} "
+        if len(padded) <= self.shingle_size:
+            return frozenset([padded])
+        return frozenset(padded[i:i + self.shingle_size] for i in range(len(padded) - self.shingle_size + 1))
+
+    def _band_keys(self, shingles: FrozenSet[str], partition: Tuple[int, bool]) -> List[tuple]:
+        """MinHash the shingles and split the signature into LSH band keys"""
+        # One-permutation hashing: a single hash per shingle, minimum kept per bin
+        bins: List[Optional[int]] = [None] * self.num_bins
+        for shingle in shingles:
+            h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+            index = h % self.num_bins
+            value = h // self.num_bins
+            if bins[index] is None or value < bins[index]:
+                bins[index] = value
+
+        # Short messages leave bins empty; borrow from the next filled bin so signatures stay comparable
+        signature = list(bins)
+        for index in range(self.num_bins):
+            if signature[index] is None:
+                offset = 1
+                while bins[(index + offset) % self.num_bins] is None:
+                    offset += 1
+                signature[index] = (bins[(index + offset) % self.num_bins], offset)
+
+        return [
+            (partition, band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for band_key in entry.band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def _is_expired(self, entry: _CacheEntry, now: float) -> bool:
+        return now - entry.created > self.ttl_seconds
+
+    @staticmethod
+    def _repeats_missing_words(entry: _CacheEntry, words: FrozenSet[str]) -> bool:
+        """Whether the cached reply echoes words of its own message that this message lacks, like a name"""
+        return not (entry.source_words - words).isdisjoint(entry.reply_words)
+
+    def lookup(self, message: str, confidence_level: int, vague: bool) -> Optional[AIResponse]:
+        """Return a copy of a cached reply for this or a near-identical message that shares its details"""
+        text = self.normalize(message)
+        key = (text, confidence_level, vague)
+        now = time.monotonic()
+
+        # Hash outside the lock; exact repeats skip it entirely
+        band_keys: List[tuple] = []
+        if key not in self._entries:
+            shingles = self._shingles(text)
+            band_keys = self._band_keys(shingles, (confidence_level, vague))
+            words = frozenset(text.split())
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                best_similarity = self.similarity_threshold
+                refused = False
+                for band_key in band_keys:
+                    for candidate_key in self._buckets.get(band_key, ()):
+                        candidate = self._entries[candidate_key]
+                        similarity = len(shingles & candidate.shingles) / len(shingles | candidate.shingles)
+                        if similarity < best_similarity:
+                            continue
+                        # A reply written for someone else's details must not reach this user
+                        if self._repeats_missing_words(candidate, words):
+                            refused = True
+                            continue
+                        entry, best_similarity = candidate, similarity
+                if entry is None and refused:
+                    self.refusals += 1
+
+            if entry is not None and self._is_expired(entry, now):
+                self._remove(entry.key)
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            entry.uses += 1
+            if entry.uses >= self.max_reuse:
+                # Retire well-worn replies so repeat visitors don't get a canned answer
+                self._remove(entry.key)
+                self.retirements += 1
+            else:
+                self._entries.move_to_end(entry.key)
+            cached = entry.response
+
+        return cached.copy(update={
+            "confidence_tips": list(cached.confidence_tips),
+            "next_steps": list(cached.next_steps),
+            "timestamp": datetime.now()
+        })
+
+    def store(self, message: str, confidence_level: int, vague: bool, response: AIResponse):
+        """Cache a reply for this message, evicting by TTL, LRU and memory cap"""
+        text = self.normalize(message)
+        key = (text, confidence_level, vague)
+        shingles = self._shingles(text)
+        band_keys = self._band_keys(shingles, (confidence_level, vague))
+        reply_words = frozenset(self.normalize(response.response).split())
+
+        with self._lock:
+            if key in self._entries:
+                return
+
+            entry = _CacheEntry(key, response, shingles, band_keys, reply_words)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(key)
+
+            now = time.monotonic()
+            while self._entries:
+                oldest_key, oldest = next(iter(self._entries.items()))
+                if self._is_expired(oldest, now):
+                    self._remove(oldest_key)
+                    self.expirations += 1
+                elif len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    self._remove(oldest_key)
+                    self.evictions += 1
+                else:
+                    break
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> dict:
+        """Hit/miss and eviction counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "retirements": self.retirements,
+                "refusals": self.refusals
+            }
+
+
+# Shared by every chatbot in the process
+default_response_cache = ResponseCache()
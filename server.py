@@ -0,0 +1,659 @@
+"""
+Headless HTTP API for the coaching engine, on asyncio.
+
+Serves the same AsyncConfidenceChatbot the load tests drive, without
+Streamlit, so inference scales across cores and hosts independently of the
+UI. Several worker processes can share one port: on Linux each binds it with
+SO_REUSEPORT and the kernel spreads connections across them; elsewhere the
+parent binds once and the forked workers accept on the inherited socket.
+
+    python server.py --port 8080 --workers 4
+    python server.py --fake --workers 2        # FakeBackend, for load tests
+
+Endpoints (JSON unless noted):
+    POST   /sessions                        -> 201 {"session_id"}
+    POST   /sessions/{id}/messages          {"content"} -> reply
+    POST   /sessions/{id}/messages/stream   {"content"} -> NDJSON {"delta"} lines, then {"done": true, ...reply}
+    GET    /sessions/{id}                   -> session summary
+    GET    /sessions/{id}/export            -> NDJSON export (gzip with Accept-Encoding: gzip)
+    DELETE /sessions/{id}
+    GET    /healthz
+    GET    /metrics                         -> Prometheus text, for this worker
+
+Connections are kept alive between requests up to --keepalive-timeout idle
+seconds. Every request runs under a deadline, --request-timeout or a shorter
+X-Request-Timeout header, that the model calls inside it share.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from pydantic import ValidationError
+from backends import FakeBackend, LogNormalLatency
+from chatbot import AsyncConfidenceChatbot
+from models import AIResponse, UserMessage
+from rate_limit import RateLimiter, gemini_rate_limiter
+from resilience import CircuitBreaker, current_deadline, turn_deadline
+from session_store import InMemorySessionStore, SessionStore, SQLiteSessionStore
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+# The chatbot answers with its fallback when the deadline passes; this backstop only catches a stuck handler
+DEADLINE_GRACE = 0.5
+
+REASONS = {
+    200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 408: "Request Timeout", 413: "Payload Too Large",
+    431: "Request Header Fields Too Large", 500: "Internal Server Error",
+    501: "Not Implemented", 503: "Service Unavailable", 504: "Gateway Timeout"
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    version: str
+    headers: Dict[str, str]
+    body: bytes
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self) -> dict:
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return data
+
+
+class Response(NamedTuple):
+    status: int
+    body: bytes = b""
+    content_type: str = "application/json"
+    headers: Tuple[Tuple[str, str], ...] = ()
+
+
+class StreamingResponse(NamedTuple):
+    """Sent with chunked transfer encoding as the body iterator produces it"""
+    status: int
+    body: AsyncIterator[bytes]
+    content_type: str
+    headers: Tuple[Tuple[str, str], ...] = ()
+    # Last chunk written if the deadline cuts the stream short
+    timeout_chunk: bytes = b""
+
+
+def json_response(data, status: int = 200) -> Response:
+    return Response(status, json.dumps(data, default=str, ensure_ascii=False).encode("utf-8"))
+
+
+def ndjson_line(data: dict) -> bytes:
+    return json.dumps(data, default=str, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def reply_payload(session_id: str, ai_response: AIResponse) -> dict:
+    return {
+        "session_id": session_id,
+        "response": ai_response.response,
+        "confidence_level": ai_response.confidence_level,
+        "confidence_tips": ai_response.confidence_tips,
+        "next_steps": ai_response.next_steps,
+        "timestamp": ai_response.timestamp.isoformat()
+    }
+
+
+class SessionRegistry:
+    """
+    Chatbots for the sessions this worker has served, least recently used evicted
+    first. With a shared store, a session created or last served by another worker
+    is loaded from it, and reloaded when it holds turns this worker's copy hasn't seen.
+    """
+
+    def __init__(self, factory, session_store: SessionStore, max_sessions: int = 10000):
+        self.factory = factory
+        self.session_store = session_store
+        self.max_sessions = max_sessions
+        self._chatbots: "OrderedDict[str, AsyncConfidenceChatbot]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def create(self) -> AsyncConfidenceChatbot:
+        chatbot = self.factory()
+        session = chatbot.session
+        # Recorded before the id is handed out, so whichever worker gets the first message can find it
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, self.session_store.create_session, session.session_id, session.start_time.timestamp()
+        )
+        self._remember(session.session_id, chatbot)
+        return chatbot
+
+    async def get(self, session_id: str) -> Optional[AsyncConfidenceChatbot]:
+        # Store reads block, so they all run in the executor, like the resume below
+        loop = asyncio.get_running_loop()
+        record = await loop.run_in_executor(None, self.session_store.get_session, session_id)
+        chatbot = self._chatbots.get(session_id)
+        if chatbot is not None:
+            self._chatbots.move_to_end(session_id)
+            if record is None or record.turn_count <= chatbot.session.next_seq:
+                return chatbot
+        elif record is None:
+            return None
+        else:
+            chatbot = self.factory()
+
+        # Replaying a long history reads the store, so keep it off the event loop
+        if not await loop.run_in_executor(None, chatbot.resume_session, session_id):
+            return None
+        self._remember(session_id, chatbot)
+        return chatbot
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """Turns of one session run one at a time"""
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        return lock
+
+    def remove(self, session_id: str):
+        self._chatbots.pop(session_id, None)
+        self._locks.pop(session_id, None)
+
+    def _remember(self, session_id: str, chatbot: AsyncConfidenceChatbot):
+        self._chatbots[session_id] = chatbot
+        self._chatbots.move_to_end(session_id)
+        while len(self._chatbots) > self.max_sessions:
+            evicted, _ = self._chatbots.popitem(last=False)
+            lock = self._locks.get(evicted)
+            if lock is not None and not lock.locked():
+                del self._locks[evicted]
+
+    def __len__(self) -> int:
+        return len(self._chatbots)
+
+
+class ChatServer:
+    """HTTP/1.1 keep-alive connection handling and routing for one worker"""
+
+    def __init__(
+        self,
+        registry: SessionRegistry,
+        request_timeout: float = 30.0,
+        keepalive_timeout: float = 5.0,
+        max_keepalive_requests: int = 1000
+    ):
+        self.registry = registry
+        self.request_timeout = request_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.max_keepalive_requests = max_keepalive_requests
+        self.draining = False
+        self._connections: set = set()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            for served in range(1, self.max_keepalive_requests + 1):
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._write_response(writer, Response(e.status, json.dumps({"error": e.message}).encode()), False)
+                    break
+                if request is None:
+                    break
+
+                keep_alive = request.keep_alive and not self.draining and served < self.max_keepalive_requests
+                keep_alive = await self._serve(request, writer, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        """The next request on the connection, or None once it is closed or idle too long"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+        except asyncio.TimeoutError:
+            return None
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HTTPError(400, "Incomplete request")
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request headers too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+
+        if "transfer-encoding" in headers:
+            raise HTTPError(501, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Body is over {MAX_BODY_BYTES} bytes")
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), self.keepalive_timeout) if length else b""
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Timed out reading the body")
+
+        url = urlsplit(target)
+        return Request(method.upper(), url.path, parse_qs(url.query), version, headers, body)
+
+    def _deadline_for(self, request: Request) -> float:
+        """The server's request timeout, or a shorter one the client asked for"""
+        try:
+            requested = float(request.headers.get("x-request-timeout", self.request_timeout))
+        except ValueError:
+            raise HTTPError(400, "Invalid X-Request-Timeout")
+        return max(0.1, min(self.request_timeout, requested))
+
+    async def _serve(self, request: Request, writer: asyncio.StreamWriter, keep_alive: bool) -> bool:
+        """Handle one request and write its response; returns whether the connection stays open"""
+        started = time.perf_counter()
+        route = "unknown"
+        try:
+            timeout = self._deadline_for(request)
+            route, handler, args = self._route(request)
+            # Every model call made for this request shares its deadline
+            with turn_deadline(timeout):
+                response = await asyncio.wait_for(handler(request, *args), timeout + DEADLINE_GRACE)
+                if isinstance(response, StreamingResponse):
+                    keep_alive = await self._write_stream(writer, response, keep_alive)
+                else:
+                    await self._write_response(writer, response, keep_alive)
+            status = response.status
+        except HTTPError as e:
+            status = e.status
+            await self._write_response(writer, json_response({"error": e.message}, e.status), keep_alive)
+        except asyncio.TimeoutError:
+            status = 504
+            await self._write_response(writer, json_response({"error": "Request deadline exceeded"}, 504), False)
+            keep_alive = False
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            status = 500
+            logger.error(f"{request.method} {request.path} failed: {str(e)}")
+            await self._write_response(writer, json_response({"error": "Internal server error"}, 500), False)
+            keep_alive = False
+
+        metrics.http_requests_total.inc(route=route, status=str(status))
+        metrics.http_request_seconds.observe(time.perf_counter() - started, route=route)
+        return keep_alive
+
+    def _route(self, request: Request):
+        parts = [part for part in request.path.split("/") if part]
+        routes = {
+            ("healthz",): ("healthz", {"GET": self.healthz}),
+            ("metrics",): ("metrics", {"GET": self.metrics}),
+            ("sessions",): ("create_session", {"POST": self.create_session}),
+            ("sessions", None): ("session", {"GET": self.get_summary, "DELETE": self.delete_session}),
+            ("sessions", None, "messages"): ("message", {"POST": self.post_message}),
+            ("sessions", None, "messages", "stream"): ("message_stream", {"POST": self.stream_message}),
+            ("sessions", None, "export"): ("export", {"GET": self.export_session}),
+        }
+        for pattern, (route, methods) in routes.items():
+            if len(pattern) != len(parts) or any(p is not None and p != part for p, part in zip(pattern, parts)):
+                continue
+            handler = methods.get(request.method)
+            if handler is None:
+                raise HTTPError(405, f"{request.method} is not allowed on {request.path}")
+            args = [part for p, part in zip(pattern, parts) if p is None]
+            return route, handler, args
+        raise HTTPError(404, f"No route for {request.path}")
+
+    async def _session(self, session_id: str) -> AsyncConfidenceChatbot:
+        chatbot = await self.registry.get(session_id)
+        if chatbot is None:
+            raise HTTPError(404, f"Unknown session {session_id}")
+        return chatbot
+
+    def _user_message(self, request: Request) -> UserMessage:
+        try:
+            return UserMessage(content=request.json().get("content"))
+        except ValidationError:
+            raise HTTPError(400, "\"content\" must be a non-empty string")
+
+    async def _persisted(self):
+        """Make the turn visible to the other workers before answering"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.registry.session_store.flush)
+
+    async def healthz(self, request: Request) -> Response:
+        return json_response({"status": "draining" if self.draining else "ok", "sessions": len(self.registry)},
+                             503 if self.draining else 200)
+
+    async def metrics(self, request: Request) -> Response:
+        return Response(200, metrics.registry.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+
+    async def create_session(self, request: Request) -> Response:
+        chatbot = await self.registry.create()
+        return json_response({"session_id": chatbot.session.session_id}, 201)
+
+    async def get_summary(self, request: Request, session_id: str) -> Response:
+        chatbot = await self._session(session_id)
+        return json_response({"session_id": session_id, **chatbot.get_session_summary()})
+
+    async def delete_session(self, request: Request, session_id: str) -> Response:
+        await self._session(session_id)
+        self.registry.remove(session_id)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.registry.session_store.delete_session, session_id)
+        return Response(204)
+
+    async def post_message(self, request: Request, session_id: str) -> Response:
+        user_message = self._user_message(request)
+        chatbot = await self._session(session_id)
+        async with self.registry.lock(session_id):
+            ai_response = await chatbot.generate_response(user_message)
+        await self._persisted()
+        return json_response(reply_payload(session_id, ai_response))
+
+    async def stream_message(self, request: Request, session_id: str) -> StreamingResponse:
+        user_message = self._user_message(request)
+        chatbot = await self._session(session_id)
+
+        async def body() -> AsyncIterator[bytes]:
+            async with self.registry.lock(session_id):
+                async for item in chatbot.generate_response_stream(user_message):
+                    if isinstance(item, str):
+                        yield ndjson_line({"delta": item})
+                    else:
+                        await self._persisted()
+                        yield ndjson_line({"done": True, **reply_payload(session_id, item)})
+
+        return StreamingResponse(
+            200, body(), "application/x-ndjson",
+            timeout_chunk=ndjson_line({"error": "Request deadline exceeded"})
+        )
+
+    async def export_session(self, request: Request, session_id: str) -> StreamingResponse:
+        chatbot = await self._session(session_id)
+        compress = "gzip" in request.headers.get("accept-encoding", "")
+
+        async def body() -> AsyncIterator[bytes]:
+            # Each chunk is written and drained before the next is built, so memory stays flat
+            for chunk in chatbot.export_session_stream(compress):
+                yield chunk
+
+        headers = (("Content-Disposition", f'attachment; filename="confidenceai-{session_id}.ndjson"'),)
+        if compress:
+            headers += (("Content-Encoding", "gzip"),)
+        return StreamingResponse(200, body(), "application/x-ndjson", headers)
+
+    def _head(self, status: int, content_type: str, keep_alive: bool, headers, length: Optional[int]) -> bytes:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}", f"Content-Type: {content_type}"]
+        lines.append(f"Content-Length: {length}" if length is not None else "Transfer-Encoding: chunked")
+        if keep_alive:
+            lines.append("Connection: keep-alive")
+            lines.append(f"Keep-Alive: timeout={int(self.keepalive_timeout)}, max={self.max_keepalive_requests}")
+        else:
+            lines.append("Connection: close")
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _write_response(self, writer: asyncio.StreamWriter, response: Response, keep_alive: bool):
+        writer.write(self._head(response.status, response.content_type, keep_alive, response.headers, len(response.body)))
+        if response.body:
+            writer.write(response.body)
+        await writer.drain()
+
+    async def _write_stream(self, writer: asyncio.StreamWriter, response: StreamingResponse, keep_alive: bool) -> bool:
+        writer.write(self._head(response.status, response.content_type, keep_alive, response.headers, None))
+
+        # The body is iterated in this task, not under wait_for, because the chatbot's stream
+        # holds its turn deadline across yields; a timer cancels the task instead
+        task = asyncio.current_task()
+        timed_out = False
+
+        def expire():
+            nonlocal timed_out
+            timed_out = True
+            task.cancel()
+
+        deadline = current_deadline()
+        timer = asyncio.get_running_loop().call_later(deadline.remaining() + DEADLINE_GRACE, expire) if deadline else None
+        try:
+            async for chunk in response.body:
+                if chunk:
+                    writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    # Backpressure: a slow client holds the producer rather than filling memory
+                    await writer.drain()
+        except asyncio.CancelledError:
+            if not timed_out:
+                raise
+            if hasattr(task, "uncancel"):
+                task.uncancel()
+            if response.timeout_chunk:
+                writer.write(b"%x\r\n%s\r\n" % (len(response.timeout_chunk), response.timeout_chunk))
+            keep_alive = False
+        except (ConnectionError, OSError):
+            raise
+        except Exception as e:
+            # The status line is already out; ending without the last chunk tells the client the body is incomplete
+            logger.error(f"Streamed response failed: {str(e)}")
+            await response.body.aclose()
+            return False
+        finally:
+            if timer is not None:
+                timer.cancel()
+        await response.body.aclose()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return keep_alive
+
+    async def drain(self, grace: float):
+        """Stop keeping connections alive and give in-flight requests `grace` seconds to finish"""
+        self.draining = True
+        pending = [task for task in self._connections if task is not asyncio.current_task()]
+        if pending:
+            _, still_running = await asyncio.wait(pending, timeout=grace)
+            for task in still_running:
+                task.cancel()
+
+
+def open_session_store(db_path: Optional[str]) -> SessionStore:
+    return SQLiteSessionStore(db_path) if db_path else InMemorySessionStore()
+
+
+def make_chatbot_factory(args, session_store: SessionStore):
+    """Chatbots for one worker; Gemini workers split the API key's quota between them"""
+    if args.fake:
+        backend = FakeBackend(LogNormalLatency(0.8, cap=4.0), error_rate=args.fake_error_rate)
+        rate_limiter = None
+        # Shared by the worker's sessions like the Gemini breaker, without touching it
+        circuit_breaker = CircuitBreaker()
+    else:
+        backend = None
+        circuit_breaker = None
+        rate_limiter = RateLimiter(
+            gemini_rate_limiter.requests_per_minute / args.workers,
+            gemini_rate_limiter.tokens_per_minute / args.workers
+        )
+
+    def factory() -> AsyncConfidenceChatbot:
+        return AsyncConfidenceChatbot(
+            backend=backend,
+            assessment_mode=args.assessment_mode,
+            response_mode=args.response_mode,
+            session_store=session_store,
+            rate_limiter=rate_limiter,
+            circuit_breaker=circuit_breaker
+        )
+    return factory
+
+
+async def serve(args, sock: Optional[socket.socket] = None):
+    """Run one worker until SIGTERM or SIGINT, then drain"""
+    session_store = open_session_store(args.db)
+    registry = SessionRegistry(make_chatbot_factory(args, session_store), session_store, args.max_sessions)
+    app = ChatServer(registry, args.request_timeout, args.keepalive_timeout, args.max_keepalive_requests)
+
+    if sock is not None:
+        server = await asyncio.start_server(app.handle_connection, sock=sock, limit=MAX_HEADER_BYTES)
+    else:
+        server = await asyncio.start_server(
+            app.handle_connection, args.host, args.port, limit=MAX_HEADER_BYTES,
+            reuse_port=args.workers > 1, backlog=args.backlog
+        )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    logger.info(f"Worker {os.getpid()} serving on http://{args.host}:{args.port}")
+    await stop.wait()
+
+    logger.info(f"Worker {os.getpid()} draining")
+    server.close()
+    await app.drain(args.shutdown_grace)
+    await server.wait_closed()
+    session_store.close()
+
+
+def run_worker(args, sock: Optional[socket.socket] = None):
+    try:
+        asyncio.run(serve(args, sock))
+    except KeyboardInterrupt:
+        pass
+
+
+def supports_reuse_port() -> bool:
+    # macOS and the BSDs accept the option but don't balance connections across listeners
+    return hasattr(socket, "SO_REUSEPORT") and sys.platform.startswith("linux")
+
+
+def bind_shared_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def run_workers(args):
+    """Fork the workers, restart any that die, and pass shutdown signals on to them"""
+    # Bind before forking where the kernel can't balance separate listeners
+    sock = None if supports_reuse_port() else bind_shared_socket(args.host, args.port, args.backlog)
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(args, sock)
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()} crashed: {str(e)}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = slot
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for slot in range(args.workers):
+        spawn(slot)
+    logger.info(f"Started {args.workers} workers on http://{args.host}:{args.port}"
+                f" ({'SO_REUSEPORT' if sock is None else 'shared socket'})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}, restarting")
+            time.sleep(0.5)
+            spawn(slot)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the coaching engine over HTTP")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")), help="worker processes")
+    parser.add_argument("--db", default=os.getenv("SESSION_DB_PATH"), help="SQLite session store shared by the workers")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="deadline for one request, in seconds")
+    parser.add_argument("--keepalive-timeout", type=float, default=5.0, help="idle seconds before a connection is closed")
+    parser.add_argument("--max-keepalive-requests", type=int, default=1000, help="requests served per connection")
+    parser.add_argument("--max-sessions", type=int, default=10000, help="sessions each worker keeps in memory")
+    parser.add_argument("--shutdown-grace", type=float, default=10.0, help="seconds in-flight requests get on shutdown")
+    parser.add_argument("--backlog", type=int, default=1024)
+    parser.add_argument("--assessment-mode", default="llm", choices=AsyncConfidenceChatbot.ASSESSMENT_MODES)
+    parser.add_argument("--response-mode", default="two_call", choices=AsyncConfidenceChatbot.RESPONSE_MODES)
+    parser.add_argument("--fake", action="store_true", help="use FakeBackend instead of Gemini, for load tests")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    logging.getLogger("chatbot").setLevel(logging.WARNING)
+
+    if args.workers > 1 and not hasattr(os, "fork"):
+        parser.error("--workers > 1 needs os.fork")
+    if args.workers > 1 and not args.db:
+        logger.warning("Without --db each worker keeps its own sessions; a session only works on the worker that created it")
+
+    if args.workers > 1:
+        run_workers(args)
+    else:
+        run_worker(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
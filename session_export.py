@@ -0,0 +1,166 @@
+"""
+Streaming NDJSON export and import of chat sessions.
+
+An export is one JSON record per line: a "session" header, one "message" per
+turn (the Turn.to_dict() shape plus its seq), and an "end" trailer carrying
+the message count and session summary, so a truncated file is detected on
+import. Turns are read from the conversation archive one batch at a time and
+gzip is applied while streaming, so memory stays flat however long the
+conversation is.
+"""
+import json
+import logging
+import zlib
+from datetime import datetime
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+from models import ChatSession
+from session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+CHUNK_SIZE = 64 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class SessionImportError(ValueError):
+    """The export is malformed or incomplete"""
+
+
+def iter_export_lines(session: ChatSession) -> Iterator[str]:
+    """The export as NDJSON lines, newline included"""
+    yield _dump({
+        "type": "session",
+        "version": FORMAT_VERSION,
+        "session_id": session.session_id,
+        "start_time": session.start_time.isoformat(),
+        "total_messages": session.total_messages
+    })
+    count = 0
+    for turn in session.store.iter_all():
+        yield _dump({"type": "message", "seq": turn.seq, **turn.to_dict()})
+        count += 1
+    yield _dump({"type": "end", "messages": count, "session_summary": session.get_session_summary()})
+
+
+def iter_export_chunks(session: ChatSession, compress: bool = False, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """The export as byte chunks of about chunk_size, gzip-compressed on the fly when asked"""
+    # wbits=31 writes a gzip header and trailer, so the output is a regular .gz file
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = bytearray()
+    for line in iter_export_lines(session):
+        buffer += line.encode("utf-8")
+        if len(buffer) >= chunk_size:
+            chunk = compressor.compress(bytes(buffer)) if compressor else bytes(buffer)
+            buffer.clear()
+            if chunk:
+                yield chunk
+
+    tail = compressor.compress(bytes(buffer)) + compressor.flush() if compressor else bytes(buffer)
+    if tail:
+        yield tail
+
+
+def write_export(session: ChatSession, fileobj: BinaryIO, compress: bool = False) -> int:
+    """Stream the export into a binary file; returns the bytes written"""
+    written = 0
+    for chunk in iter_export_chunks(session, compress):
+        fileobj.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def iter_import_records(source: Union[BinaryIO, Iterable[bytes]], chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Records from an export, plain or gzip (detected from the first bytes), decoded incrementally"""
+    if hasattr(source, "read"):
+        chunks = iter(lambda: source.read(chunk_size), b"")
+    else:
+        chunks = iter(source)
+
+    decompressor = None
+    head = b""
+    detected = False
+    pending = b""
+    for chunk in chunks:
+        if not detected:
+            # Sniff the first two bytes, however the source happens to be chunked
+            head += chunk
+            if len(head) < 2:
+                continue
+            detected = True
+            if head[:2] == GZIP_MAGIC:
+                decompressor = zlib.decompressobj(31)
+            chunk, head = head, b""
+        data = decompressor.decompress(chunk) if decompressor else chunk
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+    pending += head
+    if decompressor is not None:
+        pending += decompressor.flush()
+    if pending.strip():
+        # Every record ends with a newline, so anything left over was cut off
+        raise SessionImportError("Export is truncated mid-record")
+
+
+def import_session(
+    source: Union[BinaryIO, Iterable[bytes]],
+    session_store: Optional[SessionStore] = None,
+    hot_window: int = 200
+) -> ChatSession:
+    """Rebuild a ChatSession from an export, one message at a time, optionally persisting it too"""
+    session: Optional[ChatSession] = None
+    started_at = 0.0
+    count = 0
+    finished = False
+
+    try:
+        for record in iter_import_records(source):
+            kind = record.get("type")
+            if kind == "session":
+                if record.get("version") != FORMAT_VERSION:
+                    raise SessionImportError(f"Unsupported export version {record.get('version')}")
+                start_time = datetime.fromisoformat(record["start_time"])
+                session = ChatSession(session_id=record["session_id"], start_time=start_time, hot_window=hot_window)
+                started_at = start_time.timestamp()
+            elif kind == "message":
+                if session is None:
+                    raise SessionImportError("Message before the session header")
+                turn = session.add_message(
+                    record["role"],
+                    record["content"],
+                    record.get("confidence_level"),
+                    record.get("tips"),
+                    record.get("next_steps"),
+                    timestamp=datetime.fromisoformat(record["timestamp"]).timestamp(),
+                    seq=record.get("seq")
+                )
+                if session_store is not None:
+                    session_store.record_turn(session.session_id, turn, started_at)
+                count += 1
+            elif kind == "end":
+                if record.get("messages") != count:
+                    raise SessionImportError(f"Export lists {record.get('messages')} messages, found {count}")
+                finished = True
+    except SessionImportError:
+        raise
+    except (KeyError, TypeError, ValueError, zlib.error) as e:
+        raise SessionImportError(f"Malformed session export: {str(e)}") from e
+
+    if session is None:
+        raise SessionImportError("No session header found")
+    if not finished:
+        raise SessionImportError(f"Export is truncated after {count} messages")
+    logger.info(f"Imported session {session.session_id} with {count} messages")
+    return session
+
+
+# One encoder for every record; json.dumps would build a new one per call with these options
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _dump(record: dict) -> str:
+    return _encoder.encode(record) + "\n"
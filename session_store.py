@@ -0,0 +1,347 @@
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import insort
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from conversation import Turn
+
+logger = logging.getLogger(__name__)
+
+
+class SessionRecord(NamedTuple):
+    session_id: str
+    started_at: float
+    updated_at: float
+    turn_count: int
+
+
+class SessionStore(ABC):
+    """
+    Durable home for session turns, so a restart, a redeploy or another worker
+    process can pick a conversation up where it left off
+    """
+
+    # Turns dropped because their seq was already stored
+    conflicts = 0
+
+    @abstractmethod
+    def create_session(self, session_id: str, started_at: float):
+        """Register a session before its first turn; a no-op if it already exists"""
+
+    @abstractmethod
+    def record_turn(self, session_id: str, turn: Turn, started_at: Optional[float] = None):
+        """Persist one turn; `started_at` is only used when the session is new"""
+
+    @abstractmethod
+    def get_session(self, session_id: str) -> Optional[SessionRecord]:
+        ...
+
+    @abstractmethod
+    def iter_turns(self, session_id: str) -> Iterator[Turn]:
+        """Every turn of a session, oldest first"""
+
+    @abstractmethod
+    def list_sessions(self, updated_since: Optional[float] = None, limit: int = 100) -> List[SessionRecord]:
+        """Most recently active sessions first"""
+
+    @abstractmethod
+    def delete_session(self, session_id: str):
+        ...
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every recorded turn is durable"""
+        return True
+
+    def _conflict(self, session_id: str, seq: int):
+        # Two chatbots wrote the same session, e.g. two tabs on one ?session= link; the first write wins
+        self.conflicts += 1
+        logger.error(f"Turn {seq} of session {session_id} was already stored by another writer, dropped")
+
+    def close(self):
+        pass
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local store; sessions survive a Streamlit rerun or page reload, not a restart"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, SessionRecord] = {}
+        self._turns: Dict[str, List[Turn]] = {}
+
+    def create_session(self, session_id: str, started_at: float):
+        with self._lock:
+            self._sessions.setdefault(session_id, SessionRecord(session_id, started_at, started_at, 0))
+
+    def record_turn(self, session_id: str, turn: Turn, started_at: Optional[float] = None):
+        with self._lock:
+            turns = self._turns.setdefault(session_id, [])
+            if not turns or turn.seq > turns[-1].seq:
+                turns.append(turn)
+            elif any(stored.seq == turn.seq for stored in turns):
+                self._conflict(session_id, turn.seq)
+                return
+            else:
+                # A late turn into a gap is kept, as SQLite's (session_id, seq) key allows
+                insort(turns, turn, key=lambda stored: stored.seq)
+            record = self._sessions.get(session_id)
+            self._sessions[session_id] = SessionRecord(
+                session_id,
+                record.started_at if record else (started_at or turn.timestamp),
+                max(record.updated_at, turn.timestamp) if record else turn.timestamp,
+                max(record.turn_count, turn.seq + 1) if record else turn.seq + 1
+            )
+
+    def get_session(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def iter_turns(self, session_id: str) -> Iterator[Turn]:
+        with self._lock:
+            turns = list(self._turns.get(session_id, ()))
+        return iter(turns)
+
+    def list_sessions(self, updated_since: Optional[float] = None, limit: int = 100) -> List[SessionRecord]:
+        with self._lock:
+            records = [
+                record for record in self._sessions.values()
+                if updated_since is None or record.updated_at >= updated_since
+            ]
+        return sorted(records, key=lambda record: record.updated_at, reverse=True)[:limit]
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._turns.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Local SQLite store shared by every worker on the host. The database runs in WAL
+    mode so readers never wait on the writer, and turns are committed in batches by
+    a background thread so recording a turn never blocks a reply.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            started_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            turn_count INTEGER NOT NULL DEFAULT 0
+        )""",
+        """CREATE TABLE IF NOT EXISTS turns (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            timestamp REAL NOT NULL,
+            confidence_level INTEGER,
+            tips TEXT,
+            next_steps TEXT,
+            PRIMARY KEY (session_id, seq)
+        ) WITHOUT ROWID""",
+        "CREATE INDEX IF NOT EXISTS idx_turns_timestamp ON turns (timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)",
+    )
+
+    # Fixed statements with bound parameters, so sqlite3 prepares each one once per connection
+    INSERT_TURN = (
+        "INSERT INTO turns (session_id, seq, role_id, content, timestamp, confidence_level, tips, next_steps) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    UPSERT_SESSION = (
+        "INSERT INTO sessions (session_id, started_at, updated_at, turn_count) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (session_id) DO UPDATE SET "
+        "updated_at = MAX(updated_at, excluded.updated_at), "
+        "turn_count = MAX(turn_count, excluded.turn_count)"
+    )
+    INSERT_SESSION = (
+        "INSERT OR IGNORE INTO sessions (session_id, started_at, updated_at, turn_count) VALUES (?, ?, ?, 0)"
+    )
+    SELECT_SESSION = "SELECT session_id, started_at, updated_at, turn_count FROM sessions WHERE session_id = ?"
+    SELECT_TURNS = (
+        "SELECT seq, role_id, content, timestamp, confidence_level, tips, next_steps "
+        "FROM turns WHERE session_id = ? ORDER BY seq"
+    )
+
+    def __init__(
+        self,
+        path: str = "sessions.db",
+        batch_size: int = 64,
+        flush_interval: float = 0.05,
+        max_pending: int = 10000
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.write_errors = 0
+
+        self._local = threading.local()
+        # Every thread's reader, so close() can close the ones opened by executor threads too
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._closed = False
+
+        conn = self._reader()
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+        self._writer = threading.Thread(target=self._write_loop, name="session-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, cached_statements=64, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Safe with WAL: a power cut can lose the last commits but never corrupts the database
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only ever used by this thread, but closed from whichever thread calls close()
+            conn = self._local.conn = self._connect(check_same_thread=False)
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def create_session(self, session_id: str, started_at: float):
+        # Written straight away rather than queued, so other workers can find the session at once
+        conn = self._reader()
+        with conn:
+            conn.execute(self.INSERT_SESSION, (session_id, started_at, started_at))
+
+    def record_turn(self, session_id: str, turn: Turn, started_at: Optional[float] = None):
+        row = (
+            session_id, turn.seq, turn.role_id, turn.content, turn.timestamp, turn.confidence_level,
+            json.dumps(turn.tips) if turn.tips else None,
+            json.dumps(turn.next_steps) if turn.next_steps else None
+        )
+        try:
+            self._queue.put_nowait((row, started_at or turn.timestamp))
+        except queue.Full:
+            # Dropping history is better than stalling the reply behind a stuck disk
+            self.dropped += 1
+            logger.error(f"Session store queue full, dropped turn {turn.seq} of session {session_id}")
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            # Gather a batch until it is full, the interval ends, or a flush/close marker arrives
+            while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write_batch(conn, [entry for entry in batch if isinstance(entry, tuple)])
+            for entry in batch:
+                if isinstance(entry, threading.Event):
+                    entry.set()
+            if batch[-1] is None:
+                break
+        conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list):
+        if not batch:
+            return
+        sessions: Dict[str, tuple] = {}
+        for row, started_at in batch:
+            session_id, seq, timestamp = row[0], row[1], row[4]
+            first = sessions.get(session_id)
+            sessions[session_id] = (
+                session_id,
+                first[1] if first else started_at,
+                timestamp,
+                seq + 1
+            )
+        try:
+            with conn:
+                conn.executemany(self.INSERT_TURN, [row for row, _ in batch])
+                conn.executemany(self.UPSERT_SESSION, list(sessions.values()))
+        except sqlite3.IntegrityError:
+            # Another writer already stored one of these seqs; keep the rest of the batch
+            self._write_rows(conn, batch, sessions)
+        except sqlite3.Error as e:
+            self.write_errors += 1
+            logger.error(f"Session store failed to write {len(batch)} turns: {str(e)}")
+
+    def _write_rows(self, conn: sqlite3.Connection, batch: list, sessions: Dict[str, tuple]):
+        """Write a batch row by row, keeping the stored turn wherever a seq is taken"""
+        try:
+            with conn:
+                for row, _ in batch:
+                    try:
+                        conn.execute(self.INSERT_TURN, row)
+                    except sqlite3.IntegrityError:
+                        self._conflict(row[0], row[1])
+                conn.executemany(self.UPSERT_SESSION, list(sessions.values()))
+        except sqlite3.Error as e:
+            self.write_errors += 1
+            logger.error(f"Session store failed to write {len(batch)} turns: {str(e)}")
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def get_session(self, session_id: str) -> Optional[SessionRecord]:
+        row = self._reader().execute(self.SELECT_SESSION, (session_id,)).fetchone()
+        return SessionRecord(*row) if row else None
+
+    def iter_turns(self, session_id: str) -> Iterator[Turn]:
+        for seq, role_id, content, timestamp, confidence_level, tips, next_steps in self._reader().execute(
+            self.SELECT_TURNS, (session_id,)
+        ):
+            yield Turn(
+                seq, role_id, content, timestamp, confidence_level,
+                json.loads(tips) if tips else (),
+                json.loads(next_steps) if next_steps else ()
+            )
+
+    def list_sessions(self, updated_since: Optional[float] = None, limit: int = 100) -> List[SessionRecord]:
+        rows = self._reader().execute(
+            "SELECT session_id, started_at, updated_at, turn_count FROM sessions "
+            "WHERE updated_at >= ? ORDER BY updated_at DESC LIMIT ?",
+            (updated_since if updated_since is not None else 0, limit)
+        ).fetchall()
+        return [SessionRecord(*row) for row in rows]
+
+    def delete_session(self, session_id: str):
+        self.flush()
+        conn = self._reader()
+        with conn:
+            conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def close(self):
+        """Write whatever is still queued and stop the writer"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        self._local.conn = None
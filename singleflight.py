@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers that arrive while it is
+    running wait for it and get the same result, or the same exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(
+        self, key: Hashable, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs
+    ) -> Tuple[Any, bool]:
+        """Return (result, shared); a waiting caller gives up with TimeoutError after `timeout`"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Shared call still running after {timeout:.1f}s")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the key before waking the waiters, so a later caller starts a fresh call
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+
+class _AsyncCall:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight. The call runs as its own task, so a
+    caller being cancelled doesn't cancel it for the others; it is only
+    cancelled once every caller waiting on it has gone.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _AsyncCall] = {}
+
+    async def do(
+        self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, timeout: Optional[float] = None, **kwargs
+    ) -> Tuple[Any, bool]:
+        """Return (result, shared); a caller gives up with asyncio.TimeoutError after `timeout`"""
+        loop = asyncio.get_running_loop()
+        # Tasks belong to one loop, so each loop coalesces on its own
+        loop_key = (id(loop), key)
+        call = self._calls.get(loop_key)
+        shared = call is not None
+        if call is None:
+            call = self._calls[loop_key] = _AsyncCall(loop.create_task(func(*args, **kwargs)))
+            call.task.add_done_callback(lambda task: self._finish(loop_key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(call.task), timeout), shared
+        finally:
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                # Nobody is left to use the result; later callers start a fresh call
+                call.task.cancel()
+                if self._calls.get(loop_key) is call:
+                    del self._calls[loop_key]
+
+    def _finish(self, loop_key: Hashable, call: _AsyncCall):
+        if self._calls.get(loop_key) is call:
+            del self._calls[loop_key]
+        if not call.task.cancelled():
+            # Mark the exception retrieved even when every caller gave up before it arrived
+            call.task.exception()
+
+
+# Shared by every chatbot in the process, so identical prompts from different sessions coalesce
+model_request_flights = SingleFlight()
+async_model_request_flights = AsyncSingleFlight()
@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assessor import LocalConfidenceAssessor
+from backends import FakeBackend
+from chatbot import ConfidenceChatbot
+
+
+class LocalConfidenceAssessorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.assessor = LocalConfidenceAssessor()
+
+    def level(self, message: str) -> int:
+        return self.assessor.assess(message)[0].confidence_level
+
+    def test_negation_flips_a_keyword(self):
+        self.assertGreater(self.level("I'm confident"), self.level("I'm not confident"))
+
+    def test_negation_stops_at_punctuation_and_contrast_words(self):
+        confident = self.level("I'm confident")
+        for message in ("I'm not sure, but I'm confident", "not sure but confident", "I don't know. Confident though"):
+            with self.subTest(message=message):
+                matches = dict(
+                    match for clause in self.assessor._clauses(message)
+                    for match in self.assessor._score_matches(clause)
+                )
+                self.assertGreater(matches["confident"], 5.5)
+                self.assertLessEqual(self.level(message), confident)
+
+    def test_intensity_scales_the_pull_from_neutral(self):
+        self.assertLess(self.level("I'm extremely scared"), self.level("I'm slightly scared"))
+
+    def test_no_keywords_means_no_certainty(self):
+        assessment, certainty = self.assessor.assess("The weather is mild today")
+        self.assertEqual(certainty, 0.0)
+        self.assertEqual(assessment.confidence_level, 5)
+
+    def test_memo_is_keyed_on_the_normalized_message(self):
+        assessment, _ = self.assessor.assess("I feel lost")
+        self.assessor.remember("I feel lost", assessment)
+        self.assertIs(self.assessor.get_cached("  i FEEL lost!! "), assessment)
+
+
+class LocalAssessmentModeTest(unittest.TestCase):
+
+    def test_only_uncertain_messages_reach_the_model(self):
+        backend = FakeBackend()
+        chatbot = ConfidenceChatbot(backend=backend, assessment_mode="local", local_assessor=LocalConfidenceAssessor())
+        chatbot._assess_confidence("I'm scared and nervous, I feel like a failure and I'm not good enough")
+        self.assertEqual(backend.calls, 0)
+        chatbot._assess_confidence("The weather is mild today")
+        self.assertEqual(backend.calls, 1)
+        # Remembered, so asking again is free
+        chatbot._assess_confidence("The weather is mild today")
+        self.assertEqual(backend.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
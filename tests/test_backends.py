@@ -0,0 +1,30 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backends
+
+
+class GeminiKeyTest(unittest.TestCase):
+    """The SDK keeps one API key per process, so a second key must not silently replace it"""
+
+    def setUp(self):
+        backends._configured_api_key = None
+
+    def tearDown(self):
+        backends._configured_api_key = None
+
+    def test_same_key_can_back_several_models(self):
+        backends.GeminiBackend("key-a")
+        backends.GeminiBackend("key-a", "gemini-1.5-pro")
+
+    def test_second_key_is_rejected(self):
+        backends.GeminiBackend("key-a")
+        with self.assertRaises(ValueError):
+            backends.GeminiBackend("key-b")
+
+
+if __name__ == "__main__":
+    unittest.main()
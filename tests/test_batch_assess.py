@@ -0,0 +1,65 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import FakeBackend
+from batch_assess import BatchAssessor
+from chatbot import AsyncConfidenceChatbot
+
+
+class BatchAssessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmp.name, "input.jsonl")
+        self.output_path = os.path.join(self.tmp.name, "scores.jsonl")
+        self.backend = FakeBackend()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_input(self, rows):
+        with open(self.input_path, "w") as f:
+            for row_id, content in rows:
+                f.write(json.dumps({"id": row_id, "content": content}) + "\n")
+
+    def run_batch(self) -> dict:
+        assessor = BatchAssessor(AsyncConfidenceChatbot(backend=self.backend), concurrency=2, pack_size=3)
+        return asyncio.run(assessor.run(self.input_path, self.output_path))
+
+    def output_ids(self) -> list:
+        with open(self.output_path) as f:
+            return [json.loads(line)["id"] for line in f]
+
+    def test_every_row_is_scored_once_and_a_rerun_skips_them(self):
+        self.write_input([(f"m{i}", f"I'm nervous about exam number {i}") for i in range(7)])
+        summary = self.run_batch()
+        self.assertEqual(summary["assessed"], 7)
+        self.assertEqual(summary["requests"], 3)
+        self.assertEqual(sorted(self.output_ids()), sorted(f"m{i}" for i in range(7)))
+
+        calls = self.backend.calls
+        summary = self.run_batch()
+        self.assertEqual(summary["skipped"], 7)
+        self.assertEqual(self.backend.calls, calls)
+
+    def test_repeated_ids_are_scored_once(self):
+        self.write_input([("a", "I feel confident"), ("b", "I feel lost"), ("a", "something else entirely")])
+        summary = self.run_batch()
+        self.assertEqual(summary["duplicates"], 1)
+        self.assertEqual(sorted(self.output_ids()), ["a", "b"])
+
+    def test_assess_messages_keeps_input_order(self):
+        messages = ["I'm terrified and I can't do this", "I'm confident and ready"]
+        assessments = asyncio.run(AsyncConfidenceChatbot(backend=self.backend).assess_messages(messages))
+        self.assertEqual(len(assessments), 2)
+        self.assertLess(assessments[0].confidence_level, assessments[1].confidence_level)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation import ConversationStore
+
+
+class ConversationStoreTest(unittest.TestCase):
+
+    def fill(self, count: int, **options) -> ConversationStore:
+        store = ConversationStore(**options)
+        for index in range(count):
+            role = "assistant" if index % 2 else "user"
+            store.append(role, f"message {index}", 1 + index % 10 if role == "assistant" else None,
+                         tips=["tip"] if role == "assistant" else ())
+        return store
+
+    def test_hot_window_is_bounded_and_old_turns_are_archived(self):
+        store = self.fill(100, hot_window=20, spill_batch=10)
+        self.assertLess(len(store.hot_turns()), 20 + 10)
+        self.assertEqual(store.archived_count + len(store.hot_turns()), 100)
+        self.assertEqual(len(store), 100)
+        self.assertGreater(store.archive_bytes(), 0)
+
+    def test_iter_all_reads_archive_and_hot_turns_in_order(self):
+        store = self.fill(100, hot_window=20, spill_batch=10)
+        turns = list(store.iter_all())
+        self.assertEqual([turn.seq for turn in turns], list(range(100)))
+        self.assertEqual(turns[1].role, "assistant")
+        self.assertEqual(turns[1].tips, ("tip",))
+        self.assertEqual(turns[0].to_dict()["content"], "message 0")
+
+    def test_recent_only_reads_the_hot_window(self):
+        store = self.fill(100, hot_window=20, spill_batch=10)
+        self.assertEqual([turn.content for turn in store.recent(2)], ["message 98", "message 99"])
+        self.assertEqual(len(store.recent(1000)), len(store.hot_turns()))
+        self.assertEqual(store.recent(0), [])
+
+    def test_confidence_values_cover_every_scored_reply(self):
+        store = self.fill(100, hot_window=20, spill_batch=10)
+        self.assertEqual(len(store.confidence_values), 50)
+        self.assertEqual(store.confidence_values[0], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
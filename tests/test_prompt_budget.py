@@ -0,0 +1,39 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prompt_budget
+
+
+class PromptBudgetTest(unittest.TestCase):
+
+    def run_main(self, *argv) -> int:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return prompt_budget.main(list(argv))
+
+    def test_committed_budget_passes(self):
+        self.assertEqual(self.run_main(), 0)
+
+    def test_missing_budget_fails(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertEqual(self.run_main("--budget", os.path.join(tmp, "missing.json")), 1)
+
+    def test_saved_budget_is_then_enforced(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "budget.json")
+            self.assertEqual(self.run_main("--save", path), 0)
+            self.assertEqual(self.run_main("--budget", path), 0)
+
+    def test_unlisted_or_grown_branches_fail(self):
+        sizes = {"full": {"chars": 400, "tokens": 100}, "vague": {"chars": 400, "tokens": 100}}
+        failures = prompt_budget.check(sizes, {"full": {"max_tokens": 99}})
+        self.assertEqual(len(failures), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
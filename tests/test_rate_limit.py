@@ -0,0 +1,148 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import FakeBackend, FixedLatency
+from chatbot import AsyncConfidenceChatbot, ConfidenceChatbot
+from rate_limit import RateLimiter, RateLimitTimeout, TokenBucket
+from resilience import CircuitBreaker, turn_deadline
+
+
+def tripped_breaker() -> CircuitBreaker:
+    """Open, and ready to let its half-open probe through"""
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+    return breaker
+
+
+def drained_limiter() -> RateLimiter:
+    """Room for one request every ten seconds, already used"""
+    limiter = RateLimiter(requests_per_minute=6)
+    limiter.acquire("other", 1)
+    return limiter
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_refund_is_capped_at_capacity(self):
+        bucket = TokenBucket(per_minute=60, capacity=10)
+        bucket.take(4)
+        bucket.refund(100)
+        self.assertEqual(bucket.level, 10)
+
+    def test_request_bigger_than_the_bucket_only_waits_for_it_to_fill(self):
+        bucket = TokenBucket(per_minute=60, capacity=10)
+        bucket.take(10)
+        self.assertAlmostEqual(bucket.time_until(50, time.monotonic()), 10, delta=0.1)
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_queued_request_times_out_and_leaves_the_queue(self):
+        limiter = drained_limiter()
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire("s1", 1, timeout=0.05)
+        self.assertEqual(limiter.get_status()["queued"], 0)
+
+    def test_fair_queue_order(self):
+        limiter = RateLimiter(requests_per_minute=60)
+        # Dispatch by hand instead of from the dispatcher thread, so the order is deterministic
+        limiter._dispatcher = threading.current_thread()
+        limiter._requests.take(limiter._requests.capacity)
+
+        released = []
+        for name, session_id, tokens, priority in (
+            ("heavy-1", "heavy", 1000, False),
+            ("heavy-2", "heavy", 1000, False),
+            ("heavy-3", "heavy", 1000, False),
+            ("light", "light", 100, False),
+            ("opening", "new", 1000, True),
+        ):
+            limiter._enqueue(session_id, tokens, 1.0, priority, lambda name=name: released.append(name))
+
+        with limiter._cond:
+            limiter._requests.level = limiter._requests.capacity
+            limiter._dispatch()
+        # A first message goes first, and a light session isn't stuck behind a heavy one's backlog
+        self.assertEqual(released, ["opening", "light", "heavy-1", "heavy-2", "heavy-3"])
+
+    def test_settle_refunds_and_charges_the_difference(self):
+        limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=6000, expected_output_tokens=300)
+        limiter.acquire("s1", 400)
+        limiter.settle(100)
+        self.assertAlmostEqual(limiter.get_status()["tokens_available"], 800, delta=2)
+        limiter.settle(500)
+        self.assertAlmostEqual(limiter.get_status()["tokens_available"], 600, delta=2)
+
+    def test_cancelled_async_wait_leaves_the_queue(self):
+        limiter = drained_limiter()
+
+        async def scenario():
+            task = asyncio.ensure_future(limiter.acquire_async("s1", 1))
+            await asyncio.sleep(0.02)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+        self.assertEqual(limiter.get_status()["queued"], 0)
+
+
+class ChatbotRateLimitTest(unittest.TestCase):
+    """Giving up on the limiter, or being cancelled, must not wedge the breaker or keep the charge"""
+
+    def test_rate_limit_timeout_releases_the_half_open_probe(self):
+        breaker = tripped_breaker()
+        chatbot = ConfidenceChatbot(
+            backend=FakeBackend(), circuit_breaker=breaker, rate_limiter=drained_limiter(), coalesce_requests=False
+        )
+        with turn_deadline(0.05):
+            self.assertEqual(chatbot._make_ai_request("hi"), chatbot._get_fallback_response())
+        self.assertFalse(breaker._probe_in_flight)
+        self.assertTrue(breaker.allow_request())
+
+    def test_async_rate_limit_timeout_releases_the_half_open_probe(self):
+        breaker = tripped_breaker()
+        chatbot = AsyncConfidenceChatbot(
+            backend=FakeBackend(), circuit_breaker=breaker, rate_limiter=drained_limiter(), coalesce_requests=False
+        )
+
+        async def scenario():
+            with turn_deadline(0.05):
+                return await chatbot._make_ai_request("hi")
+
+        self.assertEqual(asyncio.run(scenario()), chatbot._get_fallback_response())
+        self.assertFalse(breaker._probe_in_flight)
+
+    def test_cancelled_request_hands_back_the_probe_and_the_output_charge(self):
+        breaker = tripped_breaker()
+        limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=600, expected_output_tokens=300)
+        chatbot = AsyncConfidenceChatbot(
+            backend=FakeBackend(FixedLatency(1.0)), circuit_breaker=breaker, rate_limiter=limiter
+        )
+        prompt = "hello there"
+
+        async def scenario():
+            task = asyncio.ensure_future(chatbot._make_ai_request(prompt))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.01)
+
+        before = limiter.get_status()["tokens_available"]
+        asyncio.run(scenario())
+        # Only the prompt stays charged; the estimate for the reply that never came is refunded
+        charged = before - limiter.get_status()["tokens_available"]
+        self.assertAlmostEqual(charged, limiter.estimate(prompt) - limiter.expected_output_tokens, delta=2)
+        self.assertFalse(breaker._probe_in_flight)
+        self.assertEqual(breaker.state, "half_open")
+
+
+if __name__ == "__main__":
+    unittest.main()
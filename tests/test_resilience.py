@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import FakeBackend
+from chatbot import AsyncConfidenceChatbot, ConfidenceChatbot
+from models import AIResponse, UserMessage
+from resilience import RetryPolicy, current_deadline, gemini_circuit_breaker, turn_deadline
+
+
+class StreamDeadlineTest(unittest.TestCase):
+    """The turn deadline covers the stream's own steps, never the consumer between chunks"""
+
+    MESSAGE = UserMessage(content="I'm nervous about my job interview tomorrow")
+
+    def test_deadline_is_not_set_between_chunks(self):
+        stream = ConfidenceChatbot(backend=FakeBackend(tokens_per_second=0)).generate_response_stream(self.MESSAGE)
+        items = []
+        for item in stream:
+            self.assertIsNone(current_deadline())
+            items.append(item)
+        self.assertIsInstance(items[-1], AIResponse)
+
+    def test_stream_can_be_closed_from_another_context(self):
+        stream = ConfidenceChatbot(backend=FakeBackend(tokens_per_second=0)).generate_response_stream(self.MESSAGE)
+        next(stream)
+        contextvars.copy_context().run(stream.close)
+        self.assertIsNone(current_deadline())
+
+    def test_outer_deadline_still_applies(self):
+        with turn_deadline(5.0) as outer:
+            stream = ConfidenceChatbot(backend=FakeBackend(tokens_per_second=0)).generate_response_stream(self.MESSAGE)
+            next(stream)
+            self.assertIs(current_deadline(), outer)
+            stream.close()
+
+    def test_async_deadline_is_not_set_between_chunks(self):
+        async def scenario():
+            chatbot = AsyncConfidenceChatbot(backend=FakeBackend(tokens_per_second=0))
+            async for item in chatbot.generate_response_stream(self.MESSAGE):
+                self.assertIsNone(current_deadline())
+                if isinstance(item, AIResponse):
+                    return item
+
+        self.assertIsInstance(asyncio.run(scenario()), AIResponse)
+
+
+class CircuitBreakerScopeTest(unittest.TestCase):
+
+    def test_other_backends_do_not_trip_the_gemini_breaker(self):
+        chatbot = ConfidenceChatbot(backend=FakeBackend(error_rate=1.0), retry_policy=RetryPolicy(max_attempts=1))
+        for _ in range(3):
+            chatbot.generate_response(UserMessage(content="I'm nervous about my job interview tomorrow"))
+        self.assertEqual(chatbot.circuit_breaker.state, "open")
+        self.assertIsNot(chatbot.circuit_breaker, gemini_circuit_breaker)
+        self.assertEqual(gemini_circuit_breaker.state, "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
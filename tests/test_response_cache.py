@@ -0,0 +1,99 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import FakeBackend
+from chatbot import ConfidenceChatbot
+from models import AIResponse, UserMessage
+from response_cache import ResponseCache
+
+
+def reply(text: str) -> AIResponse:
+    return AIResponse(response=text, confidence_level=4, confidence_tips=["tip"], next_steps=["step"])
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache()
+
+    def test_exact_and_near_duplicate_messages_hit(self):
+        self.cache.store("I'm nervous about my job interview tomorrow", 4, False, reply("You can do this."))
+        self.assertIsNotNone(self.cache.lookup("i'm nervous about my job interview tomorrow!", 4, False))
+        self.assertIsNotNone(self.cache.lookup("I'm so nervous about my job interview tomorrow", 4, False))
+        self.assertEqual(self.cache.get_stats()["hits"], 2)
+
+    def test_other_level_or_branch_misses(self):
+        self.cache.store("I'm nervous about my job interview tomorrow", 4, False, reply("You can do this."))
+        self.assertIsNone(self.cache.lookup("I'm nervous about my job interview tomorrow", 7, False))
+        self.assertIsNone(self.cache.lookup("I'm nervous about my job interview tomorrow", 4, True))
+
+    def test_hit_is_a_copy(self):
+        self.cache.store("feeling lost", 3, True, reply("Tell me more."))
+        self.cache.lookup("feeling lost", 3, True).confidence_tips.append("changed")
+        self.assertEqual(self.cache.lookup("feeling lost", 3, True).confidence_tips, ["tip"])
+
+    def test_reply_naming_details_of_another_message_is_not_reused(self):
+        self.cache.store(
+            "My friend Sarah says I'm not ready for the interview", 4, False,
+            reply("Sarah cares about you, but you know how ready you are.")
+        )
+        self.assertIsNone(self.cache.lookup("My friend Sara says I'm not ready for the interview", 4, False))
+        self.assertEqual(self.cache.get_stats()["refusals"], 1)
+
+    def test_reply_is_retired_after_max_reuse(self):
+        cache = ResponseCache(max_reuse=2)
+        cache.store("feeling lost", 3, True, reply("Tell me more."))
+        self.assertIsNotNone(cache.lookup("feeling lost", 3, True))
+        self.assertIsNotNone(cache.lookup("feeling lost", 3, True))
+        self.assertIsNone(cache.lookup("feeling lost", 3, True))
+        self.assertEqual(cache.get_stats()["retirements"], 1)
+
+    def test_oldest_entries_are_evicted_at_the_entry_cap(self):
+        cache = ResponseCache(max_entries=2)
+        for message in ("feeling lost", "not sure about anything", "worried about money"):
+            cache.store(message, 3, True, reply("Tell me more."))
+        self.assertIsNone(cache.lookup("feeling lost", 3, True))
+        self.assertEqual(cache.get_stats()["entries"], 2)
+        self.assertEqual(cache.get_stats()["evictions"], 1)
+
+
+class ChatbotResponseCacheTest(unittest.TestCase):
+    """A hit must skip every model call, whatever the mode"""
+
+    MESSAGE = "I'm nervous about my job interview tomorrow"
+
+    def calls_for_repeats(self, repeats: int, **options) -> int:
+        backend, cache = FakeBackend(), ResponseCache()
+        for _ in range(repeats):
+            chatbot = ConfidenceChatbot(backend=backend, response_cache=cache, **options)
+            chatbot.generate_response(UserMessage(content=self.MESSAGE))
+        return backend.calls
+
+    def test_repeats_cost_no_calls(self):
+        for options in ({}, {"response_mode": "combined"}, {"speculative": True}):
+            with self.subTest(**options):
+                self.assertEqual(self.calls_for_repeats(3, **options), self.calls_for_repeats(1, **options))
+
+    def test_stream_hit_costs_no_calls(self):
+        backend, cache = FakeBackend(), ResponseCache()
+        ConfidenceChatbot(backend=backend, response_cache=cache).generate_response(UserMessage(content=self.MESSAGE))
+        calls = backend.calls
+        items = list(ConfidenceChatbot(backend=backend, response_cache=cache).generate_response_stream(
+            UserMessage(content=self.MESSAGE)
+        ))
+        self.assertEqual(backend.calls, calls)
+        self.assertIsInstance(items[-1], AIResponse)
+
+    def test_later_turns_are_not_cached(self):
+        backend, cache = FakeBackend(), ResponseCache()
+        chatbot = ConfidenceChatbot(backend=backend, response_cache=cache, response_mode="combined")
+        chatbot.generate_response(UserMessage(content=self.MESSAGE))
+        chatbot.generate_response(UserMessage(content=self.MESSAGE))
+        self.assertEqual(backend.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import FakeBackend
+from chatbot import AsyncConfidenceChatbot
+from models import UserMessage
+from server import SessionRegistry
+from session_store import SQLiteSessionStore
+
+
+class SessionRegistryTest(unittest.TestCase):
+    """Two registries on one SQLite file stand in for two workers sharing a port"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "sessions.db")
+        self.store_a = SQLiteSessionStore(path)
+        self.store_b = SQLiteSessionStore(path)
+        backend = FakeBackend()
+        self.registry_a = SessionRegistry(
+            lambda: AsyncConfidenceChatbot(backend=backend, session_store=self.store_a), self.store_a
+        )
+        self.registry_b = SessionRegistry(
+            lambda: AsyncConfidenceChatbot(backend=backend, session_store=self.store_b), self.store_b
+        )
+
+    def tearDown(self):
+        self.store_a.close()
+        self.store_b.close()
+        self.tmp.cleanup()
+
+    def test_new_session_is_visible_to_other_workers(self):
+        async def scenario():
+            created = await self.registry_a.create()
+            session_id = created.session.session_id
+            resumed = await self.registry_b.get(session_id)
+            self.assertIsNotNone(resumed)
+            self.assertEqual(resumed.session.session_id, session_id)
+            self.assertEqual(resumed.session.total_messages, 0)
+
+            # The first turn can land on the other worker
+            await resumed.generate_response(UserMessage(content="I feel nervous about my interview"))
+            self.store_b.flush()
+            caught_up = await self.registry_a.get(session_id)
+            self.assertEqual(caught_up.session.total_messages, 2)
+
+        asyncio.run(scenario())
+
+    def test_unknown_session_is_not_found(self):
+        self.assertIsNone(asyncio.run(self.registry_b.get("missing")))
+
+    def test_store_reads_stay_off_the_event_loop(self):
+        threads = []
+        get_session = self.store_b.get_session
+
+        def recording_get_session(session_id):
+            threads.append(threading.current_thread())
+            return get_session(session_id)
+
+        self.store_b.get_session = recording_get_session
+        asyncio.run(self.registry_b.get("missing"))
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    def test_close_closes_readers_opened_by_executor_threads(self):
+        async def scenario():
+            created = await self.registry_a.create()
+            await self.registry_b.get(created.session.session_id)
+
+        asyncio.run(scenario())
+        readers = list(self.store_b._readers)
+        self.assertGreater(len(readers), 1)
+        self.store_b.close()
+        for conn in readers:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import gzip
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import ChatSession
+from session_export import SessionImportError, import_session, iter_export_chunks
+from session_store import InMemorySessionStore
+
+
+def long_session(turns: int = 260) -> ChatSession:
+    """Long enough that part of the history has been spilled to the archive"""
+    session = ChatSession(session_id="export-me", hot_window=20)
+    for index in range(turns // 2):
+        session.add_message("user", f"message {index} — ça va?")
+        session.add_message("assistant", f"reply {index}", 1 + index % 10, tips=["tip"], next_steps=["step"])
+    return session
+
+
+def turn_rows(session: ChatSession) -> list:
+    return [(turn.seq, turn.role, turn.content, turn.confidence_level, turn.tips, turn.next_steps)
+            for turn in session.store.iter_all()]
+
+
+class SessionExportRoundTripTest(unittest.TestCase):
+
+    def test_plain_and_gzip_round_trip(self):
+        session = long_session()
+        self.assertGreater(session.store.archived_count, 0)
+        for compress in (False, True):
+            with self.subTest(compress=compress):
+                data = b"".join(iter_export_chunks(session, compress, chunk_size=512))
+                if compress:
+                    self.assertEqual(gzip.decompress(data).count(b"\n"), session.total_messages + 2)
+                imported = import_session(io.BytesIO(data))
+                self.assertEqual(imported.session_id, session.session_id)
+                self.assertEqual(imported.start_time, session.start_time)
+                self.assertEqual(turn_rows(imported), turn_rows(session))
+                self.assertEqual(imported.confidence_history, session.confidence_history)
+
+    def test_import_from_small_chunks_persists_every_turn(self):
+        session = long_session(40)
+        data = b"".join(iter_export_chunks(session, compress=True))
+        store = InMemorySessionStore()
+        # Chunks smaller than the gzip magic still have to be detected
+        import_session((data[i:i + 1] for i in range(len(data))), store)
+        self.assertEqual([turn.seq for turn in store.iter_turns(session.session_id)], list(range(40)))
+
+    def test_seq_gaps_survive_the_round_trip(self):
+        session = ChatSession(session_id="gappy")
+        for seq in (0, 1, 4, 5):
+            session.add_message("user", f"turn {seq}", seq=seq)
+        imported = import_session(iter_export_chunks(session))
+        self.assertEqual([turn.seq for turn in imported.store.iter_all()], [0, 1, 4, 5])
+        self.assertEqual(imported.next_seq, 6)
+
+    def test_truncated_export_is_rejected(self):
+        data = b"".join(iter_export_chunks(long_session(40)))
+        for cut in (len(data) // 2, data.rindex(b'{"type":"end"')):
+            with self.subTest(cut=cut):
+                with self.assertRaises(SessionImportError):
+                    import_session(io.BytesIO(data[:cut]))
+
+
+if __name__ == "__main__":
+    unittest.main()
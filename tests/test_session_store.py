@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation import Turn
+from models import ChatSession
+from session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+def user_turn(seq: int, content: str) -> Turn:
+    return Turn(seq, 0, content, 1000.0 + seq, None, (), ())
+
+
+class SessionStoreConflictTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stores = [InMemorySessionStore(), SQLiteSessionStore(os.path.join(self.tmp.name, "sessions.db"))]
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        self.tmp.cleanup()
+
+    def test_second_writer_does_not_overwrite_a_stored_turn(self):
+        for store in self.stores:
+            with self.subTest(store=type(store).__name__):
+                store.record_turn("s1", user_turn(0, "first tab"))
+                store.record_turn("s1", user_turn(0, "second tab"))
+                store.record_turn("s1", user_turn(1, "next"))
+                store.flush()
+                self.assertEqual([turn.content for turn in store.iter_turns("s1")], ["first tab", "next"])
+                self.assertEqual(store.conflicts, 1)
+                self.assertEqual(store.get_session("s1").turn_count, 2)
+
+    def test_stores_agree_on_late_and_duplicate_turns(self):
+        for store in self.stores:
+            with self.subTest(store=type(store).__name__):
+                for seq, content in ((0, "a"), (2, "c"), (1, "b"), (1, "b again"), (2, "c again")):
+                    store.record_turn("s3", user_turn(seq, content))
+                store.flush()
+                self.assertEqual([turn.content for turn in store.iter_turns("s3")], ["a", "b", "c"])
+                self.assertEqual(store.conflicts, 2)
+                self.assertEqual(store.get_session("s3").turn_count, 3)
+
+    def test_restore_keeps_stored_seq_across_gaps(self):
+        for store in self.stores:
+            with self.subTest(store=type(store).__name__):
+                for seq in (0, 1, 4, 5):
+                    store.record_turn("s2", user_turn(seq, f"turn {seq}"))
+                store.flush()
+
+                session = ChatSession(session_id="s2")
+                session.restore(store.iter_turns("s2"))
+                self.assertEqual(session.total_messages, 4)
+                self.assertEqual(session.next_seq, 6)
+
+                store.record_turn("s2", session.add_message("user", "after resume"))
+                store.flush()
+                self.assertEqual([turn.seq for turn in store.iter_turns("s2")], [0, 1, 4, 5, 6])
+                self.assertEqual(store.conflicts, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()